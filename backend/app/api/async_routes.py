@@ -0,0 +1,61 @@
+# app/api/async_routes.py
+
+import logging
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+from app.api.routes import RETRY_AFTER_SECONDS, get_session_id, validate_question_payload
+from app.core.initializer import AppComponents
+
+logger = logging.getLogger(__name__)
+
+def service_not_ready() -> JSONResponse:
+    """503 response telling clients when to retry while components warm up"""
+    readiness = AppComponents.startup_state.snapshot()
+    headers = {}
+    if readiness["status"] != "failed":
+        headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+    return JSONResponse({
+        "error": "Service not ready. Please try again later.",
+        "status": "error",
+        "readiness": readiness
+    }, status_code=503, headers=headers)
+
+async def ask_question(request: Request) -> JSONResponse:
+    """Handle question answering on the event loop"""
+    try:
+        try:
+            data = await request.json()
+        except Exception:
+            return JSONResponse({"error": "No JSON data provided"}, status_code=400)
+        
+        question, error, status_code = validate_question_payload(data)
+        if error:
+            return JSONResponse({"error": error}, status_code=status_code)
+        
+        logger.info(f"Received question: {question}")
+        
+        if not AppComponents.qa_chain or not AppComponents.qa_chain_manager:
+            logger.error("QA chain is not initialized")
+            return service_not_ready()
+        
+        result = await AppComponents.qa_chain_manager.aprocess_query(
+            AppComponents.qa_chain,
+            question,
+            session_id=get_session_id(data)
+        )
+        
+        return JSONResponse({
+            "answer": result.get("answer", "No answer generated"),
+            "sources": result.get("sources", []),
+            "retrieval": result.get("retrieval", {}),
+            "status": "success"
+        })
+        
+    except Exception as e:
+        logger.error(f"Error processing question: {str(e)}", exc_info=True)
+        return JSONResponse({
+            "error": str(e),
+            "status": "error"
+        }, status_code=500)
@@ -1,14 +1,20 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+import json
 import logging
 from app.core.initializer import AppComponents
 from app.config.settings import ALLOWED_ORIGIN
 import re
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
 # Create blueprint with unique name
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
+# Suggested client back-off while components are still initializing
+RETRY_AFTER_SECONDS = 5
+MAX_SESSION_ID_LENGTH = 128
+
 def is_valid_question(question: str) -> bool:
     """Validate question content"""
     # Check if question has actual words (not just special characters or numbers)
@@ -19,10 +25,85 @@ def is_valid_question(question: str) -> bool:
         return False
     return True
 
+def service_not_ready():
+    """503 response telling clients when to retry while components warm up"""
+    readiness = AppComponents.startup_state.snapshot()
+    response = jsonify({
+        "error": "Service not ready. Please try again later.",
+        "status": "error",
+        "readiness": readiness
+    })
+    response.status_code = 503
+    if readiness["status"] != "failed":
+        response.headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+    return response
+
+def validate_question_payload(data):
+    """Validate a decoded question request body.
+
+    Returns (question, None, None) or (None, error_message, status_code).
+    """
+    if not data or not isinstance(data, dict):
+        return None, "No JSON data provided", 400
+        
+    if 'question' not in data:
+        return None, "No JSON data provided", 400
+        
+    question = data.get('question')
+    
+    # Type validation
+    if not isinstance(question, str):
+        return None, "Question must be a string", 422
+        
+    # Content validation
+    question = question.strip()
+    if not question:
+        return None, "Question cannot be empty", 400
+        
+    # Validate question content
+    if not is_valid_question(question):
+        return None, "Invalid question format", 422
+    
+    return question, None, None
+
+def get_session_id(data) -> Optional[str]:
+    """Conversation session named in a request body, if any"""
+    session_id = data.get('session_id') if isinstance(data, dict) else None
+    if isinstance(session_id, str) and 0 < len(session_id.strip()) <= MAX_SESSION_ID_LENGTH:
+        return session_id.strip()
+    return None
+
+def parse_question():
+    """Validate the JSON body of a question request.
+
+    Returns (question, None) or (None, error_response).
+    """
+    # Check if request has JSON content type
+    if not request.is_json:
+        return None, (jsonify({"error": "No JSON data provided"}), 400)
+        
+    try:
+        data = request.get_json()
+    except Exception:
+        return None, (jsonify({"error": "No JSON data provided"}), 400)
+    
+    question, error, status_code = validate_question_payload(data)
+    if error:
+        return None, (jsonify({"error": error}), status_code)
+    return question, None
+
 @api_bp.route('/', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     try:
+        readiness = AppComponents.startup_state.snapshot()
+        if readiness["status"] == "failed":
+            return jsonify({
+                "status": "unhealthy",
+                "readiness": readiness,
+                "error": readiness["error"]
+            }), 500
+        
         components_status = {
             "doc_processor": AppComponents.doc_processor is not None,
             "vector_store": AppComponents.vector_store is not None,
@@ -38,9 +119,12 @@ def health_check():
                 logger.error(f"Error getting vector store count: {str(e)}")
         
         return jsonify({
-            "status": "healthy",
+            "status": "healthy" if readiness["ready"] else "initializing",
+            "readiness": readiness,
             "components": components_status,
             "vector_store_documents": vector_store_count,
+            "startup_timings": AppComponents.startup_timings,
+            "answer_cache": AppComponents.qa_chain_manager.get_cache_stats() if AppComponents.qa_chain_manager else {},
             "message": "RAG Chatbot API is running"
         })
     except Exception as e:
@@ -56,53 +140,26 @@ def ask_question():
     logger.info(f"Received request: {request.method} {request.path}")
     logger.info(f"Request headers: {request.headers}")
     try:
-        # Check if request has JSON content type
-        if not request.is_json:
-            return jsonify({"error": "No JSON data provided"}), 400
-            
-        try:
-            data = request.get_json()
-        except Exception:
-            return jsonify({"error": "No JSON data provided"}), 400
-            
-        if not data or not isinstance(data, dict):
-            return jsonify({"error": "No JSON data provided"}), 400
-            
-        if 'question' not in data:
-            return jsonify({"error": "No JSON data provided"}), 400
-            
-        question = data.get('question')
-        
-        # Type validation
-        if not isinstance(question, str):
-            return jsonify({"error": "Question must be a string"}), 422
-            
-        # Content validation
-        question = question.strip()
-        if not question:
-            return jsonify({"error": "Question cannot be empty"}), 400
-            
-        # Validate question content
-        if not is_valid_question(question):
-            return jsonify({"error": "Invalid question format"}), 422
+        question, error_response = parse_question()
+        if error_response is not None:
+            return error_response
             
         logger.info(f"Received question: {question}")
         
         if not AppComponents.qa_chain or not AppComponents.qa_chain_manager:
             logger.error("QA chain is not initialized")
-            return jsonify({
-                "error": "Service not ready. Please try again later.",
-                "status": "error"
-            }), 503
+            return service_not_ready()
         
         result = AppComponents.qa_chain_manager.process_query(
             AppComponents.qa_chain, 
-            question
+            question,
+            session_id=get_session_id(request.get_json())
         )
         
         response = {
             "answer": result.get("answer", "No answer generated"),
             "sources": result.get("sources", []),
+            "retrieval": result.get("retrieval", {}),
             "status": "success"
         }
         
@@ -115,6 +172,49 @@ def ask_question():
             "status": "error"
         }), 500
 
+def format_sse(event: str, data) -> str:
+    """Serialize one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@api_bp.route('/ask/stream', methods=['POST'])
+def ask_question_stream():
+    """Answer a question as Server-Sent Events: sources, tokens, then done"""
+    try:
+        question, error_response = parse_question()
+        if error_response is not None:
+            return error_response
+        
+        if not AppComponents.qa_chain or not AppComponents.qa_chain_manager:
+            logger.error("QA chain is not initialized")
+            return service_not_ready()
+        
+        logger.info(f"Received streaming question: {question}")
+        events = AppComponents.qa_chain_manager.stream_query(
+            question,
+            session_id=get_session_id(request.get_json())
+        )
+        
+        def generate():
+            for event in events:
+                yield format_sse(event["event"], event["data"])
+        
+        return Response(
+            stream_with_context(generate()),
+            mimetype='text/event-stream',
+            headers={
+                'Cache-Control': 'no-cache',
+                # Stop reverse proxies from buffering the stream
+                'X-Accel-Buffering': 'no'
+            }
+        )
+        
+    except Exception as e:
+        logger.error(f"Error processing streaming question: {str(e)}", exc_info=True)
+        return jsonify({
+            "error": str(e),
+            "status": "error"
+        }), 500
+
 """@api_bp.route('/ask', methods=['OPTIONS'])
 def handle_ask_options():
     "Handle CORS preflight for ask endpoint"
@@ -10,8 +10,22 @@ Required Environment Variables:
 
 Optional Environment Variables:
 - FLASK_DEBUG: Enable debug mode (default: False)
+- BACKGROUND_INIT: Bind immediately and build the index on a background thread (default: False)
 - VECTOR_STORE_TOP_K: Number of results to return (default: 8)
 - VECTOR_STORE_SIMILARITY_THRESHOLD: Minimum similarity score (default: 0.3)
+- CONTEXT_TOKEN_BUDGET: Maximum tokens of retrieved context per prompt, 0 = unlimited (default: 6000)
+- CONTEXT_TOKEN_ENCODING: tiktoken encoding used to count context tokens (default: cl100k_base)
+- RETRIEVAL_SCORE_GAP: Drop in similarity between ranked chunks past which the rest are dropped, 0 = off (default: 0.15)
+- HYBRID_RETRIEVAL: Fuse BM25 lexical matches with vector results (default: True)
+- RRF_K: Rank constant of reciprocal-rank fusion (default: 60)
+- LEXICAL_MIN_TERM_COVERAGE: Share of a question's terms, stopwords excluded, a chunk must contain to be a lexical match (default: 0.5)
+- HYBRID_EMBED_TIMEOUT: Seconds to wait for a query embedding before answering from the lexical index alone, 0 = wait (default: 5.0)
+- RETRIEVAL_MODE: Context retrieval mode, mmr or similarity (default: mmr)
+- MMR_DIVERSITY_SCORE: Weight of diversity against relevance in MMR, 0-1 (default: 0.3)
+- MMR_FETCH_K: Candidates fetched per query before MMR re-ranking (default: 4 x VECTOR_STORE_TOP_K)
+- VECTOR_STORE_BACKEND: Vector index backend, chroma or numpy (default: chroma)
+- NUMPY_IVF_MIN_ROWS: Row count at which the numpy backend builds an IVF index (default: 20000)
+- NUMPY_IVF_NPROBE: IVF buckets scanned per query by the numpy backend (default: 8)
 - CLAUDE_MODEL: Model version to use (default: claude-3-sonnet-20240229)
 - LLM_TEMPERATURE: Temperature for LLM responses (default: 0.3)
 - LLM_MAX_TOKENS: Maximum tokens in LLM response (default: 4096)
@@ -19,10 +33,28 @@ Optional Environment Variables:
 - CHUNK_OVERLAP: Overlap between chunks (default: 400)
 - ENABLE_CACHE: Enable vector store caching (default: True)
 - CACHE_DIR: Directory for cache storage (default: .cache)
+- EMBEDDING_BATCH_SIZE: Texts per embedding request (default: 96)
+- EMBEDDING_MAX_CONCURRENCY: Concurrent in-flight embedding requests (default: 4)
+- EMBEDDING_REQUESTS_PER_MINUTE: Embedding request quota (default: 100)
+- EMBEDDING_CACHE_MAX_ENTRIES: Maximum embeddings kept in the on-disk cache (default: 50000)
+- INGEST_QUEUE_DEPTH: Chunk batches buffered between the parse, embed and write stages of ingestion (default: 2)
+- SESSION_MAX_MESSAGES: Messages kept per conversation session (default: 20)
+- SESSION_IDLE_TIMEOUT: Seconds before an idle session is evicted (default: 1800)
+- SESSION_MAX_SESSIONS: Sessions kept in memory per process (default: 1000)
+- SESSION_SPILL: Spill evicted sessions to SQLite in CACHE_DIR (default: False)
+- QUERY_EMBEDDING_CACHE_SIZE: Query embeddings kept in memory per process (default: 1024)
+- QUERY_EMBEDDING_BATCH_WINDOW_MS: Window for batching concurrent query embeddings, 0 = off (default: 5)
+- QUERY_WORKER_THREADS: Threads per process that run blocking queries, shared by all requests (default: 8)
+- ANSWER_CACHE_ENABLED: Serve repeated questions from the answer cache (default: True)
+- ANSWER_CACHE_MAX_ENTRIES: Maximum cached answers (default: 1000)
+- ANSWER_CACHE_TTL: Seconds a cached answer stays valid, 0 = no expiry (default: 3600)
+- ANSWER_CACHE_SIMILARITY_THRESHOLD: Cosine similarity for semantic answer cache hits, 0 = exact match only (default: 0.0)
 - MAX_RETRIES: Maximum retry attempts (default: 3)
 - RETRY_DELAY: Delay between retries in seconds (default: 1.0)
 - MIN_CHUNK_SIZE: Minimum allowed chunk size (default: 100)
 - MAX_CHUNK_SIZE: Maximum allowed chunk size (default: 3000)
+- DOC_PROCESSING_WORKERS: Worker processes for document loading, 0 = CPU count (default: 0)
+- PARALLEL_LOAD_MIN_FILES: Minimum file count before loading in parallel (default: 64)
 """
 
 # File: backend/app/config/settings.py
@@ -69,13 +101,20 @@ COHERE_API_KEY = os.getenv("COHERE_API_KEY")
 # Application settings
 DEBUG = get_env_bool("FLASK_DEBUG", False)
 ALLOWED_ORIGIN = os.getenv('ALLOWED_ORIGIN', 'http://localhost:3000')
+BACKGROUND_INIT = get_env_bool('BACKGROUND_INIT', False)
 
 # Vector store settings - using get_env_float to handle validation
 VECTOR_STORE_SIMILARITY_THRESHOLD = max(0.0, min(1.0, get_env_float('VECTOR_STORE_SIMILARITY_THRESHOLD', 0.3)))
 VECTOR_STORE_TOP_K = get_env_int('VECTOR_STORE_TOP_K', 8)
+VECTOR_STORE_BACKEND = os.getenv('VECTOR_STORE_BACKEND', 'chroma').lower()
+NUMPY_IVF_MIN_ROWS = get_env_int('NUMPY_IVF_MIN_ROWS', 20000)
+NUMPY_IVF_NPROBE = max(1, get_env_int('NUMPY_IVF_NPROBE', 8))
 
 # Embedding settings
 EMBEDDING_MODEL = os.getenv('COHERE_MODEL', 'embed-multilingual-v2.0')
+EMBEDDING_BATCH_SIZE = get_env_int('EMBEDDING_BATCH_SIZE', 96)  # Cohere's per-request maximum
+EMBEDDING_MAX_CONCURRENCY = get_env_int('EMBEDDING_MAX_CONCURRENCY', 4)
+EMBEDDING_REQUESTS_PER_MINUTE = max(1.0, get_env_float('EMBEDDING_REQUESTS_PER_MINUTE', 100.0))
 
 # LLM settings
 CLAUDE_MODEL = os.getenv('CLAUDE_MODEL', 'claude-3-sonnet-20240229')
@@ -86,19 +125,44 @@ LLM_MAX_TOKENS = get_env_int('LLM_MAX_TOKENS', 4096)
 CHUNK_SIZE = get_env_int('CHUNK_SIZE', 2000)
 CHUNK_OVERLAP = get_env_int('CHUNK_OVERLAP', 200)
 
+# Conversation memory settings
+SESSION_MAX_MESSAGES = get_env_int('SESSION_MAX_MESSAGES', 20)
+SESSION_IDLE_TIMEOUT = get_env_float('SESSION_IDLE_TIMEOUT', 1800.0)
+SESSION_MAX_SESSIONS = get_env_int('SESSION_MAX_SESSIONS', 1000)
+SESSION_SPILL = get_env_bool('SESSION_SPILL', False)
+
 # Retrieval settings
 RETRIEVAL_MODE = os.getenv('RETRIEVAL_MODE', 'mmr')
 MMR_DIVERSITY_SCORE = max(0.0, min(1.0, get_env_float('MMR_DIVERSITY_SCORE', 0.3)))
+MMR_FETCH_K = max(1, get_env_int('MMR_FETCH_K', VECTOR_STORE_TOP_K * 4))
+RETRIEVAL_SCORE_GAP = max(0.0, get_env_float('RETRIEVAL_SCORE_GAP', 0.15))
+HYBRID_RETRIEVAL = get_env_bool('HYBRID_RETRIEVAL', True)
+RRF_K = max(1, get_env_int('RRF_K', 60))
+LEXICAL_MIN_TERM_COVERAGE = max(0.0, min(1.0, get_env_float('LEXICAL_MIN_TERM_COVERAGE', 0.5)))
+HYBRID_EMBED_TIMEOUT = max(0.0, get_env_float('HYBRID_EMBED_TIMEOUT', 5.0))
+CONTEXT_TOKEN_BUDGET = get_env_int('CONTEXT_TOKEN_BUDGET', 6000)
+CONTEXT_TOKEN_ENCODING = os.getenv('CONTEXT_TOKEN_ENCODING', 'cl100k_base')
 
 # Cache settings
 ENABLE_CACHE = get_env_bool('ENABLE_CACHE', True)
 CACHE_DIR = os.getenv('CACHE_DIR', '.cache')
+EMBEDDING_CACHE_MAX_ENTRIES = get_env_int('EMBEDDING_CACHE_MAX_ENTRIES', 50000)
+INGEST_QUEUE_DEPTH = max(1, get_env_int('INGEST_QUEUE_DEPTH', 2))
+QUERY_EMBEDDING_CACHE_SIZE = get_env_int('QUERY_EMBEDDING_CACHE_SIZE', 1024)
+QUERY_EMBEDDING_BATCH_WINDOW_MS = max(0.0, get_env_float('QUERY_EMBEDDING_BATCH_WINDOW_MS', 5.0))
+QUERY_WORKER_THREADS = max(1, get_env_int('QUERY_WORKER_THREADS', 8))
+ANSWER_CACHE_ENABLED = get_env_bool('ANSWER_CACHE_ENABLED', True)
+ANSWER_CACHE_MAX_ENTRIES = get_env_int('ANSWER_CACHE_MAX_ENTRIES', 1000)
+ANSWER_CACHE_TTL = get_env_float('ANSWER_CACHE_TTL', 3600.0)
+ANSWER_CACHE_SIMILARITY_THRESHOLD = max(0.0, min(1.0, get_env_float('ANSWER_CACHE_SIMILARITY_THRESHOLD', 0.0)))
 
 # Document processing settings
 MAX_RETRIES = get_env_int('MAX_RETRIES', 3)
 RETRY_DELAY = get_env_float('RETRY_DELAY', 1.0)
 MIN_CHUNK_SIZE = get_env_int('MIN_CHUNK_SIZE', 100)
 MAX_CHUNK_SIZE = get_env_int('MAX_CHUNK_SIZE', 8000)
+DOC_PROCESSING_WORKERS = get_env_int('DOC_PROCESSING_WORKERS', 0)
+PARALLEL_LOAD_MIN_FILES = get_env_int('PARALLEL_LOAD_MIN_FILES', 64)
 
 # Special settings for code chunks
 CODE_CHUNK_SIZE = get_env_int('CODE_CHUNK_SIZE', 11800)
@@ -125,6 +189,12 @@ def validate_settings() -> Dict[str, Any]:
         if CHUNK_OVERLAP >= CHUNK_SIZE:
             logger.warning("CHUNK_OVERLAP must be less than CHUNK_SIZE")
 
+        if RETRIEVAL_MODE not in ('mmr', 'similarity'):
+            logger.warning(f"Unknown RETRIEVAL_MODE {RETRIEVAL_MODE}, using similarity search")
+
+        if VECTOR_STORE_BACKEND not in ('chroma', 'numpy'):
+            logger.warning(f"Unknown VECTOR_STORE_BACKEND {VECTOR_STORE_BACKEND}, using chroma")
+
         # Create cache directory if enabled
         if ENABLE_CACHE:
             os.makedirs(CACHE_DIR, exist_ok=True)
@@ -137,11 +207,18 @@ def validate_settings() -> Dict[str, Any]:
             'vector_store': {
                 'similarity_threshold': VECTOR_STORE_SIMILARITY_THRESHOLD,
                 'top_k': VECTOR_STORE_TOP_K,
+                'backend': VECTOR_STORE_BACKEND,
+                'retrieval_mode': RETRIEVAL_MODE,
+                'mmr_diversity_score': MMR_DIVERSITY_SCORE,
+                'mmr_fetch_k': MMR_FETCH_K,
+                'score_gap': RETRIEVAL_SCORE_GAP,
+                'hybrid': HYBRID_RETRIEVAL,
             },
             'llm': {
                 'model': CLAUDE_MODEL,
                 'temperature': LLM_TEMPERATURE,
                 'max_tokens': LLM_MAX_TOKENS,
+                'context_token_budget': CONTEXT_TOKEN_BUDGET,
             },
             'processing': {
                 'chunk_size': CHUNK_SIZE,
@@ -152,6 +229,9 @@ def validate_settings() -> Dict[str, Any]:
             'cache': {
                 'enabled': ENABLE_CACHE,
                 'directory': CACHE_DIR,
+                'embedding_cache_max_entries': EMBEDDING_CACHE_MAX_ENTRIES,
+                'answer_cache_enabled': ANSWER_CACHE_ENABLED,
+                'answer_cache_max_entries': ANSWER_CACHE_MAX_ENTRIES,
             }
         }
 
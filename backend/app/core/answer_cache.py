@@ -0,0 +1,244 @@
+# app/core/answer_cache.py
+
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.runnables.config import run_in_executor
+
+from app.config.settings import (
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_TTL,
+    ANSWER_CACHE_SIMILARITY_THRESHOLD
+)
+
+logger = logging.getLogger(__name__)
+
+# Query vectors kept between a semantic miss and the put() that follows it
+_PENDING_VECTORS = 64
+
+
+@dataclass
+class CachedAnswer:
+    result: Dict[str, Any]
+    query_type: str
+    created_at: float
+    vector: Optional[np.ndarray] = None
+
+
+class AnswerCache:
+    """Thread-safe TTL/LRU cache of answers to previously asked questions.
+
+    Answers are looked up by exact match on the normalized question and its
+    query type and, when a similarity threshold and a query embedding function
+    are configured, by cosine similarity to earlier questions of the same type.
+    All entries are dropped when the index version changes, since answers
+    built from an older knowledge base may no longer be right.
+
+    aget/aput are the event loop counterparts of get/put: they embed with
+    aembed_query when given, and otherwise run embed_query in the default
+    executor, so a semantic lookup never blocks the loop.
+    """
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+                 ttl: float = ANSWER_CACHE_TTL,
+                 similarity_threshold: float = ANSWER_CACHE_SIMILARITY_THRESHOLD,
+                 embed_query: Optional[Callable[[str], List[float]]] = None,
+                 aembed_query: Optional[Callable[[str], Awaitable[List[float]]]] = None):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.embed_query = embed_query
+        self.aembed_query = aembed_query
+        self.index_version: Optional[str] = None
+        self._entries: "OrderedDict[Tuple[str, str], CachedAnswer]" = OrderedDict()
+        self._pending_vectors: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0
+        }
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Case-, whitespace- and trailing-punctuation-insensitive form of a question"""
+        return re.sub(r"[\s?!.]+$", "", " ".join(str(query).lower().split()))
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.similarity_threshold > 0 and self.embed_query is not None
+
+    def set_index_version(self, version: Optional[str]) -> None:
+        """Invalidate all answers if the index they were built from changed"""
+        with self._lock:
+            if version == self.index_version:
+                return
+            if self._entries:
+                logger.info(f"Index version changed, dropping {len(self._entries)} cached answers")
+                self.stats["invalidations"] += 1
+            self._entries.clear()
+            self._pending_vectors.clear()
+            self.index_version = version
+
+    def _is_expired(self, entry: CachedAnswer, now: float) -> bool:
+        return self.ttl > 0 and now - entry.created_at > self.ttl
+
+    @staticmethod
+    def _unit(vector: List[float]) -> Optional[np.ndarray]:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _embed(self, normalized: str) -> Optional[np.ndarray]:
+        """Unit-length query embedding, or None if it cannot be computed"""
+        try:
+            return self._unit(self.embed_query(normalized))
+        except Exception as e:
+            logger.warning(f"Could not embed query for semantic answer cache lookup: {str(e)}")
+            return None
+
+    async def _aembed(self, normalized: str) -> Optional[np.ndarray]:
+        """Async counterpart of _embed"""
+        try:
+            if self.aembed_query is not None:
+                return self._unit(await self.aembed_query(normalized))
+            return self._unit(await run_in_executor(None, self.embed_query, normalized))
+        except Exception as e:
+            logger.warning(f"Could not embed query for semantic answer cache lookup: {str(e)}")
+            return None
+
+    def _semantic_match(self, key: Tuple[str, str], vector: np.ndarray, now: float) -> Optional[CachedAnswer]:
+        """Most similar live entry of the same query type above the threshold"""
+        candidates = [
+            (entry_key, entry) for entry_key, entry in self._entries.items()
+            if entry.query_type == key[1] and entry.vector is not None
+            and not self._is_expired(entry, now)
+        ]
+        if not candidates:
+            return None
+
+        similarities = np.stack([entry.vector for _, entry in candidates]) @ vector
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None
+
+        entry_key, entry = candidates[best]
+        self._entries.move_to_end(entry_key)
+        return entry
+
+    def _get_exact(self, key: Tuple[str, str], now: float) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._is_expired(entry, now):
+                del self._entries[key]
+                self.stats["expirations"] += 1
+                entry = None
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return dict(entry.result)
+
+    def _get_similar(self, key: Tuple[str, str], vector: Optional[np.ndarray], now: float) -> Optional[Dict[str, Any]]:
+        """Semantic hit for a question with no exact entry, counting a miss otherwise"""
+        with self._lock:
+            entry = self._semantic_match(key, vector, now) if vector is not None else None
+            if entry is not None:
+                self.stats["semantic_hits"] += 1
+                return dict(entry.result)
+
+            self.stats["misses"] += 1
+            if vector is not None:
+                self._pending_vectors[key] = vector
+                while len(self._pending_vectors) > _PENDING_VECTORS:
+                    self._pending_vectors.popitem(last=False)
+        return None
+
+    def get(self, query: str, query_type: str) -> Optional[Dict[str, Any]]:
+        """Cached result for a question, or None"""
+        key = (self.normalize(query), query_type)
+        now = time.time()
+        result = self._get_exact(key, now)
+        if result is not None:
+            return result
+        # Embed outside the lock; it may be a network call
+        vector = self._embed(key[0]) if self.semantic_enabled else None
+        return self._get_similar(key, vector, now)
+
+    async def aget(self, query: str, query_type: str) -> Optional[Dict[str, Any]]:
+        """Async counterpart of get"""
+        key = (self.normalize(query), query_type)
+        now = time.time()
+        result = self._get_exact(key, now)
+        if result is not None:
+            return result
+        vector = await self._aembed(key[0]) if self.semantic_enabled else None
+        return self._get_similar(key, vector, now)
+
+    def _pop_pending_vector(self, key: Tuple[str, str]) -> Optional[np.ndarray]:
+        with self._lock:
+            return self._pending_vectors.pop(key, None)
+
+    def _store(self, key: Tuple[str, str], result: Dict[str, Any], vector: Optional[np.ndarray]) -> None:
+        with self._lock:
+            self._entries[key] = CachedAnswer(
+                result=dict(result),
+                query_type=key[1],
+                created_at=time.time(),
+                vector=vector
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def put(self, query: str, query_type: str, result: Dict[str, Any]) -> None:
+        """Cache the result for a question, evicting the least recently used answers"""
+        key = (self.normalize(query), query_type)
+        vector = None
+        if self.semantic_enabled:
+            vector = self._pop_pending_vector(key)
+            if vector is None:
+                vector = self._embed(key[0])
+        self._store(key, result, vector)
+
+    async def aput(self, query: str, query_type: str, result: Dict[str, Any]) -> None:
+        """Async counterpart of put"""
+        key = (self.normalize(query), query_type)
+        vector = None
+        if self.semantic_enabled:
+            vector = self._pop_pending_vector(key)
+            if vector is None:
+                vector = await self._aembed(key[0])
+        self._store(key, result, vector)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._pending_vectors.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache hit/miss statistics"""
+        with self._lock:
+            stats = dict(self.stats)
+            entries = len(self._entries)
+        lookups = stats["hits"] + stats["semantic_hits"] + stats["misses"]
+        return {
+            **stats,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "index_version": self.index_version,
+            "hit_rate": (stats["hits"] + stats["semantic_hits"]) / lookups if lookups else 0.0
+        }
@@ -0,0 +1,199 @@
+# app/core/context_packer.py
+
+import logging
+import math
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from app.config.settings import CONTEXT_TOKEN_BUDGET, CONTEXT_TOKEN_ENCODING
+from app.utils.text_splitter import CODE_CLOSE, CODE_OPEN
+
+logger = logging.getLogger(__name__)
+
+SEPARATOR = "\n\n"
+TRUNCATION_MARKER = "\n[...]"
+
+
+class TokenCounter:
+    """Counts tokens with a local tiktoken encoding.
+
+    The encoding is loaded on first use. If it is unavailable (tiktoken not
+    installed, or its BPE file cannot be fetched) tokens are estimated at
+    CHARS_PER_TOKEN characters each, which is close enough to keep a budget.
+    """
+
+    CHARS_PER_TOKEN = 4
+
+    def __init__(self, encoding_name: str = CONTEXT_TOKEN_ENCODING):
+        self.encoding_name = encoding_name
+        self._encoding = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _get_encoding(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    try:
+                        import tiktoken
+                        self._encoding = tiktoken.get_encoding(self.encoding_name)
+                    except Exception as e:
+                        logger.warning(
+                            f"Tokenizer {self.encoding_name} unavailable, estimating tokens from length: {str(e)}"
+                        )
+                    self._loaded = True
+        return self._encoding
+
+    def count(self, text: str) -> int:
+        encoding = self._get_encoding()
+        if encoding is None:
+            return math.ceil(len(text) / self.CHARS_PER_TOKEN)
+        return len(encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Longest prefix of text within max_tokens"""
+        encoding = self._get_encoding()
+        if encoding is None:
+            return text[:max_tokens * self.CHARS_PER_TOKEN]
+        tokens = encoding.encode(text, disallowed_special=())
+        return encoding.decode(tokens[:max_tokens])
+
+
+def overlap_length(first: str, second: str, window: int, min_overlap: int) -> int:
+    """Length of the longest suffix of first (within window) that is a prefix of second"""
+    tail = first[-window:]
+    anchor = second[:min_overlap]
+    if len(anchor) < min_overlap:
+        return 0
+
+    start = tail.find(anchor)
+    while start != -1:
+        if second.startswith(tail[start:]):
+            return len(tail) - start
+        start = tail.find(anchor, start + 1)
+    return 0
+
+
+@dataclass
+class PackedContext:
+    text: str
+    documents: List[Document]
+    stats: Dict[str, Any] = field(default_factory=dict)
+
+
+class ContextPacker:
+    """Packs retrieved chunks into a prompt context of bounded token size.
+
+    Chunks are added in the order given (the retriever's ranking) until the
+    budget is spent; the chunk that does not fit is truncated if enough of
+    the budget is left for it to be useful, and the rest are dropped. Text a
+    chunk shares with an already packed chunk of the same source (the
+    splitter's overlap) is included only once: found from the chunks' source
+    offsets when they have them, and by matching their text otherwise.
+    """
+
+    # Smallest useful remainder of a truncated chunk
+    MIN_TAIL_TOKENS = 100
+    # Overlap search: characters scanned at a chunk edge, and the shortest match
+    OVERLAP_WINDOW = 4000
+    MIN_OVERLAP = 40
+
+    def __init__(self, budget: int = CONTEXT_TOKEN_BUDGET, counter: Optional[TokenCounter] = None):
+        self.budget = budget
+        self.counter = counter or TokenCounter()
+
+    def _dedupe(self, text: str, packed_texts: List[str]) -> str:
+        """Strip the parts of text already present in packed chunks of its source"""
+        for packed in packed_texts:
+            if text in packed:
+                return ""
+            overlap = overlap_length(packed, text, self.OVERLAP_WINDOW, self.MIN_OVERLAP)
+            if overlap:
+                text = text[overlap:]
+                continue
+            overlap = overlap_length(text, packed, self.OVERLAP_WINDOW, self.MIN_OVERLAP)
+            if overlap:
+                text = text[:-overlap]
+        return text
+
+    @staticmethod
+    def _dedupe_by_offsets(text: str, metadata: Dict[str, Any], packed_ranges: List[Tuple[int, int, int]]) -> str:
+        """Strip the overlap windows text shares with packed chunks of its source.
+
+        packed_ranges holds (start_offset, end_offset, window end) of each packed
+        chunk. A window is the start of a chunk's rendered text (after the fence
+        of code), and repeats the end of the chunk before it.
+        """
+        start, end = metadata["start_offset"], metadata["end_offset"]
+        overlap = metadata.get("overlap_size", 0)
+        head_done = tail_done = False
+        for packed_start, packed_end, packed_window_end in packed_ranges:
+            if packed_start <= start and end <= packed_end:
+                return ""
+            # This chunk's window repeats the end of the packed chunk
+            if not head_done and overlap and packed_start <= start < packed_end <= start + overlap:
+                head = len(CODE_OPEN) if text.startswith(CODE_OPEN) else 0
+                text = text[:head] + text[head + overlap:]
+                head_done = True
+            # The packed chunk's window repeats the end of this chunk
+            elif not tail_done and start <= packed_start < end <= packed_window_end:
+                tail = len(text) - (len(CODE_CLOSE) if text.endswith(CODE_CLOSE) else 0)
+                text = text[:tail - (end - packed_start)] + text[tail:]
+                tail_done = True
+        return text
+
+    def pack(self, docs: List[Document]) -> PackedContext:
+        parts, included = [], []
+        texts_by_source: Dict[str, List[str]] = {}
+        ranges_by_source: Dict[str, List[Tuple[int, int, int]]] = {}
+        used = 0
+        stats = {"deduped_chars": 0, "truncated": 0, "dropped": 0}
+        separator_tokens = self.counter.count(SEPARATOR)
+
+        for i, doc in enumerate(docs):
+            original = str(doc.page_content)
+            source = doc.metadata.get("source", "Unknown")
+            has_offsets = "start_offset" in doc.metadata and "end_offset" in doc.metadata
+            if has_offsets:
+                text = self._dedupe_by_offsets(original, doc.metadata, ranges_by_source.get(source, []))
+            else:
+                text = self._dedupe(original, texts_by_source.get(source, []))
+            stats["deduped_chars"] += len(original) - len(text)
+            if not text.strip():
+                continue
+
+            cost = self.counter.count(text) + (separator_tokens if parts else 0)
+            if self.budget > 0 and used + cost > self.budget:
+                remaining = self.budget - used - (separator_tokens if parts else 0)
+                if remaining >= self.MIN_TAIL_TOKENS:
+                    text = self.counter.truncate(text, remaining - self.counter.count(TRUNCATION_MARKER))
+                    text += TRUNCATION_MARKER
+                    parts.append(text)
+                    included.append(doc)
+                    used += (separator_tokens if len(parts) > 1 else 0) + self.counter.count(text)
+                    stats["truncated"] = 1
+                    stats["dropped"] = len(docs) - i - 1
+                else:
+                    stats["dropped"] = len(docs) - i
+                break
+
+            parts.append(text)
+            included.append(doc)
+            texts_by_source.setdefault(source, []).append(original)
+            if has_offsets:
+                start = doc.metadata["start_offset"]
+                ranges_by_source.setdefault(source, []).append(
+                    (start, doc.metadata["end_offset"], start + doc.metadata.get("overlap_size", 0))
+                )
+            used += cost
+
+        stats.update({"tokens": used, "budget": self.budget, "chunks": len(included)})
+        if stats["truncated"] or stats["dropped"] or stats["deduped_chars"]:
+            logger.info(
+                f"Packed {len(included)} of {len(docs)} chunks into {used} tokens "
+                f"({stats['deduped_chars']} overlapping chars removed, {stats['dropped']} dropped)"
+            )
+        return PackedContext(text=SEPARATOR.join(parts), documents=included, stats=stats)
@@ -1,14 +1,22 @@
 # app/core/document_processor.py
 
+import copy
+import hashlib
 import logging
+import os
+import pickle
 import re
 import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 from enum import Enum
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Iterable, Iterator, Tuple, Optional
 from dataclasses import dataclass
 from langchain_core.documents import Document
-from app.utils.text_splitter import CustomMarkdownSplitter
+from app.utils.text_splitter import FENCE, CustomMarkdownSplitter
+from app.utils.timing import phase_timer
 from app.config.settings import (
     CHUNK_SIZE, 
     CHUNK_OVERLAP,
@@ -19,7 +27,9 @@ from app.config.settings import (
     CODE_CHUNK_SIZE,
     CODE_CHUNK_OVERLAP,
     MIN_CODE_CHUNK_SIZE,
-    MAX_CODE_CHUNK_SIZE
+    MAX_CODE_CHUNK_SIZE,
+    DOC_PROCESSING_WORKERS,
+    PARALLEL_LOAD_MIN_FILES
 )
 
 logger = logging.getLogger(__name__)
@@ -28,6 +38,19 @@ class ProcessingError(Exception):
     """Custom exception for document processing errors"""
     pass
 
+def generate_chunk_id(source: str, content: str) -> str:
+    """Deterministic, process-independent ID for a chunk of a source file"""
+    digest = hashlib.sha256(f"{source}\0{content}".encode("utf-8")).hexdigest()
+    return f"{source}_{digest[:32]}"
+
+def index_version(chunk_ids: Iterable[str]) -> str:
+    """Version of an index, derived from the set of chunk IDs it contains"""
+    digest = hashlib.sha256()
+    for chunk_id in sorted(chunk_ids):
+        digest.update(chunk_id.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
 class DocType(Enum):
     RULESET = "ruleset"
     FUNCTIONS = "functions"
@@ -49,23 +72,72 @@ class ProcessingResult:
     documents: List[Document]
     errors: List[str]
 
+@dataclass
+class FrontMatter:
+    title: str
+    doc_type: DocType
+    # Offsets of every code fence, for the splitter
+    fences: List[int]
+
+# Compiled once: the title line opening a document, and its "## Type" section
+TITLE_PATTERN = re.compile(r'# ([^\n]+)')
+TYPE_PATTERN = re.compile(r'^## Type\s*\n([^\n]+)', re.MULTILINE)
+
+def parse_front_matter(content: str) -> FrontMatter:
+    """Title, document type and code fence offsets of a markdown document"""
+    title_match = TITLE_PATTERN.match(content)
+    type_match = TYPE_PATTERN.search(content)
+    title = title_match.group(1).strip() if title_match else "Untitled Document"
+
+    doc_type = DocType.FUNCTIONS
+    if type_match:
+        try:
+            doc_type = DocType(type_match.group(1).strip().lower())
+        except ValueError:
+            logger.warning(f"Unknown document type: {type_match.group(1).strip().lower()}, defaulting to FUNCTIONS")
+    return FrontMatter(title=title, doc_type=doc_type, fences=CustomMarkdownSplitter.find_fences(content))
+
+# Per-process DocumentProcessor used by parallel load_documents workers
+_worker_processor: Optional["DocumentProcessor"] = None
+
+def _init_worker(processor: "DocumentProcessor") -> None:
+    """Install the parent's processor configuration in a worker process"""
+    global _worker_processor
+    _worker_processor = processor
+
+def _process_file_in_worker(file_path: Path) -> Tuple[Optional[ProcessingResult], Dict, Optional[str]]:
+    """Process one file in a worker, returning the result and the stats it produced"""
+    _worker_processor._reset_stats()
+    try:
+        result = _worker_processor._process_file_with_retry(file_path)
+        return result, _worker_processor.processing_stats, None
+    except Exception as e:
+        return None, _worker_processor.processing_stats, str(e)
+
+def _process_files_in_worker(file_paths: List[Path]) -> List[Tuple[Optional[ProcessingResult], Dict, Optional[str]]]:
+    """Process a batch of files in a worker"""
+    return [_process_file_in_worker(file_path) for file_path in file_paths]
+
 class DocumentProcessor:
     def __init__(self, knowledge_base_path: str, 
                  max_retries: int = MAX_RETRIES,
                  retry_delay: float = RETRY_DELAY,
                  min_chunk_size: int = MIN_CHUNK_SIZE,
-                 max_chunk_size: int = MAX_CHUNK_SIZE):
+                 max_chunk_size: int = MAX_CHUNK_SIZE,
+                 max_workers: int = DOC_PROCESSING_WORKERS,
+                 parallel_min_files: int = PARALLEL_LOAD_MIN_FILES):
         """Initialize document processor with configuration"""
         self.knowledge_base_path = Path(knowledge_base_path)
         self.max_retries = max_retries
         self.retry_delay = retry_delay
         self.min_chunk_size = min_chunk_size
         self.max_chunk_size = max_chunk_size
+        self.max_workers = max_workers
+        self.parallel_min_files = parallel_min_files
+        self.failed_files: List[str] = []
+        self._last_load: Optional[Tuple] = None
         self._reset_stats()
-        self.custom_splitter = CustomMarkdownSplitter(
-            chunk_size=CHUNK_SIZE,
-            chunk_overlap=CHUNK_OVERLAP
-        )
+        self.custom_splitter = CustomMarkdownSplitter.for_config(CHUNK_SIZE, CHUNK_OVERLAP)
         logger.info(f"Initialized DocumentProcessor with path: {knowledge_base_path}")
         logger.info(f"Configuration: min_size={min_chunk_size}, max_size={max_chunk_size}")
 
@@ -78,34 +150,16 @@ class DocumentProcessor:
             "total_chunks": 0,
             "retry_count": 0,
             "rejected_chunks": 0,
-            "rejection_reasons": []
+            "rejection_reasons": [],
+            "timings": {"load": 0.0, "chunk": 0.0}
         }
 
-    def _extract_document_type(self, content: str) -> DocType:
-        """Extract document type from markdown content"""
-        type_pattern = r'^## Type\s*\n([^\n]+)'
-        if match := re.search(type_pattern, content, re.MULTILINE):
-            doc_type = match.group(1).strip().lower()
-            try:
-                return DocType(doc_type)
-            except ValueError:
-                logger.warning(f"Unknown document type: {doc_type}, defaulting to FUNCTIONS")
-                return DocType.FUNCTIONS
-        return DocType.FUNCTIONS
-
-    def _extract_title(self, content: str) -> str:
-        """Extract document title from markdown content"""
-        title_pattern = r'^# ([^\n]+)'
-        if match := re.search(title_pattern, content):
-            return match.group(1).strip()
-        return "Untitled Document"
-
     def _process_document_by_type(self, content: str, file_name: str) -> List[Document]:
         """Process document based on its type"""
         try:
-            # Extract document type and title
-            doc_type = self._extract_document_type(content)
-            title = self._extract_title(content)
+            # Extract document type, title and code fences in one pass
+            front_matter = parse_front_matter(content)
+            doc_type, title = front_matter.doc_type, front_matter.title
             logger.info(f"Processing document {file_name} of type: {doc_type.value}")
             logger.debug(f"Document title: {title}")
             logger.debug(f"Content length: {len(content)} chars")
@@ -126,19 +180,15 @@ class DocumentProcessor:
             
             logger.debug(f"Chunking with size={chunk_size}, overlap={chunk_overlap}")
             
-            splitter = CustomMarkdownSplitter(
-                chunk_size=chunk_size,
-                chunk_overlap=chunk_overlap
-            )
-            
-            chunks = splitter.split_text(content)
+            splitter = CustomMarkdownSplitter.for_config(chunk_size, chunk_overlap)
+            chunks = splitter.split_chunks(content, front_matter.fences)
             logger.info(f"Split document into {len(chunks)} chunks")
 
             # Create documents with metadata
             documents = []
-            for i, chunk in enumerate(chunks):
+            for i, (chunk, start_offset, end_offset, overlap) in enumerate(chunks):
                 if chunk.strip():  # Skip empty chunks
-                    has_code = bool(re.search(r'```', chunk))
+                    has_code = FENCE in chunk
                     logger.debug(f"Processing chunk {i+1}/{len(chunks)}, has_code={has_code}")
                     
                     # Use different size limits based on content type
@@ -155,6 +205,7 @@ class DocumentProcessor:
                         continue
                     
                     metadata = {
+                        "chunk_id": generate_chunk_id(file_name, chunk),
                         "source": file_name,
                         "doc_type": doc_type.value,
                         "title": title,
@@ -162,7 +213,12 @@ class DocumentProcessor:
                         "chunk_index": i,
                         "total_chunks": len(chunks),
                         "processing_attempts": 0,
-                        "chunk_size": chunk_length  # Added for debugging
+                        "chunk_size": chunk_length,  # Added for debugging
+                        # Where the chunk lies in the file, and how much of its start
+                        # repeats the previous chunk, so overlaps can be merged
+                        "start_offset": start_offset,
+                        "end_offset": end_offset,
+                        "overlap_size": overlap
                     }
                     
                     doc = Document(
@@ -178,50 +234,195 @@ class DocumentProcessor:
             logger.error(f"Error processing document {file_name}: {str(e)}")
             raise ProcessingError(f"Failed to process document: {str(e)}")
 
-    def load_documents(self) -> List[Document]:
-        """Load and process all documents with improved error handling"""
-        all_documents = []
+    def list_files(self) -> List[Path]:
+        """Knowledge base files, sorted so chunk order is deterministic"""
+        return sorted(self.knowledge_base_path.glob('*.md'), key=str)
+
+    def config_fingerprint(self) -> str:
+        """Digest of every setting that affects how files are chunked"""
+        config = (
+            CHUNK_SIZE, CHUNK_OVERLAP, CODE_CHUNK_SIZE, CODE_CHUNK_OVERLAP,
+            MIN_CHUNK_SIZE, MAX_CHUNK_SIZE, MIN_CODE_CHUNK_SIZE, MAX_CODE_CHUNK_SIZE,
+            self.min_chunk_size, self.max_chunk_size, CustomMarkdownSplitter.VERSION
+        )
+        return hashlib.sha256(repr(config).encode("utf-8")).hexdigest()[:16]
+
+    def _snapshot_key(self, md_files: List[Path]) -> Optional[Tuple]:
+        """Identity of a set of files as of now; None if it cannot be determined"""
+        try:
+            stats = [(str(p), p.stat()) for p in md_files]
+            files = tuple((name, stat.st_mtime_ns, stat.st_size) for name, stat in stats)
+            return (self.config_fingerprint(), files)
+        except Exception:
+            return None
+
+    def clear_cache(self) -> None:
+        """Drop the memoized result of the last load"""
+        self._last_load = None
+
+    def load_documents(self, file_paths: Optional[List[Path]] = None) -> List[Document]:
+        """Load and process all documents (or only file_paths) with improved error handling.
+
+        The result is memoized per knowledge base snapshot, so retries and repeated
+        calls over unchanged files do not re-read or re-chunk anything.
+        """
+        # Sort so chunk order is deterministic regardless of filesystem or worker scheduling
+        md_files = self.list_files() if file_paths is None else sorted(file_paths, key=str)
+        snapshot_key = self._snapshot_key(md_files)
+        if self._restore_last_load(snapshot_key):
+            return list(self._last_load[1])
+        
+        all_documents = list(self._stream_documents(md_files, require_documents=file_paths is None))
+        if snapshot_key is not None:
+            self._last_load = (
+                snapshot_key, list(all_documents),
+                copy.deepcopy(self.processing_stats), list(self.failed_files)
+            )
+        return all_documents
+
+    def iter_documents(self, file_paths: Optional[List[Path]] = None) -> Iterator[Document]:
+        """Stream the chunks of all documents (or only file_paths), one file at a time.
+
+        Unlike load_documents the corpus is never held in memory: each file's
+        chunks are yielded as soon as it is processed. processing_stats and
+        failed_files are final once the iterator is exhausted. A memoized load
+        of the same snapshot is replayed, but streamed loads are not memoized.
+        """
+        md_files = self.list_files() if file_paths is None else sorted(file_paths, key=str)
+        if self._restore_last_load(self._snapshot_key(md_files)):
+            yield from list(self._last_load[1])
+            return
+        yield from self._stream_documents(md_files, require_documents=file_paths is None)
+
+    def _restore_last_load(self, snapshot_key: Optional[Tuple]) -> bool:
+        """Restore stats of the memoized load if it is of the same snapshot"""
+        if snapshot_key is None or not self._last_load or self._last_load[0] != snapshot_key:
+            return False
+        _, documents, stats, failed = self._last_load
+        logger.info(f"Reusing {len(documents)} chunks loaded from an unchanged knowledge base snapshot")
+        self.processing_stats = copy.deepcopy(stats)
+        self.failed_files = list(failed)
+        return True
+
+    def _stream_documents(self, md_files: List[Path], require_documents: bool) -> Iterator[Document]:
+        """Process md_files in order, yielding each file's chunks and recording stats"""
         failed_files = []
         self._reset_stats()  # Reset stats at start of loading
         
         logger.info(f"Starting document loading from {self.knowledge_base_path}")
         
         try:
-            md_files = list(self.knowledge_base_path.glob('*.md'))
             self.processing_stats["total_files"] = len(md_files)
             
-            for file_path in md_files:
-                try:
-                    logger.info(f"Processing file: {file_path.name}")
-                    result = self._process_file_with_retry(file_path)
-                    
-                    if result.success and result.documents:
-                        all_documents.extend(result.documents)
-                        self.processing_stats["successful_files"] += 1
-                        self.processing_stats["total_chunks"] += len(result.documents)
-                        logger.info(f"Successfully processed {file_path.name}: {len(result.documents)} chunks created")
-                    else:
-                        failed_files.append((file_path.name, result.errors))
-                        self.processing_stats["failed_files"] += 1
-                        logger.warning(f"Failed to process {file_path.name} after all retries")
-                        
-                except Exception as e:
-                    failed_files.append((file_path.name, [str(e)]))
+            for file_path, result, error in self._process_files(md_files):
+                if error is not None:
+                    failed_files.append((file_path.name, [error]))
                     self.processing_stats["failed_files"] += 1
-                    logger.error(f"Error processing {file_path.name}: {str(e)}")
-                    continue
+                    logger.error(f"Error processing {file_path.name}: {error}")
+                elif result.success and result.documents:
+                    self.processing_stats["successful_files"] += 1
+                    self.processing_stats["total_chunks"] += len(result.documents)
+                    logger.info(f"Successfully processed {file_path.name}: {len(result.documents)} chunks created")
+                    yield from result.documents
+                else:
+                    failed_files.append((file_path.name, result.errors))
+                    self.processing_stats["failed_files"] += 1
+                    logger.warning(f"Failed to process {file_path.name} after all retries")
             
             self._log_processing_summary(failed_files)
+            self.failed_files = [file_name for file_name, _ in failed_files]
             
-            if not all_documents:
+            # A partial (incremental) load may legitimately yield nothing
+            if require_documents and not self.processing_stats["total_chunks"]:
                 raise ValueError("No valid documents were successfully processed")
-                
-            return all_documents
             
         except Exception as e:
             logger.error(f"Critical error during document loading: {str(e)}")
             raise
 
+    def _resolve_workers(self, file_count: int) -> int:
+        """Number of worker processes to use for a load of file_count files"""
+        workers = self.max_workers or os.cpu_count() or 1
+        if workers <= 1 or file_count < self.parallel_min_files:
+            return 1
+        return min(workers, file_count)
+
+    def _process_files(self, md_files: List[Path]) -> Iterator[Tuple[Path, Optional[ProcessingResult], Optional[str]]]:
+        """Process files serially or across a process pool, yielding results in input order"""
+        workers = self._resolve_workers(len(md_files))
+        self.processing_stats["workers"] = workers
+        
+        if workers > 1:
+            try:
+                executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    initializer=_init_worker,
+                    initargs=(self,)
+                )
+            except (OSError, ValueError, NotImplementedError) as e:
+                logger.warning(f"Process pool unavailable ({str(e)}), loading documents serially")
+                self.processing_stats["workers"] = workers = 1
+        
+        if workers == 1:
+            yield from self._process_files_serially(md_files)
+            return
+        
+        logger.info(f"Processing {len(md_files)} files across {workers} worker processes")
+        with executor:
+            # Batch several files per task to amortize pickling overhead, and keep
+            # only a few tasks in flight so results never pile up ahead of a slow
+            # consumer (executor.map would submit every file up front)
+            chunksize = max(1, len(md_files) // (workers * 4))
+            batches = [md_files[i:i + chunksize] for i in range(0, len(md_files), chunksize)]
+            pending = deque()
+            for batch in batches:
+                try:
+                    future = executor.submit(_process_files_in_worker, batch)
+                except BrokenProcessPool:
+                    # Already reported by the batch that broke the pool
+                    future = None
+                pending.append((batch, future))
+                if len(pending) < workers * 2:
+                    continue
+                yield from self._collect_batch(*pending.popleft())
+            while pending:
+                yield from self._collect_batch(*pending.popleft())
+
+    def _process_files_serially(self, md_files: List[Path]) -> Iterator[Tuple[Path, Optional[ProcessingResult], Optional[str]]]:
+        """Process files one by one in this process"""
+        for file_path in md_files:
+            try:
+                logger.info(f"Processing file: {file_path.name}")
+                yield file_path, self._process_file_with_retry(file_path), None
+            except Exception as e:
+                yield file_path, None, str(e)
+
+    def _collect_batch(self, batch: List[Path], future) -> Iterator[Tuple[Path, Optional[ProcessingResult], Optional[str]]]:
+        """Wait for a worker batch and yield its per-file results in order.
+
+        If the pool broke (a worker died) or the batch could not be pickled,
+        its files are processed serially here instead.
+        """
+        try:
+            results = future.result() if future is not None else None
+        except (BrokenProcessPool, pickle.PicklingError) as e:
+            logger.warning(f"Worker batch failed ({str(e) or type(e).__name__}), processing {len(batch)} files serially")
+            results = None
+        if results is None:
+            yield from self._process_files_serially(batch)
+            return
+        for file_path, (result, stats, error) in zip(batch, results):
+            self._merge_worker_stats(stats)
+            yield file_path, result, error
+
+    def _merge_worker_stats(self, stats: Dict) -> None:
+        """Fold per-file statistics reported by a worker process into processing_stats"""
+        self.processing_stats["retry_count"] += stats.get("retry_count", 0)
+        self.processing_stats["rejected_chunks"] += stats.get("rejected_chunks", 0)
+        self.processing_stats["rejection_reasons"].extend(stats.get("rejection_reasons", []))
+        for phase, seconds in stats.get("timings", {}).items():
+            self.processing_stats["timings"][phase] = self.processing_stats["timings"].get(phase, 0.0) + seconds
+
     def _process_file_with_retry(self, file_path: Path) -> ProcessingResult:
         """Process a single file with retry logic"""
         errors = []
@@ -230,8 +431,10 @@ class DocumentProcessor:
         
         while retry_count <= self.max_retries:
             try:
-                content = file_path.read_text(encoding='utf-8')
-                documents = self._process_document_by_type(content, file_path.name)
+                with phase_timer(self.processing_stats["timings"], "load"):
+                    content = file_path.read_text(encoding='utf-8')
+                with phase_timer(self.processing_stats["timings"], "chunk"):
+                    documents = self._process_document_by_type(content, file_path.name)
                 
                 valid_documents = []
                 for doc in documents:
@@ -244,6 +447,10 @@ class DocumentProcessor:
                 
                 if valid_documents:
                     return ProcessingResult(True, valid_documents, errors)
+                
+                # Re-reading the same content cannot produce different chunks
+                errors.append("No valid chunks produced")
+                return ProcessingResult(False, [], errors)
                     
             except Exception as e:
                 error_msg = f"Attempt {retry_count + 1}/{self.max_retries + 1} failed: {str(e)}"
@@ -0,0 +1,255 @@
+# app/core/embedding_cache.py
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """Persistent, size-bounded LRU cache of document embeddings.
+
+    Entries are keyed by (model, sha256 of the normalized text) and stored as
+    float32 blobs in a local SQLite file, so a rebuild of an unchanged
+    knowledge base never has to go back to the embedding provider.
+    """
+
+    # SQLite caps the number of bound parameters per statement
+    QUERY_BATCH_SIZE = 500
+
+    def __init__(self, path: Union[str, Path], model: str, max_entries: int = 50000):
+        self.path = Path(path)
+        self.model = model
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)"
+            )
+        logger.info(f"Embedding cache ready at {self.path} ({len(self)} entries)")
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        """Content address of an (already normalized) text"""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, text_hashes: Iterable[str]) -> Dict[str, List[float]]:
+        """Look up embeddings by hash, refreshing the LRU timestamp of every hit"""
+        keys = list(dict.fromkeys(text_hashes))
+        found: Dict[str, List[float]] = {}
+        if not keys:
+            return found
+
+        with self._lock:
+            for i in range(0, len(keys), self.QUERY_BATCH_SIZE):
+                batch = keys[i:i + self.QUERY_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",
+                    [self.model, *batch]
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=np.float32).tolist()
+
+            if found:
+                now = time.time()
+                with self._conn:
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                        [(now, self.model, text_hash) for text_hash in found]
+                    )
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+
+        return found
+
+    def put_many(self, vectors: Dict[str, List[float]]) -> None:
+        """Store embeddings and evict the least recently used entries over the size bound"""
+        if not vectors:
+            return
+
+        now = time.time()
+        rows = [
+            (self.model, text_hash, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for text_hash, vector in vectors.items()
+        ]
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows
+                )
+                self._evict()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the cache fits max_entries"""
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow <= 0:
+            return
+
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN "
+            "(SELECT rowid FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+            (overflow,)
+        )
+        self.evictions += overflow
+        logger.debug(f"Evicted {overflow} embeddings from cache")
+
+    def get_stats(self) -> Dict:
+        """Get cache hit/miss statistics"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def close(self) -> None:
+        """Close the underlying SQLite connection"""
+        with self._lock:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that serves document embeddings from an EmbeddingCache.
+
+    Only texts missing from the cache are sent to the wrapped model, in a single
+    embed_documents call. Query embeddings are kept in a small in-process LRU
+    keyed on the normalized question; misses go through query_batcher (any
+    object with an embed(text) method) when one is given, so concurrent
+    queries can share a request.
+    """
+
+    def __init__(self, underlying: Embeddings, cache: EmbeddingCache,
+                 normalize: Optional[Callable[[str], str]] = None,
+                 query_cache_size: int = 1024,
+                 query_batcher: Optional[Any] = None):
+        self.underlying = underlying
+        self.cache = cache
+        self.normalize = normalize or (lambda text: " ".join(str(text).split()))
+        self.query_cache_size = query_cache_size
+        self.query_stats = {"hits": 0, "misses": 0}
+        self._query_vectors: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._query_lock = threading.Lock()
+        self.query_batcher = query_batcher
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self.cache.text_hash(self.normalize(text)) for text in texts]
+        vectors = self.cache.get_many(keys)
+
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+
+        if missing:
+            logger.info(f"Embedding {len(missing)} uncached texts ({len(vectors)} served from cache)")
+            new_vectors = self.underlying.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), new_vectors))
+            self.cache.put_many(fresh)
+            vectors.update(fresh)
+
+        return [vectors[key] for key in keys]
+
+    def _cached_query(self, key: str) -> Optional[List[float]]:
+        with self._query_lock:
+            vector = self._query_vectors.get(key)
+            if vector is not None:
+                self._query_vectors.move_to_end(key)
+                self.query_stats["hits"] += 1
+                return list(vector)
+            self.query_stats["misses"] += 1
+            return None
+
+    def _cache_query(self, key: str, vector: List[float]) -> None:
+        if self.query_cache_size <= 0:
+            return
+        with self._query_lock:
+            self._query_vectors[key] = vector
+            self._query_vectors.move_to_end(key)
+            while len(self._query_vectors) > self.query_cache_size:
+                self._query_vectors.popitem(last=False)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self.normalize(text)
+        vector = self._cached_query(key)
+        if vector is not None:
+            return vector
+
+        if self.query_batcher is not None:
+            vector = self.query_batcher.embed(key)
+        else:
+            vector = self.underlying.embed_query(key)
+        self._cache_query(key, vector)
+        return list(vector)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several queries, sending only the uncached ones in one batched call"""
+        keys = [self.normalize(text) for text in texts]
+        vectors = {}
+        for key in keys:
+            if key not in vectors:
+                vectors[key] = self._cached_query(key)
+
+        missing = [key for key, vector in vectors.items() if vector is None]
+        if missing:
+            embed_queries = getattr(self.underlying, "embed_queries", None)
+            if embed_queries is not None:
+                new_vectors = embed_queries(missing)
+            else:
+                new_vectors = [self.underlying.embed_query(key) for key in missing]
+            for key, vector in zip(missing, new_vectors):
+                self._cache_query(key, vector)
+                vectors[key] = vector
+
+        return [list(vectors[key]) for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = self.normalize(text)
+        vector = self._cached_query(key)
+        if vector is not None:
+            return vector
+
+        vector = await self.underlying.aembed_query(key)
+        self._cache_query(key, vector)
+        return list(vector)
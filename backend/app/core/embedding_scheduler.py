@@ -0,0 +1,261 @@
+# app/core/embedding_scheduler.py
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from app.utils.validators import classify_cohere_error, handle_cohere_error
+from app.config.settings import (
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_MAX_CONCURRENCY,
+    EMBEDDING_REQUESTS_PER_MINUTE,
+    MAX_RETRIES,
+    RETRY_DELAY
+)
+
+logger = logging.getLogger(__name__)
+
+# Errors that will not go away by retrying the same request
+NON_RETRYABLE_ERRORS = {'invalid_api_key', 'invalid_model', 'context_length'}
+
+
+class TokenBucket:
+    """Thread-safe token bucket whose refill rate adapts to provider rate limits.
+
+    The rate is halved on every rate-limit error and recovers additively after
+    each successful request, up to the configured maximum (AIMD).
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, min_rate: Optional[float] = None):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate or rate / 16
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _try_acquire(self) -> float:
+        """Take a token if one is available; otherwise return how long to wait"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now >= self._paused_until and self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return max(self._paused_until - now, (1 - self.tokens) / self.rate)
+
+    def acquire(self) -> None:
+        """Block until a request token is available"""
+        while True:
+            wait = self._try_acquire()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def aacquire(self) -> None:
+        """Wait, without blocking the event loop, until a request token is available"""
+        while True:
+            wait = self._try_acquire()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def penalize(self, retry_after: Optional[float] = None) -> None:
+        """Back off after a rate-limit response"""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0
+            pause = retry_after if retry_after is not None else 1 / self.rate
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+        logger.warning(f"Embedding rate limited, throttling to {self.rate * 60:.1f} requests/min")
+
+    def reward(self) -> None:
+        """Recover throughput after a successful request"""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class EmbeddingScheduler(Embeddings):
+    """Embeddings wrapper that fans large batches out over a bounded pool of requests.
+
+    Texts are split into provider-sized batches, embedded by up to
+    max_concurrency in-flight requests gated by an adaptive token bucket, and
+    failed batches are retried with backoff instead of being dropped.
+    """
+
+    def __init__(self, underlying: Embeddings,
+                 batch_size: int = EMBEDDING_BATCH_SIZE,
+                 max_concurrency: int = EMBEDDING_MAX_CONCURRENCY,
+                 requests_per_minute: float = EMBEDDING_REQUESTS_PER_MINUTE,
+                 max_retries: int = MAX_RETRIES,
+                 retry_delay: float = RETRY_DELAY):
+        self.underlying = underlying
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.rate_limiter = TokenBucket(
+            rate=requests_per_minute / 60,
+            capacity=self.max_concurrency
+        )
+        self.stats = {"requests": 0, "retries": 0, "rate_limited": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    @staticmethod
+    def _retry_after(e: Exception) -> Optional[float]:
+        """Extract a Retry-After hint from a provider error, if any"""
+        headers = getattr(e, 'headers', None) or {}
+        try:
+            value = headers.get('retry-after') or headers.get('Retry-After')
+            return float(value) if value is not None else None
+        except (TypeError, ValueError, AttributeError):
+            return None
+
+    def _call_with_retry(self, func: Callable[..., Any], *args) -> Any:
+        """Run one provider request under the rate limiter, retrying transient failures"""
+        delay = self.retry_delay
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                self._count("requests")
+                result = func(*args)
+                self.rate_limiter.reward()
+                return result
+            except Exception as e:
+                error_kind = classify_cohere_error(e)
+                if error_kind in NON_RETRYABLE_ERRORS or attempt == self.max_retries:
+                    logger.error(f"Embedding request failed after {attempt + 1} attempts: {str(e)}")
+                    handle_cohere_error(e)
+
+                self._count("retries")
+                if error_kind == 'rate_limit':
+                    self._count("rate_limited")
+                    self.rate_limiter.penalize(self._retry_after(e))
+                else:
+                    logger.warning(f"Embedding request failed ({str(e)}), retrying in {delay} seconds...")
+                    time.sleep(delay)
+                    delay *= 2
+
+    async def _acall_with_retry(self, func: Callable[..., Any], *args) -> Any:
+        """Async counterpart of _call_with_retry for the provider's async client"""
+        delay = self.retry_delay
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.aacquire()
+            try:
+                self._count("requests")
+                result = await func(*args)
+                self.rate_limiter.reward()
+                return result
+            except Exception as e:
+                error_kind = classify_cohere_error(e)
+                if error_kind in NON_RETRYABLE_ERRORS or attempt == self.max_retries:
+                    logger.error(f"Embedding request failed after {attempt + 1} attempts: {str(e)}")
+                    handle_cohere_error(e)
+
+                self._count("retries")
+                if error_kind == 'rate_limit':
+                    self._count("rate_limited")
+                    self.rate_limiter.penalize(self._retry_after(e))
+                else:
+                    logger.warning(f"Embedding request failed ({str(e)}), retrying in {delay} seconds...")
+                    await asyncio.sleep(delay)
+                    delay *= 2
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1:
+            return self._call_with_retry(self.underlying.embed_documents, batches[0])
+
+        logger.info(
+            f"Embedding {len(texts)} texts in {len(batches)} batches "
+            f"with up to {self.max_concurrency} concurrent requests"
+        )
+        workers = min(self.max_concurrency, len(batches))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embed") as executor:
+            results = executor.map(
+                lambda batch: self._call_with_retry(self.underlying.embed_documents, batch),
+                batches
+            )
+            return [vector for batch_vectors in results for vector in batch_vectors]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._call_with_retry(self.underlying.embed_query, text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self._acall_with_retry(self.underlying.aembed_query, text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several search queries with as few requests as possible"""
+        embed = getattr(self.underlying, 'embed', None)
+        if embed is None:
+            return [self.embed_query(text) for text in texts]
+
+        # Cohere embeds queries and documents differently; keep the query input type
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            vectors.extend(self._call_with_retry(
+                lambda batch: embed(batch, input_type="search_query"),
+                texts[i:i + self.batch_size]
+            ))
+        return vectors
+
+
+class QueryBatcher:
+    """Coalesces concurrent single-query embedding calls into batched requests.
+
+    The first caller to arrive waits `window` seconds for others, then embeds
+    every distinct text queued meanwhile in one call and hands each waiting
+    caller its own vector.
+    """
+
+    def __init__(self, embed_many: Callable[[List[str]], List[List[float]]], window: float):
+        self.embed_many = embed_many
+        self.window = window
+        self.stats = {"requests": 0, "batches": 0}
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def embed(self, text: str) -> List[float]:
+        with self._lock:
+            self.stats["requests"] += 1
+            future = self._pending.get(text)
+            is_leader = future is None and not self._pending
+            if future is None:
+                future = Future()
+                self._pending[text] = future
+
+        if not is_leader:
+            return future.result()
+
+        time.sleep(self.window)
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            self.stats["batches"] += 1
+
+        try:
+            vectors = self.embed_many(list(batch.keys()))
+            for pending, vector in zip(batch.values(), vectors):
+                pending.set_result(vector)
+        except Exception as e:
+            for pending in batch.values():
+                if not pending.done():
+                    pending.set_exception(e)
+        return future.result()
@@ -0,0 +1,133 @@
+# app/core/ingestion_manifest.py
+
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Union
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FileRecord:
+    mtime: float
+    size: int
+    sha256: str
+    chunk_ids: List[str] = field(default_factory=list)
+
+
+@dataclass
+class ManifestDiff:
+    changed: List[Path]
+    unchanged: List[str]
+    removed: List[str]
+
+
+class IngestionManifest:
+    """Persisted record of which knowledge base files produced which chunks.
+
+    Lets warm boots skip reading and chunking files whose mtime/size (or, if
+    those moved, content hash) match the last successful ingestion.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: Union[str, Path], fingerprint: str):
+        self.path = Path(path)
+        self.fingerprint = fingerprint
+        self.files: Dict[str, FileRecord] = {}
+        self.load()
+
+    @staticmethod
+    def hash_file(file_path: Path) -> str:
+        """sha256 of a file's bytes"""
+        return hashlib.sha256(file_path.read_bytes()).hexdigest()
+
+    def load(self) -> None:
+        """Load the manifest, discarding it if it was built with other settings"""
+        self.files = {}
+        if not self.path.exists():
+            return
+
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            if data.get("version") != self.VERSION or data.get("fingerprint") != self.fingerprint:
+                logger.info("Ingestion manifest built with different settings, ignoring it")
+                return
+            self.files = {name: FileRecord(**record) for name, record in data.get("files", {}).items()}
+            logger.info(f"Loaded ingestion manifest with {len(self.files)} files")
+        except Exception as e:
+            logger.warning(f"Could not read ingestion manifest {self.path}: {str(e)}")
+            self.files = {}
+
+    def save(self) -> None:
+        """Atomically write the manifest to disk"""
+        data = {
+            "version": self.VERSION,
+            "fingerprint": self.fingerprint,
+            "files": {name: asdict(record) for name, record in sorted(self.files.items())}
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Per-process temp file: several server workers may save concurrently
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(data), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def diff(self, file_paths: Iterable[Path]) -> ManifestDiff:
+        """Classify files as changed/new, unchanged or removed since the last ingestion"""
+        changed, unchanged = [], []
+        seen = set()
+
+        for file_path in file_paths:
+            seen.add(file_path.name)
+            record = self.files.get(file_path.name)
+            if record is None:
+                changed.append(file_path)
+                continue
+
+            stat = file_path.stat()
+            if stat.st_mtime == record.mtime and stat.st_size == record.size:
+                unchanged.append(file_path.name)
+                continue
+
+            # Touched but possibly identical: fall back to the content hash
+            if stat.st_size == record.size and self.hash_file(file_path) == record.sha256:
+                record.mtime = stat.st_mtime
+                unchanged.append(file_path.name)
+            else:
+                changed.append(file_path)
+
+        removed = [name for name in self.files if name not in seen]
+        logger.info(
+            f"Ingestion manifest: {len(changed)} changed, "
+            f"{len(unchanged)} unchanged, {len(removed)} removed files"
+        )
+        return ManifestDiff(changed=changed, unchanged=unchanged, removed=removed)
+
+    def record(self, file_path: Path, chunk_ids: List[str]) -> None:
+        """Record a successfully ingested file and the chunks it produced"""
+        stat = file_path.stat()
+        self.files[file_path.name] = FileRecord(
+            mtime=stat.st_mtime,
+            size=stat.st_size,
+            sha256=self.hash_file(file_path),
+            chunk_ids=list(chunk_ids)
+        )
+
+    def remove(self, file_name: str) -> None:
+        self.files.pop(file_name, None)
+
+    def clear(self) -> None:
+        self.files = {}
+
+    def chunk_ids_for(self, file_names: Iterable[str]) -> Set[str]:
+        """All chunk IDs recorded for the given files"""
+        chunk_ids = set()
+        for name in file_names:
+            record = self.files.get(name)
+            if record:
+                chunk_ids.update(record.chunk_ids)
+        return chunk_ids
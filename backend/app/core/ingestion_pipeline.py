@@ -0,0 +1,104 @@
+# app/core/ingestion_pipeline.py
+
+import logging
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of a stage's input
+_DONE = object()
+
+
+class IngestionPipeline:
+    """Runs items through a chain of stages, each on its own thread.
+
+    Stages are connected by bounded queues: when a stage falls behind, the
+    queue in front of it fills and the stages upstream block, so at most
+    depth items wait between any two stages. The source is consumed on the
+    calling thread, overlapping with the stages. The first exception raised
+    anywhere stops every stage and is re-raised by run().
+    """
+
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, stages: List[Callable[[Any], Any]], depth: int = 2, name: str = "ingest"):
+        if not stages:
+            raise ValueError("IngestionPipeline needs at least one stage")
+        self.stages = stages
+        self.depth = max(1, depth)
+        self.name = name
+        self.stats: Dict[str, Any] = {}
+
+    def run(self, source: Iterable[Any]) -> Dict[str, Any]:
+        """Feed every item of source through the stages and wait for them to drain"""
+        queues = [queue.Queue(maxsize=self.depth) for _ in self.stages]
+        stop = threading.Event()
+        errors: List[BaseException] = []
+        processed = [0] * len(self.stages)
+        max_waiting = [0] * len(self.stages)
+
+        def put(target: queue.Queue, item: Any) -> bool:
+            while not stop.is_set():
+                try:
+                    target.put(item, timeout=self.POLL_INTERVAL)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def get(source_queue: queue.Queue) -> Any:
+            while not stop.is_set():
+                try:
+                    return source_queue.get(timeout=self.POLL_INTERVAL)
+                except queue.Empty:
+                    continue
+            return _DONE
+
+        def fail(error: BaseException) -> None:
+            errors.append(error)
+            stop.set()
+
+        def work(index: int) -> None:
+            stage = self.stages[index]
+            inbox = queues[index]
+            outbox = queues[index + 1] if index + 1 < len(queues) else None
+            try:
+                while True:
+                    max_waiting[index] = max(max_waiting[index], inbox.qsize())
+                    item = get(inbox)
+                    if item is _DONE:
+                        break
+                    result = stage(item)
+                    processed[index] += 1
+                    if outbox is not None and not put(outbox, result):
+                        break
+            except BaseException as e:
+                fail(e)
+            finally:
+                if outbox is not None:
+                    put(outbox, _DONE)
+
+        threads = [
+            threading.Thread(target=work, args=(i,), name=f"{self.name}-stage-{i}", daemon=True)
+            for i in range(len(self.stages))
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            for item in source:
+                if not put(queues[0], item):
+                    break
+        except BaseException as e:
+            fail(e)
+        finally:
+            put(queues[0], _DONE)
+            for thread in threads:
+                thread.join()
+
+        self.stats = {"processed": processed, "max_waiting": max_waiting, "depth": self.depth}
+        if errors:
+            raise errors[0]
+        return self.stats
@@ -1,12 +1,17 @@
 # File: backend/app/core/initializer.py
 
+import json
 import logging
+import os
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 import time
-from typing import Any, Callable
+from typing import Any, Callable, Dict, Optional
 from app.core.document_processor import DocumentProcessor
 from app.core.vector_store import VectorStoreManager
 from app.core.qa_chain import QAChainManager
+from app.utils.timing import phase_timer
 from app.config.settings import (
     CHUNK_SIZE,
     CHUNK_OVERLAP,
@@ -19,6 +24,69 @@ from app.config.settings import (
 
 logger = logging.getLogger(__name__)
 
+# Written by the process that builds the index so workers forked from it
+# can follow its initialization
+STARTUP_STATE_FILE = "startup_state.json"
+PARENT_POLL_INTERVAL = 0.5
+
+class StartupState:
+    """Thread-safe, phase-by-phase readiness of application initialization"""
+    PHASES = ("doc_processor", "vector_store", "qa_chain")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.status = "pending"
+            self.phases = {phase: "pending" for phase in self.PHASES}
+            self.error = None
+            self.started_at = None
+            self.pid = None
+
+    def start(self):
+        with self._lock:
+            self.status = "initializing"
+            self.phases = {phase: "pending" for phase in self.PHASES}
+            self.error = None
+            self.started_at = time.time()
+            self.pid = os.getpid()
+
+    def after_fork(self):
+        """Replace the lock, which a parent thread may have held at fork()"""
+        self._lock = threading.Lock()
+
+    def set_phase(self, phase: str, status: str):
+        with self._lock:
+            self.phases[phase] = status
+
+    def mark_ready(self):
+        with self._lock:
+            self.status = "ready"
+
+    def mark_failed(self, error: str):
+        with self._lock:
+            self.status = "failed"
+            self.error = error
+            for phase, status in self.phases.items():
+                if status == "running":
+                    self.phases[phase] = "failed"
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "status": self.status,
+                "ready": self.status == "ready",
+                "phases": dict(self.phases),
+                "error": self.error,
+                "elapsed_seconds": round(time.time() - self.started_at, 3) if self.started_at else None
+            }
+
 class AppComponents:
     """Singleton to store application components"""
     doc_processor = None
@@ -26,6 +94,9 @@ class AppComponents:
     vector_store = None
     qa_chain_manager = None
     qa_chain = None
+    startup_timings = {}
+    startup_state = StartupState()
+    init_thread = None
 
 def _retry_with_backoff(func: Callable[[], Any], max_retries: int = MAX_RETRIES, initial_delay: float = RETRY_DELAY) -> Any:
     """Helper function to retry operations with exponential backoff"""
@@ -40,10 +111,66 @@ def _retry_with_backoff(func: Callable[[], Any], max_retries: int = MAX_RETRIES,
             logger.warning(f"Attempt {attempt + 1} failed: {str(e)}. Retrying in {delay} seconds...")
             time.sleep(delay)
 
+def _collect_startup_timings(vector_store_seconds: float, chain_build_seconds: float, total_seconds: float) -> Dict[str, float]:
+    """Per-phase startup durations: load, chunk, embed, index, chain_build"""
+    processing_timings = AppComponents.doc_processor.get_processing_stats().get("timings", {})
+    store_timings = AppComponents.vector_store_manager.timings
+    timings = {
+        "load": processing_timings.get("load", 0.0),
+        "chunk": processing_timings.get("chunk", 0.0),
+        "embed": store_timings.get("embed", 0.0),
+        "index": store_timings.get("index", 0.0),
+        "vector_store": vector_store_seconds,
+        "chain_build": chain_build_seconds,
+        "total": total_seconds
+    }
+    return {phase: round(seconds, 3) for phase, seconds in timings.items()}
+
+def _startup_state_path() -> Path:
+    return Path(CACHE_DIR) / STARTUP_STATE_FILE
+
+def _publish_startup_state():
+    """Share this process's startup outcome with workers forked from it"""
+    state = AppComponents.startup_state
+    manager = AppComponents.vector_store_manager
+    data = {
+        **state.snapshot(),
+        "pid": state.pid,
+        "started_at": state.started_at,
+        "persist_directory": str(manager.persist_directory) if manager else None
+    }
+    path = _startup_state_path()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(data), encoding="utf-8")
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.warning(f"Could not publish startup state: {str(e)}")
+
+def _read_parent_startup_state(parent_pid: int, started_at: float) -> Optional[Dict[str, Any]]:
+    """The startup state published by the parent for this initialization run, if any"""
+    try:
+        data = json.loads(_startup_state_path().read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if data.get("pid") != parent_pid or data.get("started_at") != started_at:
+        return None
+    return data
+
+@contextmanager
+def _startup_phase(phase: str):
+    """Track a startup phase in AppComponents.startup_state"""
+    AppComponents.startup_state.set_phase(phase, "running")
+    yield
+    AppComponents.startup_state.set_phase(phase, "done")
+
 def initialize_app(force_recreate=False):
     """Initialize all application components"""
+    AppComponents.startup_state.start()
     try:
         logger.info("Starting application initialization...")
+        start = time.perf_counter()
         
         # Add initialization timeout
         import signal
@@ -51,56 +178,167 @@ def initialize_app(force_recreate=False):
         def timeout_handler(signum, frame):
             raise TimeoutError("Initialization timed out")
         
-        # Set 90 second timeout for initialization (increased from 60)
-        signal.signal(signal.SIGALRM, timeout_handler)
-        signal.alarm(90)
+        # SIGALRM can only be armed from the main thread; background
+        # initialization is not racing a startup probe and needs no alarm
+        use_alarm = threading.current_thread() is threading.main_thread()
+        if use_alarm:
+            # Set 90 second timeout for initialization (increased from 60)
+            signal.signal(signal.SIGALRM, timeout_handler)
+            signal.alarm(90)
         
         try:
-            # Setup paths
-            base_path = Path(__file__).parent.parent.parent
-            knowledge_base_path = base_path / "data" / "knowledge_base"
-            
-            # Ensure directory exists
-            knowledge_base_path.mkdir(exist_ok=True, parents=True)
-            
-            # Initialize components with reduced batch sizes and caching
-            AppComponents.doc_processor = DocumentProcessor(
-                knowledge_base_path=str(knowledge_base_path),
-                max_retries=2,
-                retry_delay=0.5,
-                min_chunk_size=MIN_CHUNK_SIZE,
-                max_chunk_size=MAX_CHUNK_SIZE
-            )
-            
-            documents = AppComponents.doc_processor.load_documents()
-            
-            AppComponents.vector_store_manager = VectorStoreManager(
-                doc_processor=AppComponents.doc_processor
-            )
+            with _startup_phase("doc_processor"):
+                # Setup paths
+                base_path = Path(__file__).parent.parent.parent
+                knowledge_base_path = base_path / "data" / "knowledge_base"
+                
+                # Ensure directory exists
+                knowledge_base_path.mkdir(exist_ok=True, parents=True)
+                
+                # Initialize components with reduced batch sizes and caching
+                AppComponents.doc_processor = DocumentProcessor(
+                    knowledge_base_path=str(knowledge_base_path),
+                    max_retries=2,
+                    retry_delay=0.5,
+                    min_chunk_size=MIN_CHUNK_SIZE,
+                    max_chunk_size=MAX_CHUNK_SIZE
+                )
             
-            AppComponents.vector_store = _retry_with_backoff(
-                lambda: AppComponents.vector_store_manager.get_or_create_vector_store(
-                    force_recreate=force_recreate
+            with _startup_phase("vector_store"):
+                AppComponents.vector_store_manager = VectorStoreManager(
+                    doc_processor=AppComponents.doc_processor
                 )
-            )
+                
+                # Documents are streamed through the vector store sync, never held as a
+                # whole corpus; retries re-parse files but reuse cached embeddings
+                vector_store_start = time.perf_counter()
+                AppComponents.vector_store = _retry_with_backoff(
+                    lambda: AppComponents.vector_store_manager.get_or_create_vector_store(
+                        force_recreate=force_recreate
+                    )
+                )
+                vector_store_seconds = time.perf_counter() - vector_store_start
+                AppComponents.doc_processor.clear_cache()
 
-            AppComponents.qa_chain_manager = QAChainManager()
-            AppComponents.qa_chain = AppComponents.qa_chain_manager.create_qa_chain(
-                AppComponents.vector_store
-            )
+            chain_timings = {}
+            with _startup_phase("qa_chain"), phase_timer(chain_timings, "chain_build"):
+                AppComponents.qa_chain_manager = QAChainManager()
+                AppComponents.qa_chain = AppComponents.qa_chain_manager.create_qa_chain(
+                    AppComponents.vector_store,
+                    lexical_index=AppComponents.vector_store_manager.lexical_index
+                )
             
         finally:
-            signal.alarm(0)  # Disable the alarm
-            
+            if use_alarm:
+                signal.alarm(0)  # Disable the alarm
+        
+        AppComponents.startup_timings = _collect_startup_timings(
+            vector_store_seconds, chain_timings["chain_build"], time.perf_counter() - start
+        )
+        AppComponents.startup_state.mark_ready()
+        _publish_startup_state()
+        logger.info(f"Startup timings (seconds): {AppComponents.startup_timings}")
         logger.info("Application initialization completed successfully")
         
     except TimeoutError:
         logger.error("Application initialization timed out")
+        AppComponents.startup_state.mark_failed("timeout")
+        _publish_startup_state()
         raise RuntimeError("Failed to initialize application: timeout")
     except Exception as e:
         logger.error(f"Error during initialization: {str(e)}")
+        AppComponents.startup_state.mark_failed(str(e))
+        _publish_startup_state()
         raise RuntimeError(f"Failed to start server: {str(e)}")
 
+def start_background_initialization(force_recreate=False) -> threading.Thread:
+    """Initialize components on a daemon thread so the server can bind immediately"""
+    def run():
+        try:
+            initialize_app(force_recreate)
+        except Exception as e:
+            # Already recorded in startup_state; keep the server up to report it
+            logger.error(f"Background initialization failed: {str(e)}")
+
+    AppComponents.startup_state.start()
+    thread = threading.Thread(target=run, name="app-initializer", daemon=True)
+    AppComponents.init_thread = thread
+    thread.start()
+    logger.info("Application initialization started in the background")
+    return thread
+
+def _attach_worker():
+    """Give a forked worker its own connections to the index built by its parent"""
+    with _startup_phase("vector_store"):
+        AppComponents.vector_store = AppComponents.vector_store_manager.reattach_after_fork()
+    with _startup_phase("qa_chain"):
+        AppComponents.qa_chain_manager = QAChainManager()
+        AppComponents.qa_chain = AppComponents.qa_chain_manager.create_qa_chain(
+            AppComponents.vector_store,
+            lexical_index=AppComponents.vector_store_manager.lexical_index
+        )
+    AppComponents.startup_state.mark_ready()
+    logger.info(f"Worker {os.getpid()} ready")
+
+def _follow_parent_initialization(parent_pid: int, started_at: float):
+    """Wait for the parent to finish building the index, then attach to it"""
+    state = AppComponents.startup_state
+    while True:
+        if os.getppid() != parent_pid:
+            state.mark_failed("parent process exited during initialization")
+            return
+        data = _read_parent_startup_state(parent_pid, started_at)
+        if data and data["status"] == "failed":
+            state.mark_failed(data.get("error") or "initialization failed in parent process")
+            return
+        if data and data["status"] == "ready":
+            break
+        time.sleep(PARENT_POLL_INTERVAL)
+
+    try:
+        if AppComponents.vector_store_manager is None:
+            # Forked before the parent created its store manager
+            AppComponents.vector_store_manager = VectorStoreManager.for_existing_store(
+                data["persist_directory"], owner_pid=parent_pid
+            )
+        _attach_worker()
+    except Exception as e:
+        logger.error(f"Worker initialization failed: {str(e)}")
+        state.mark_failed(str(e))
+
+def resume_initialization_after_fork():
+    """Attach a forked server worker to the index built by its (preloaded) parent.
+
+    The index is built once, in the parent. Chroma and SQLite connections,
+    HTTP clients and threads do not survive fork(), so each worker reopens
+    the persisted store read-only and builds its own QA chain. A worker
+    forked while the parent was still initializing in the background waits
+    for the parent to publish its outcome instead of writing to the store
+    concurrently.
+    """
+    state = AppComponents.startup_state
+    parent_pid = state.pid
+    if parent_pid is None or parent_pid == os.getpid():
+        return
+    state.after_fork()
+
+    if state.status == "ready":
+        try:
+            _attach_worker()
+        except Exception as e:
+            logger.error(f"Worker initialization failed: {str(e)}")
+            state.mark_failed(str(e))
+    elif state.status == "initializing":
+        logger.info("Initialization was in progress at fork, waiting for the parent to finish it")
+        thread = threading.Thread(
+            target=_follow_parent_initialization,
+            args=(parent_pid, state.started_at),
+            name="app-initializer",
+            daemon=True
+        )
+        AppComponents.init_thread = thread
+        thread.start()
+
 def shutdown_app():
     """Safely shutdown all application components"""
     logger.info("Shutting down application...")
@@ -0,0 +1,190 @@
+# app/core/lexical_index.py
+
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.core.document_processor import index_version
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+_CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+# English function words: they match most chunks, so a question made of
+# them plus off-topic words would otherwise still find lexical hits
+STOPWORDS = frozenset("""
+a about an and are as at be been but by can could do does for from had has have how i if
+in into is it its me my of on or our should so than that the their them then there these
+they this to was we were what when where which who why will with would you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms of a text, without stopwords; identifiers also yield their camelCase/snake_case parts.
+
+    "GetComponent" indexes as getcomponent, get and component, so both the
+    exact API name and a spelled-out question match it.
+    """
+    terms = []
+    for word in _WORD_RE.findall(text):
+        lowered = word.lower()
+        if lowered not in STOPWORDS:
+            terms.append(lowered)
+        parts = [part.lower() for piece in word.split("_") for part in _CAMEL_RE.findall(piece)]
+        if len(parts) > 1:
+            terms.extend(part for part in parts if part not in STOPWORDS)
+    return terms
+
+
+def _matches(metadata: Dict[str, Any], filter_dict: Dict[str, Any]) -> bool:
+    for key, expected in filter_dict.items():
+        value = metadata.get(key)
+        if isinstance(expected, (list, tuple, set)):
+            if value not in expected:
+                return False
+        elif value != expected:
+            return False
+    return True
+
+
+class LexicalIndex:
+    """In-memory BM25 index over chunk texts.
+
+    Postings are stored per term as parallel arrays of document positions and
+    term frequencies, so a query is scored with one vectorized update per
+    query term and no network call. Persisted as the chunk texts and metadata
+    (postings are rebuilt on load) under a version derived from the chunk IDs.
+    """
+
+    FILE_NAME = "lexical_index.json"
+
+    def __init__(self, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]],
+                 k1: float = 1.5, b: float = 0.75):
+        self.ids = list(ids)
+        self.texts = list(texts)
+        self.metadatas = [metadata or {} for metadata in metadatas]
+        self.k1 = k1
+        self.b = b
+        self.version = index_version(self.ids)
+        self._build()
+
+    def _build(self) -> None:
+        postings = defaultdict(lambda: ([], []))
+        lengths = np.zeros(len(self.texts), dtype=np.float32)
+        for position, text in enumerate(self.texts):
+            terms = tokenize(text)
+            lengths[position] = len(terms)
+            for term, frequency in Counter(terms).items():
+                positions, frequencies = postings[term]
+                positions.append(position)
+                frequencies.append(frequency)
+
+        n = len(self.texts)
+        self.doc_lengths = lengths
+        self.avg_length = float(lengths.mean()) if n else 0.0
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray, float]] = {}
+        for term, (positions, frequencies) in postings.items():
+            df = len(positions)
+            idf = float(np.log(1 + (n - df + 0.5) / (df + 0.5)))
+            self.postings[term] = (
+                np.asarray(positions, dtype=np.int32),
+                np.asarray(frequencies, dtype=np.float32),
+                idf
+            )
+        self._filter_masks: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _filter_mask(self, filter_dict: Dict[str, Any]) -> np.ndarray:
+        key = json.dumps(filter_dict, sort_keys=True, default=str)
+        mask = self._filter_masks.get(key)
+        if mask is None:
+            mask = np.fromiter(
+                (_matches(metadata, filter_dict) for metadata in self.metadatas),
+                dtype=bool, count=len(self.metadatas)
+            )
+            self._filter_masks[key] = mask
+        return mask
+
+    def search(self, query: str, k: int, filter_dict: Optional[Dict[str, Any]] = None,
+               min_coverage: float = 0.0) -> List[Tuple[Document, float]]:
+        """Top k chunks by BM25 score.
+
+        A chunk is returned only if it contains at least min_coverage of the
+        query's distinct terms (and always at least one of them).
+        """
+        terms = set(tokenize(query))
+        if not self.ids or k <= 0 or not terms:
+            return []
+
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        matched = np.zeros(len(self.ids), dtype=np.int32)
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            positions, frequencies, idf = posting
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[positions] / self.avg_length)
+            scores[positions] += idf * frequencies * (self.k1 + 1) / (frequencies + norm)
+            matched[positions] += 1
+
+        scores[matched < max(1, math.ceil(min_coverage * len(terms)))] = 0
+        if filter_dict:
+            scores[~self._filter_mask(filter_dict)] = 0
+        hits = np.flatnonzero(scores > 0)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+
+        return [
+            (Document(page_content=self.texts[i], metadata=dict(self.metadatas[i])), float(scores[i]))
+            for i in hits
+        ]
+
+    @classmethod
+    def from_collection(cls, collection: Any) -> "LexicalIndex":
+        """Index every chunk of a Chroma-style collection"""
+        data = collection.get(include=["documents", "metadatas"])
+        return cls(data["ids"], data["documents"], data["metadatas"])
+
+    def save(self, directory: Union[str, Path]) -> None:
+        path = Path(directory) / self.FILE_NAME
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "version": self.version,
+            "ids": self.ids,
+            "texts": self.texts,
+            "metadatas": self.metadatas
+        }
+        # Per-process temp file: several server workers may save concurrently
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(data), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, directory: Union[str, Path], version: Optional[str] = None) -> Optional["LexicalIndex"]:
+        """Load a persisted index, or None if it is missing or not of the given version"""
+        path = Path(directory) / cls.FILE_NAME
+        if not path.exists():
+            return None
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            if version is not None and data.get("version") != version:
+                logger.info("Lexical index is out of date with the vector store, ignoring it")
+                return None
+            index = cls(data["ids"], data["texts"], data["metadatas"])
+            logger.info(f"Loaded lexical index with {len(index)} chunks")
+            return index
+        except Exception as e:
+            logger.warning(f"Could not read lexical index {path}: {str(e)}")
+            return None
@@ -0,0 +1,490 @@
+# app/core/numpy_vector_store.py
+
+import json
+import logging
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from app.config.settings import NUMPY_IVF_MIN_ROWS, NUMPY_IVF_NPROBE
+from app.core.retriever import fetch_candidates, mmr_select
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class IVFIndex:
+    """Inverted-file index: rows are bucketed under their nearest k-means centroid.
+
+    A query only scores the rows of the nprobe buckets whose centroids are
+    closest to it, trading a little recall for sub-linear search.
+    """
+
+    def __init__(self, centroids: np.ndarray, assignments: np.ndarray):
+        self.centroids = centroids
+        self.assignments = assignments
+        order = np.argsort(assignments, kind="stable")
+        boundaries = np.searchsorted(assignments[order], np.arange(len(centroids) + 1))
+        self.lists = [order[boundaries[i]:boundaries[i + 1]] for i in range(len(centroids))]
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, nlist: Optional[int] = None,
+              iterations: int = 10, seed: int = 0) -> "IVFIndex":
+        """Spherical k-means over unit-length rows"""
+        nlist = nlist or max(1, int(np.sqrt(len(vectors))))
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(len(vectors), size=nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            for i in range(nlist):
+                members = vectors[assignments == i]
+                if len(members):
+                    centroids[i] = members.sum(axis=0)
+            centroids = _normalize_rows(centroids)
+
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        return cls(centroids.astype(np.float32), assignments.astype(np.int32))
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Row indices in the nprobe buckets nearest to the query"""
+        nprobe = min(nprobe, len(self.centroids))
+        nearest = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self.lists[i] for i in nearest])
+
+
+class NumpyCollection:
+    """Columnar store of pre-normalized float32 embeddings, documents and metadata.
+
+    Implements the subset of the Chroma collection API used by this app (count,
+    get, upsert, update, delete, query), so VectorStoreManager's sync logic works on
+    either backend. Persisted as a .npy matrix that is memory-mapped on load
+    plus a JSON side table with one column per metadata key.
+    """
+
+    VECTORS_FILE = "vectors.npy"
+    COLUMNS_FILE = "columns.json"
+    CENTROIDS_FILE = "ivf_centroids.npy"
+    ASSIGNMENTS_FILE = "ivf_assignments.npy"
+
+    def __init__(self, path: Optional[Union[str, Path]] = None,
+                 embedding_function: Optional[Embeddings] = None,
+                 ivf_min_rows: int = NUMPY_IVF_MIN_ROWS,
+                 nprobe: int = NUMPY_IVF_NPROBE):
+        self.path = Path(path) if path else None
+        self.embedding_function = embedding_function
+        self.ivf_min_rows = ivf_min_rows
+        self.nprobe = nprobe
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadata_columns: Dict[str, List[Any]] = {}
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        # Writable matrix with spare rows that vectors is a view of, once written to
+        self._buffer: Optional[np.ndarray] = None
+        self.ivf: Optional[IVFIndex] = None
+        self.dirty = False
+        self._positions: Dict[str, int] = {}
+        # Row masks of metadata predicates, reset on every write
+        self._partitions: Dict[Tuple[str, str, str], np.ndarray] = {}
+
+    # region Persistence
+
+    @classmethod
+    def load(cls, path: Union[str, Path], embedding_function: Optional[Embeddings] = None,
+             mmap: bool = True, **kwargs) -> "NumpyCollection":
+        """Open a persisted collection, or an empty one if none was saved"""
+        collection = cls(path, embedding_function, **kwargs)
+        columns_path = collection.path / cls.COLUMNS_FILE
+        vectors_path = collection.path / cls.VECTORS_FILE
+        if not columns_path.exists() or not vectors_path.exists():
+            return collection
+
+        try:
+            columns = json.loads(columns_path.read_text(encoding="utf-8"))
+            vectors = np.load(vectors_path, mmap_mode="r" if mmap else None)
+            if vectors.shape[0] != len(columns["ids"]):
+                raise ValueError("vector matrix and side table are out of sync")
+
+            collection.vectors = vectors
+            collection.ids = columns["ids"]
+            collection.documents = columns["documents"]
+            collection.metadata_columns = columns["metadata"]
+            collection._positions = {doc_id: i for i, doc_id in enumerate(collection.ids)}
+
+            if columns.get("ivf") and (collection.path / cls.CENTROIDS_FILE).exists():
+                collection.ivf = IVFIndex(
+                    np.load(collection.path / cls.CENTROIDS_FILE),
+                    np.load(collection.path / cls.ASSIGNMENTS_FILE)
+                )
+            logger.info(f"Loaded NumPy vector index with {len(collection.ids)} rows from {collection.path}")
+        except Exception as e:
+            logger.warning(f"Could not load NumPy vector index from {collection.path}: {str(e)}")
+            return cls(path, embedding_function, **kwargs)
+        return collection
+
+    @staticmethod
+    def _replace(path: Path, write) -> None:
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+
+    def persist(self) -> None:
+        """Write the collection to disk; the side table is written last and commits it"""
+        if self.path is None or (not self.dirty and (self.path / self.COLUMNS_FILE).exists()):
+            return
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        if self.ivf is None and self.count() >= self.ivf_min_rows:
+            logger.info(f"Building IVF index over {self.count()} rows")
+            self.ivf = IVFIndex.build(np.asarray(self.vectors))
+
+        vectors = np.ascontiguousarray(self.vectors, dtype=np.float32)
+        self._replace(self.path / self.VECTORS_FILE, lambda f: np.save(f, vectors))
+        if self.ivf is not None:
+            self._replace(self.path / self.CENTROIDS_FILE, lambda f: np.save(f, self.ivf.centroids))
+            self._replace(self.path / self.ASSIGNMENTS_FILE, lambda f: np.save(f, self.ivf.assignments))
+
+        columns = {
+            "ids": self.ids,
+            "documents": self.documents,
+            "metadata": self.metadata_columns,
+            "ivf": self.ivf is not None
+        }
+        self._replace(self.path / self.COLUMNS_FILE, lambda f: f.write(json.dumps(columns).encode("utf-8")))
+        self.dirty = False
+        logger.info(f"Persisted NumPy vector index with {self.count()} rows to {self.path}")
+
+    # endregion
+
+    # region Chroma collection API
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def _metadata(self, i: int) -> Dict[str, Any]:
+        return {
+            key: column[i] for key, column in self.metadata_columns.items()
+            if column[i] is not None
+        }
+
+    def _rows(self, positions: Iterable[int], include: Sequence[str],
+              distances: Optional[Sequence[float]] = None) -> Dict[str, List]:
+        positions = list(positions)
+        result: Dict[str, List] = {"ids": [self.ids[i] for i in positions]}
+        if "documents" in include:
+            result["documents"] = [self.documents[i] for i in positions]
+        if "metadatas" in include:
+            result["metadatas"] = [self._metadata(i) for i in positions]
+        if "embeddings" in include:
+            result["embeddings"] = [np.asarray(self.vectors[i]).tolist() for i in positions]
+        if distances is not None and "distances" in include:
+            result["distances"] = list(distances)
+        return result
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None,
+            include: Sequence[str] = ("metadatas", "documents")) -> Dict[str, List]:
+        if ids is not None:
+            positions = [self._positions[doc_id] for doc_id in ids if doc_id in self._positions]
+        else:
+            positions = range(self.count())
+        if where:
+            mask = self._where_mask(where)
+            positions = [i for i in positions if mask[i]]
+        return self._rows(positions, include)
+
+    def _reserve(self, rows: int, dim: int) -> None:
+        """Make vectors a writable view of a buffer with room for rows more rows.
+
+        The buffer grows geometrically, so building an index batch by batch
+        copies each row a constant number of times on average instead of once
+        per batch. A memory-mapped matrix is read-only and is copied in here
+        on the first write.
+        """
+        count = self.vectors.shape[0]
+        if self._buffer is not None and self._buffer.shape[0] >= count + rows:
+            return
+        buffer = np.empty((max(count + rows, 2 * count, 64), dim), dtype=np.float32)
+        if count:
+            buffer[:count] = self.vectors
+        self._buffer = buffer
+        self.vectors = buffer[:count]
+
+    def _set_metadata(self, position: int, metadata: Optional[Dict[str, Any]]) -> None:
+        """Replace the metadata of a row"""
+        for column in self.metadata_columns.values():
+            column[position] = None
+        for key, value in (metadata or {}).items():
+            if key not in self.metadata_columns:
+                self.metadata_columns[key] = [None] * len(self.ids)
+            self.metadata_columns[key][position] = value
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]],
+               metadatas: Optional[List[Dict[str, Any]]] = None,
+               documents: Optional[List[str]] = None) -> None:
+        if not ids:
+            return
+        metadatas = metadatas or [{} for _ in ids]
+        documents = documents or ["" for _ in ids]
+        new_vectors = _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+
+        self._reserve(len(ids), new_vectors.shape[1])
+        appended = []
+        for row, (doc_id, metadata, document) in enumerate(zip(ids, metadatas, documents)):
+            position = self._positions.get(doc_id)
+            if position is None:
+                position = len(self.ids)
+                self._positions[doc_id] = position
+                self.ids.append(doc_id)
+                self.documents.append(document)
+                for column in self.metadata_columns.values():
+                    column.append(None)
+                appended.append(row)
+            else:
+                self.vectors[position] = new_vectors[row]
+                self.documents[position] = document
+
+            self._set_metadata(position, metadata)
+
+        if appended:
+            start = self.vectors.shape[0]
+            self._buffer[start:start + len(appended)] = new_vectors[appended]
+            self.vectors = self._buffer[:start + len(appended)]
+        self.ivf = None
+        self._partitions = {}
+        self.dirty = True
+
+    def update(self, ids: List[str], metadatas: Optional[List[Dict[str, Any]]] = None,
+               documents: Optional[List[str]] = None) -> None:
+        """Change the metadata or documents of existing rows, keeping their vectors"""
+        updated = False
+        for row, doc_id in enumerate(ids):
+            position = self._positions.get(doc_id)
+            if position is None:
+                continue
+            if documents is not None:
+                self.documents[position] = documents[row]
+            if metadatas is not None:
+                self._set_metadata(position, metadatas[row])
+            updated = True
+        if updated:
+            self._partitions = {}
+            self.dirty = True
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None) -> None:
+        remove = np.zeros(self.count(), dtype=bool)
+        for doc_id in ids or []:
+            if doc_id in self._positions:
+                remove[self._positions[doc_id]] = True
+        if where:
+            remove |= self._where_mask(where)
+        if not remove.any():
+            return
+
+        keep = np.flatnonzero(~remove)
+        self.vectors = np.array(self.vectors[keep], dtype=np.float32)
+        self._buffer = None
+        self.ids = [self.ids[i] for i in keep]
+        self.documents = [self.documents[i] for i in keep]
+        self.metadata_columns = {
+            key: [column[i] for i in keep] for key, column in self.metadata_columns.items()
+        }
+        self._positions = {doc_id: i for i, doc_id in enumerate(self.ids)}
+        self.ivf = None
+        self._partitions = {}
+        self.dirty = True
+
+    def query(self, query_embeddings: Optional[List[List[float]]] = None,
+              query_texts: Optional[List[str]] = None, n_results: int = 10,
+              where: Optional[Dict] = None,
+              include: Sequence[str] = ("metadatas", "documents", "distances")) -> Dict[str, List]:
+        """Nearest rows by cosine distance for each query, shaped like Chroma's results"""
+        if query_embeddings is None:
+            if query_texts is None or self.embedding_function is None:
+                raise ValueError("query_embeddings, or query_texts with an embedding function, are required")
+            query_embeddings = [self.embedding_function.embed_query(text) for text in query_texts]
+
+        results: Dict[str, List] = {key: [] for key in ("ids", *include)}
+        for embedding in query_embeddings:
+            positions, similarities = self.search(embedding, n_results, where)
+            rows = self._rows(positions, include, distances=(1.0 - similarities).tolist())
+            for key in results:
+                results[key].append(rows.get(key, []))
+        return results
+
+    # endregion
+
+    def _where_mask(self, where: Dict) -> np.ndarray:
+        """Rows matching a Chroma-style metadata filter"""
+        n = self.count()
+        mask = np.ones(n, dtype=bool)
+        for key, condition in where.items():
+            if key == "$and":
+                for clause in condition:
+                    mask &= self._where_mask(clause)
+            elif key == "$or":
+                matched = np.zeros(n, dtype=bool)
+                for clause in condition:
+                    matched |= self._where_mask(clause)
+                mask &= matched
+            else:
+                mask &= self._match_column(key, condition)
+        return mask
+
+    def _match_column(self, key: str, condition: Any) -> np.ndarray:
+        """Rows matching one predicate; cached, so each metadata partition is computed once"""
+        if isinstance(condition, dict):
+            (operator, operand), = condition.items()
+        else:
+            operator, operand = "$eq", condition
+
+        cache_key = (key, operator, json.dumps(operand, sort_keys=True, default=str))
+        mask = self._partitions.get(cache_key)
+        if mask is None:
+            mask = self._compute_match(key, operator, operand)
+            mask.setflags(write=False)
+            self._partitions[cache_key] = mask
+        return mask
+
+    def _compute_match(self, key: str, operator: str, operand: Any) -> np.ndarray:
+        column = self.metadata_columns.get(key)
+        if column is None:
+            return np.zeros(self.count(), dtype=bool)
+
+        if operator == "$eq":
+            return np.fromiter((value == operand for value in column), dtype=bool, count=len(column))
+        if operator == "$ne":
+            return np.fromiter((value != operand for value in column), dtype=bool, count=len(column))
+        if operator == "$in":
+            return np.fromiter((value in operand for value in column), dtype=bool, count=len(column))
+        if operator == "$nin":
+            return np.fromiter((value not in operand for value in column), dtype=bool, count=len(column))
+        raise ValueError(f"Unsupported filter operator: {operator}")
+
+    def search(self, embedding: List[float], k: int,
+               where: Optional[Dict] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Row positions and cosine similarities of the k nearest rows"""
+        if not self.count() or k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        query = query / norm if norm else query
+
+        candidates = None
+        if self.ivf is not None:
+            candidates = self.ivf.candidates(query, self.nprobe)
+        if where:
+            mask = self._where_mask(where)
+            candidates = np.flatnonzero(mask) if candidates is None else candidates[mask[candidates]]
+        if candidates is not None and len(candidates) < k and self.ivf is not None:
+            # Too few rows in the probed buckets: fall back to an exact scan
+            candidates = np.flatnonzero(self._where_mask(where)) if where else None
+
+        if candidates is None:
+            similarities = self.vectors @ query
+            positions = np.arange(self.count())
+        else:
+            similarities = self.vectors[candidates] @ query
+            positions = candidates
+
+        k = min(k, len(positions))
+        if k == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top], kind="stable")]
+        return positions[top], similarities[top]
+
+
+class NumpyVectorStore(VectorStore):
+    """LangChain vector store over a NumpyCollection: exact (or IVF) cosine top-k"""
+
+    def __init__(self, collection: NumpyCollection, embedding_function: Embeddings):
+        self._collection = collection
+        self._embedding_function = embedding_function
+        collection.embedding_function = embedding_function
+
+    @classmethod
+    def load(cls, path: Union[str, Path], embedding_function: Embeddings, mmap: bool = True) -> "NumpyVectorStore":
+        return cls(NumpyCollection.load(path, embedding_function, mmap=mmap), embedding_function)
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding_function
+
+    def persist(self) -> None:
+        self._collection.persist()
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        self._collection.upsert(
+            ids=ids,
+            embeddings=self._embedding_function.embed_documents(texts),
+            metadatas=metadatas,
+            documents=texts
+        )
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        self._collection.delete(ids=ids)
+        return True
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4,
+                                               filter: Optional[Dict] = None) -> List[Tuple[Document, float]]:
+        """Documents and cosine distances of the k nearest chunks"""
+        results = self._collection.query(query_embeddings=[embedding], n_results=k, where=filter)
+        return [
+            (Document(page_content=text, metadata=metadata), distance)
+            for text, metadata, distance in zip(
+                results["documents"][0], results["metadatas"][0], results["distances"][0]
+            )
+        ]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4,
+                                    filter: Optional[Dict] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4,
+                                     filter: Optional[Dict] = None, **kwargs: Any) -> List[Tuple[Document, float]]:
+        embedding = self._embedding_function.embed_query(query)
+        return self.similarity_search_by_vector_with_score(embedding, k, filter)
+
+    def similarity_search(self, query: str, k: int = 4,
+                          filter: Optional[Dict] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def max_marginal_relevance_search_by_vector(self, embedding: List[float], k: int = 4,
+                                                fetch_k: int = 20, lambda_mult: float = 0.5,
+                                                filter: Optional[Dict] = None, **kwargs: Any) -> List[Document]:
+        docs, vectors = fetch_candidates(self._collection, embedding, max(fetch_k, k), filter)
+        return [docs[i] for i in mmr_select(embedding, vectors, k, lambda_mult)]
+
+    def max_marginal_relevance_search(self, query: str, k: int = 4, fetch_k: int = 20,
+                                      lambda_mult: float = 0.5, filter: Optional[Dict] = None,
+                                      **kwargs: Any) -> List[Document]:
+        embedding = self._embedding_function.embed_query(query)
+        return self.max_marginal_relevance_search_by_vector(embedding, k, fetch_k, lambda_mult, filter)
+
+    def _select_relevance_score_fn(self):
+        return self._cosine_relevance_score_fn
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings,
+                   metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None,
+                   path: Optional[Union[str, Path]] = None, **kwargs: Any) -> "NumpyVectorStore":
+        store = cls(NumpyCollection(path), embedding)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
@@ -1,27 +1,52 @@
+import asyncio
 import logging
-from typing import Any, Dict, List
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
 from threading import Thread, Event
 import time
 from langchain_anthropic import ChatAnthropic
-from langchain.memory import ConversationBufferMemory
 from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
 from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
 from langchain.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
 from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from contextvars import copy_context
 
 from app.config.settings import (
     ANTHROPIC_API_KEY,
     CLAUDE_MODEL,
     VECTOR_STORE_TOP_K,
     LLM_TEMPERATURE,
-    LLM_MAX_TOKENS
+    LLM_MAX_TOKENS,
+    ANSWER_CACHE_ENABLED,
+    QUERY_WORKER_THREADS,
+    SESSION_SPILL,
+    CACHE_DIR
 )
 from app.config.prompt_templates import PROMPT_TEMPLATES
+from app.core.answer_cache import AnswerCache
+from app.core.context_packer import ContextPacker, PackedContext
+from app.core.document_processor import index_version
+from app.core.retriever import ContextRetriever, RetrievalResult, RETRIEVAL_PROFILES
+from app.core.session_memory import SessionMemoryStore
 
 logger = logging.getLogger(__name__)
 
+QUERY_TYPES = ("qa", "code", "error")
+# Sources reported with an answer
+MAX_SOURCES = 3
+# Seconds before a query is abandoned
+QUERY_TIMEOUT = 120
+
+# Per-request holder the chains' context step records its packed context in.
+# LangChain copies the context into the threads it runs steps on, so the
+# holder set by process_query is the one the step sees, and concurrent
+# requests never share it.
+_request_context: ContextVar[Optional[Dict[str, Any]]] = ContextVar("qa_request_context", default=None)
+
 class QAChainManager:
     def __init__(self):
         """Initialize QA Chain Manager with custom settings"""
@@ -33,67 +58,72 @@ class QAChainManager:
             timeout=60  # Add timeout
         )
         
-        # Initialize memory
-        self.memory = ConversationBufferMemory(
-            return_messages=True,
-            memory_key="history",
-            output_key="answer",
-            max_token_limit=1000  # Add token limit
+        # Per-session conversation memory; self.memory is the session used
+        # by requests that do not name one
+        self.sessions = SessionMemoryStore(
+            spill_path=Path(CACHE_DIR) / "sessions.sqlite3" if SESSION_SPILL else None
         )
+        self.memory = self.sessions.get()
         
         self.output_parser = StrOutputParser()
         self.qa_chain = None
         self.code_chain = None
         self.error_chain = None
         self.retriever = None
-        self.last_sources = []
+        self.vector_store = None
+        self.answer_chains = {}
+        # Bounds the retrieved context each prompt carries
+        self.context_packer = ContextPacker()
+        
+        # Repeated questions are answered without retrieval or an LLM call
+        self.answer_cache = AnswerCache() if ANSWER_CACHE_ENABLED else None
         
-        # Initialize thread pool executor
-        self.executor = ThreadPoolExecutor(max_workers=1)
+        # Long-lived pool for blocking queries; a timed-out query keeps its
+        # thread until the chain returns, but the request does not wait for it
+        self.executor = ThreadPoolExecutor(max_workers=QUERY_WORKER_THREADS, thread_name_prefix="query")
 
-    def create_qa_chain(self, vector_store: Chroma) -> Any:
-        """Create a conversational retrieval chain"""
+    def create_qa_chain(self, vector_store: Chroma, lexical_index: Optional[Any] = None) -> Any:
+        """Create a conversational retrieval chain; lexical_index enables hybrid retrieval"""
         try:
             logger.info("Creating QA chain...")
             
-            # Set up retriever
-            self.retriever = vector_store.as_retriever(
-                search_kwargs={"k": VECTOR_STORE_TOP_K}
+            # Set up retriever (MMR or plain similarity, per RETRIEVAL_MODE)
+            self.vector_store = vector_store
+            self.retriever = ContextRetriever(
+                vector_store=vector_store,
+                k=VECTOR_STORE_TOP_K,
+                lexical_index=lexical_index
             )
 
-            # Define document formatting
-            def format_docs(docs):
-                self.last_sources = docs
-                texts = [str(doc.page_content) for doc in docs]
-                return "\n\n".join(texts)
+            # Create a context getter per query type, each with its retrieval profile
+            def context_getter(query_type):
+                def get_context(inputs):
+                    question = str(inputs["question"])
+                    retrieval = self.retriever.retrieve(question, RETRIEVAL_PROFILES[query_type])
+                    packed = self._pack_context(retrieval)
+                    request = _request_context.get()
+                    if request is not None:
+                        request["packed"] = packed
+                    return packed.text
+                return get_context
 
-            # Create context getter
-            def get_context(inputs):
-                question = str(inputs["question"])
-                docs = self.retriever.invoke(question)
-                return {"context": format_docs(docs), "question": question}
+            # Prompt -> LLM -> text, per query type; retrieval is prepended for
+            # the blocking chains and run separately when streaming
+            self.answer_chains = {
+                query_type: PROMPT_TEMPLATES[query_type] | self.llm | self.output_parser
+                for query_type in QUERY_TYPES
+            }
 
             # Create the specialized chains
-            self.qa_chain = (
-                RunnablePassthrough.assign(context=get_context) 
-                | PROMPT_TEMPLATES["qa"] 
-                | self.llm 
-                | self.output_parser
-            )
+            self.qa_chain = RunnablePassthrough.assign(context=context_getter("qa")) | self.answer_chains["qa"]
+            self.code_chain = RunnablePassthrough.assign(context=context_getter("code")) | self.answer_chains["code"]
+            self.error_chain = RunnablePassthrough.assign(context=context_getter("error")) | self.answer_chains["error"]
 
-            self.code_chain = (
-                RunnablePassthrough.assign(context=get_context)
-                | PROMPT_TEMPLATES["code"] 
-                | self.llm 
-                | self.output_parser
-            )
-
-            self.error_chain = (
-                RunnablePassthrough.assign(context=get_context)
-                | PROMPT_TEMPLATES["error"] 
-                | self.llm 
-                | self.output_parser
-            )
+            if self.answer_cache is not None:
+                embeddings = getattr(vector_store, "embeddings", None)
+                self.answer_cache.embed_query = embeddings.embed_query if embeddings is not None else None
+                self.answer_cache.aembed_query = getattr(embeddings, "aembed_query", None)
+                self.answer_cache.set_index_version(self._get_index_version(vector_store))
 
             logger.info("QA chain created successfully")
             return self.qa_chain
@@ -102,7 +132,7 @@ class QAChainManager:
             logger.error(f"Error creating QA chain: {str(e)}")
             raise
 
-    def process_query(self, chain: Any, query: str) -> Dict[str, Any]:
+    def process_query(self, chain: Any, query: str, session_id: Optional[str] = None) -> Dict[str, Any]:
         """Process a query using appropriate chain"""
         try:
             if not query or not isinstance(query, str) or not query.strip():
@@ -113,39 +143,53 @@ class QAChainManager:
                 }
 
             # Add timeout handling
-            timeout = 120  # 5 minutes timeout
+            timeout = QUERY_TIMEOUT
 
             # Clean query
             query = " ".join(query.strip().split())
-            self.last_sources = []  # Reset sources
 
             # Select chain based on query type and get response
             query_type = self.determine_query_type(query)
             selected_chain = getattr(self, f"{query_type}_chain", chain)
 
+            cached = self.answer_cache.get(query, query_type) if self.answer_cache is not None else None
+            if cached is not None:
+                self._remember(query, cached["answer"], session_id)
+                return {**cached, "chat_history": self.get_chat_history(session_id)}
+
             # Execute with timeout
-            with ThreadPoolExecutor(max_workers=1) as executor:
-                future = executor.submit(selected_chain.invoke, {"question": query})
-                try:
-                    response = future.result(timeout=timeout)
-                    
-                    # Store in memory
-                    if isinstance(response, str):
-                        self.memory.chat_memory.add_user_message(query)
-                        self.memory.chat_memory.add_ai_message(response)
-
-                    return {
-                        "answer": response,
-                        "sources": [doc.metadata.get('source', 'Unknown') 
-                                for doc in self.last_sources[:3]],  # Limit sources
-                        "chat_history": self.get_chat_history()
-                    }
-                except TimeoutError:
-                    return {
-                        "answer": "Request timed out. Please try a simpler question.",
-                        "sources": [],
-                        "chat_history": []
-                    }
+            request: Dict[str, Any] = {}
+
+            def invoke():
+                _request_context.set(request)
+                return selected_chain.invoke({"question": query})
+
+            # Run in a copy of this context so the holder never outlives the task on a pooled thread
+            future = self.executor.submit(copy_context().run, invoke)
+            try:
+                response = future.result(timeout=timeout)
+            except TimeoutError:
+                return {
+                    "answer": "Request timed out. Please try a simpler question.",
+                    "sources": [],
+                    "chat_history": []
+                }
+
+            packed = request.get("packed")
+            sources = self._source_names(packed.documents) if packed else []
+
+            # Store in memory
+            if isinstance(response, str):
+                self._remember(query, response, session_id)
+                if self.answer_cache is not None:
+                    self.answer_cache.put(query, query_type, {"answer": response, "sources": sources})
+
+            return {
+                "answer": response,
+                "sources": sources,
+                "retrieval": packed.stats if packed else {},
+                "chat_history": self.get_chat_history(session_id)
+            }
 
         except Exception as e:
             logger.error(f"Error in process_query: {str(e)}", exc_info=True)
@@ -155,20 +199,143 @@ class QAChainManager:
                 "chat_history": []
             }
 
-    def _process_query_internal(self, chain: Any, query: str) -> Dict[str, Any]:
-        """Internal method to process query without timeout logic"""
-        response = chain.invoke({"question": query})
-        
-        if isinstance(response, str):
-            self.memory.chat_memory.add_user_message(query)
-            self.memory.chat_memory.add_ai_message(response)
-        
+    def _pack_context(self, retrieval: RetrievalResult) -> PackedContext:
+        """Fit retrieved documents into the context token budget"""
+        packed = self.context_packer.pack(retrieval.documents)
+        packed.stats = {**retrieval.stats, "context": packed.stats}
+        return packed
+
+    @staticmethod
+    def _source_names(docs: List[Document]) -> List[str]:
+        return [doc.metadata.get('source', 'Unknown') for doc in docs[:MAX_SOURCES]]
+
+    def _remember(self, query: str, answer: str, session_id: Optional[str] = None) -> None:
+        chat_memory = self.sessions.get(session_id).chat_memory
+        chat_memory.add_user_message(query)
+        chat_memory.add_ai_message(answer)
+
+    def stream_query(self, query: str, session_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Answer a query incrementally as a sequence of events.
+
+        Yields a "sources" event once retrieval is done, "token" events as the
+        LLM generates, then "done" with the full answer ("error" on failure).
+        Memory and the answer cache are written once, after the last token.
+        """
+        try:
+            if not query or not isinstance(query, str) or not query.strip():
+                yield {"event": "error", "data": {"error": "Please provide a valid question."}}
+                return
+
+            query = " ".join(query.strip().split())
+            query_type = self.determine_query_type(query)
+
+            cached = self.answer_cache.get(query, query_type) if self.answer_cache is not None else None
+            if cached is not None:
+                self._remember(query, cached["answer"], session_id)
+                yield {"event": "sources", "data": {"sources": cached["sources"]}}
+                yield {"event": "token", "data": {"text": cached["answer"]}}
+                yield {"event": "done", "data": {"answer": cached["answer"], "cached": True}}
+                return
+
+            packed = self._pack_context(self.retriever.retrieve(query, RETRIEVAL_PROFILES[query_type]))
+            sources = self._source_names(packed.documents)
+            yield {"event": "sources", "data": {"sources": sources, "retrieval": packed.stats}}
+
+            tokens = []
+            answer_chain = self.answer_chains[query_type]
+            for token in answer_chain.stream({"context": packed.text, "question": query}):
+                tokens.append(token)
+                yield {"event": "token", "data": {"text": token}}
+
+            answer = "".join(tokens)
+            self._remember(query, answer, session_id)
+            if self.answer_cache is not None:
+                self.answer_cache.put(query, query_type, {"answer": answer, "sources": sources})
+            yield {"event": "done", "data": {"answer": answer, "cached": False}}
+
+        except Exception as e:
+            logger.error(f"Error in stream_query: {str(e)}", exc_info=True)
+            yield {"event": "error", "data": {"error": f"Error processing query: {str(e)}"}}
+
+    async def _aretrieve(self, query: str, query_type: str = "qa") -> RetrievalResult:
+        """Retrieve documents for a query without blocking the event loop"""
+        # Embed with the async client; the retriever then finds the vector in the
+        # query embedding cache instead of making its own blocking request
+        embeddings = getattr(self.vector_store, "embeddings", None)
+        if embeddings is not None and hasattr(embeddings, "aembed_query"):
+            await embeddings.aembed_query(query)
+        return await self.retriever.aretrieve(query, RETRIEVAL_PROFILES[query_type])
+
+    async def _aanswer(self, query: str, query_type: str) -> Dict[str, Any]:
+        packed = self._pack_context(await self._aretrieve(query, query_type))
+        answer = await self.answer_chains[query_type].ainvoke(
+            {"context": packed.text, "question": query}
+        )
         return {
-            "answer": response,
-            "sources": [doc.metadata.get('source', 'Unknown') for doc in self.last_sources],
-            "chat_history": self.get_chat_history()
+            "answer": answer,
+            "sources": self._source_names(packed.documents),
+            "retrieval": packed.stats
         }
 
+    async def aprocess_query(self, chain: Any, query: str, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Async counterpart of process_query for the ASGI entry point.
+
+        Retrieval and generation run on the event loop (blocking vector store
+        lookups are moved to the default executor), so concurrent questions do
+        not each hold a thread; asyncio.wait_for cancels overrunning queries.
+        """
+        try:
+            if not query or not isinstance(query, str) or not query.strip():
+                return {
+                    "answer": "Please provide a valid question.",
+                    "sources": [],
+                    "chat_history": []
+                }
+
+            query = " ".join(query.strip().split())
+            query_type = self.determine_query_type(query)
+
+            cached = await self.answer_cache.aget(query, query_type) if self.answer_cache is not None else None
+            if cached is not None:
+                self._remember(query, cached["answer"], session_id)
+                return {**cached, "chat_history": self.get_chat_history(session_id)}
+
+            try:
+                result = await asyncio.wait_for(self._aanswer(query, query_type), timeout=QUERY_TIMEOUT)
+            except asyncio.TimeoutError:
+                return {
+                    "answer": "Request timed out. Please try a simpler question.",
+                    "sources": [],
+                    "chat_history": []
+                }
+
+            self._remember(query, result["answer"], session_id)
+            if self.answer_cache is not None:
+                await self.answer_cache.aput(query, query_type, {"answer": result["answer"], "sources": result["sources"]})
+            return {**result, "chat_history": self.get_chat_history(session_id)}
+
+        except Exception as e:
+            logger.error(f"Error in aprocess_query: {str(e)}", exc_info=True)
+            return {
+                "answer": f"Error processing query: {str(e)}",
+                "sources": [],
+                "chat_history": []
+            }
+
+    @staticmethod
+    def _get_index_version(vector_store: Chroma) -> Optional[str]:
+        """Version of the indexed knowledge base, used to invalidate cached answers"""
+        try:
+            ids = vector_store._collection.get(include=[])["ids"]
+            return index_version(ids)
+        except Exception as e:
+            logger.warning(f"Could not determine index version: {str(e)}")
+            return None
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Answer cache statistics, empty if the cache is disabled"""
+        return self.answer_cache.get_stats() if self.answer_cache is not None else {}
+
     def determine_query_type(self, query: str) -> str:
         """Determine the type of query to select appropriate chain"""
         query_lower = query.lower()
@@ -181,18 +348,18 @@ class QAChainManager:
         
         return 'qa'
 
-    def get_chat_history(self) -> List[BaseMessage]:
+    def get_chat_history(self, session_id: Optional[str] = None) -> List[BaseMessage]:
         """Get chat history messages"""
         try:
-            return self.memory.chat_memory.messages
+            return list(self.sessions.get(session_id).chat_memory.messages)
         except Exception as e:
             logger.error(f"Error getting chat history: {str(e)}")
             return []
 
-    def clear_memory(self) -> None:
+    def clear_memory(self, session_id: Optional[str] = None) -> None:
         """Clear conversation memory"""
         try:
-            self.memory.clear()
+            self.sessions.clear(session_id)
             logger.info("Conversation memory cleared")
         except Exception as e:
             logger.error(f"Error clearing memory: {str(e)}")
@@ -201,5 +368,6 @@ class QAChainManager:
         """Cleanup method"""
         try:
             self.executor.shutdown(wait=False)
+            self.sessions.close()
         except:
             pass
\ No newline at end of file
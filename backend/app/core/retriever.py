@@ -0,0 +1,347 @@
+# app/core/retriever.py
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables.config import run_in_executor
+from pydantic import ConfigDict
+
+from app.config.settings import (
+    RETRIEVAL_MODE,
+    MMR_DIVERSITY_SCORE,
+    MMR_FETCH_K,
+    RETRIEVAL_SCORE_GAP,
+    RRF_K,
+    LEXICAL_MIN_TERM_COVERAGE,
+    HYBRID_EMBED_TIMEOUT,
+    VECTOR_STORE_SIMILARITY_THRESHOLD,
+    VECTOR_STORE_TOP_K
+)
+
+logger = logging.getLogger(__name__)
+
+# Runs query embeddings that hybrid retrieval is prepared to stop waiting for.
+# Created on first use in each process: the index is built in the preloaded
+# gunicorn master, and a pool inherited across fork() has no threads behind it
+_embed_executor_lock = threading.Lock()
+_EMBED_EXECUTOR: Optional[ThreadPoolExecutor] = None
+
+
+def _embed_executor() -> ThreadPoolExecutor:
+    global _EMBED_EXECUTOR
+    with _embed_executor_lock:
+        if _EMBED_EXECUTOR is None:
+            _EMBED_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="query-embed")
+        return _EMBED_EXECUTOR
+
+
+def _reset_embed_executor_after_fork() -> None:
+    global _EMBED_EXECUTOR, _embed_executor_lock
+    _embed_executor_lock = threading.Lock()
+    _EMBED_EXECUTOR = None
+
+
+os.register_at_fork(after_in_child=_reset_embed_executor_after_fork)
+
+
+def _unit_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def build_where(filter_dict: Optional[Dict]) -> Optional[Dict]:
+    """Chroma where clause for metadata predicates.
+
+    Keys are plain metadata keys (Chroma stores metadata flat, not under a
+    "metadata." prefix). Scalars match exactly, lists/tuples/sets match any
+    of their values, and dicts are passed through as operator expressions;
+    several predicates are combined with $and. Enum values (e.g. DocType)
+    are compared by value.
+    """
+    def plain(value):
+        return value.value if isinstance(value, Enum) else value
+
+    clauses = []
+    for key, value in (filter_dict or {}).items():
+        if key.startswith("$") or isinstance(value, dict):
+            clauses.append({key: value})
+        elif isinstance(value, (list, tuple, set)):
+            clauses.append({key: {"$in": [plain(v) for v in value]}})
+        else:
+            clauses.append({key: {"$eq": plain(value)}})
+
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def fetch_candidates(collection: Any, query_embedding: List[float], n_results: int,
+                     where: Optional[Dict] = None) -> Tuple[List[Document], np.ndarray]:
+    """Nearest chunks and their embeddings from a Chroma-style collection in one query"""
+    query_kwargs = {
+        "query_embeddings": [query_embedding],
+        "n_results": n_results,
+        "include": ["documents", "metadatas", "embeddings"]
+    }
+    if where:
+        query_kwargs["where"] = where
+    results = collection.query(**query_kwargs)
+
+    texts = (results.get("documents") or [[]])[0]
+    metadatas = (results.get("metadatas") or [[]])[0]
+    embeddings = results.get("embeddings")
+    embeddings = embeddings[0] if embeddings is not None and len(embeddings) else []
+
+    docs = [
+        Document(page_content=text, metadata=metadata or {})
+        for text, metadata in zip(texts, metadatas)
+    ]
+    vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(docs), -1)
+    return docs, vectors
+
+
+def relevance_scores(query_embedding: List[float], candidates: np.ndarray) -> np.ndarray:
+    """Cosine similarity of each candidate row to the query"""
+    if len(candidates) == 0:
+        return np.zeros(0, dtype=np.float32)
+    query = _unit_rows(np.asarray(query_embedding, dtype=np.float32))
+    return _unit_rows(np.asarray(candidates, dtype=np.float32)) @ query
+
+
+def prune_by_score(scores: np.ndarray, threshold: float, max_gap: float) -> Tuple[np.ndarray, int, int]:
+    """Candidates worth keeping, best first, and how many each rule dropped.
+
+    Candidates scoring below threshold are dropped. Of the rest, ranked by
+    score, everything after the first drop larger than max_gap between
+    neighbours is treated as noise (max_gap <= 0 disables this). Returns the
+    kept indices and the below-threshold and score-gap pruned counts.
+    """
+    order = np.argsort(-scores, kind="stable")
+    ranked = scores[order]
+    above = int(np.count_nonzero(ranked >= threshold))
+
+    cut = above
+    if max_gap > 0 and above > 1:
+        gaps = np.flatnonzero(ranked[:above - 1] - ranked[1:above] > max_gap)
+        if len(gaps):
+            cut = int(gaps[0]) + 1
+    return order[:cut], len(scores) - above, above - cut
+
+
+def mmr_select(query_embedding: List[float], candidates: np.ndarray, k: int,
+               lambda_mult: float) -> List[int]:
+    """Greedy maximal marginal relevance over a candidate matrix.
+
+    Each step picks the candidate maximizing
+    lambda * sim(query, c) - (1 - lambda) * max(sim(c, selected)); the running
+    max-similarity vector is updated with one matrix-vector product per pick.
+    Returns candidate indices in selection order.
+    """
+    if len(candidates) == 0 or k <= 0:
+        return []
+
+    candidates = _unit_rows(np.asarray(candidates, dtype=np.float32))
+    query = _unit_rows(np.asarray(query_embedding, dtype=np.float32))
+    relevance = candidates @ query
+
+    first = int(np.argmax(relevance))
+    selected = [first]
+    redundancy = candidates @ candidates[first]
+    available = np.ones(len(candidates), dtype=bool)
+    available[first] = False
+
+    while len(selected) < min(k, len(candidates)):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, candidates @ candidates[best])
+    return selected
+
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], k: int, rrf_k: int = RRF_K) -> List[Document]:
+    """Merge ranked lists by summed 1 / (rrf_k + rank), identifying chunks by chunk_id"""
+    scores: Dict[str, float] = {}
+    docs: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            key = doc.metadata.get("chunk_id") or doc.page_content
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            docs.setdefault(key, doc)
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [docs[key] for key in ranked[:k]]
+
+
+@dataclass
+class RetrievalResult:
+    documents: List[Document]
+    stats: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class RetrievalProfile:
+    """How context is retrieved for one kind of question"""
+    name: str
+    k: int
+    # Metadata predicates (see build_where) selecting the preferred partition
+    filter: Optional[Dict] = None
+    # Top up from the whole index when the partition yields fewer than k chunks
+    fallback: bool = True
+
+
+# Per query type: code questions are answered from examples and function
+# references that contain code, error questions from the rulesets. Code
+# chunks are large, so fewer of them are retrieved.
+RETRIEVAL_PROFILES = {
+    "qa": RetrievalProfile(name="qa", k=VECTOR_STORE_TOP_K),
+    "code": RetrievalProfile(
+        name="code",
+        k=max(2, VECTOR_STORE_TOP_K // 2),
+        filter={"doc_type": ["example", "functions"], "has_code": True}
+    ),
+    "error": RetrievalProfile(name="error", k=VECTOR_STORE_TOP_K, filter={"doc_type": "ruleset"}),
+}
+
+
+class ContextRetriever(BaseRetriever):
+    """Retriever that builds the prompt context for a question.
+
+    Fetches fetch_k candidates with their embeddings in a single collection
+    query, drops those below score_threshold or past a score_gap cliff, and,
+    in "mmr" mode, re-ranks the rest with vectorized MMR so chunks that
+    repeat each other (e.g. overlapping chunks of one file) do not fill the
+    top k. A RetrievalProfile narrows the search to a metadata partition
+    first. Works with any vector store whose _collection follows the Chroma
+    collection API.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vector_store: Any
+    k: int = VECTOR_STORE_TOP_K
+    fetch_k: int = MMR_FETCH_K
+    search_type: str = RETRIEVAL_MODE
+    lambda_mult: float = 1 - MMR_DIVERSITY_SCORE
+    score_threshold: float = VECTOR_STORE_SIMILARITY_THRESHOLD
+    score_gap: float = RETRIEVAL_SCORE_GAP
+    filter: Optional[Dict] = None
+    # BM25 index fused with vector results; also answers alone when embedding stalls
+    lexical_index: Optional[Any] = None
+    rrf_k: int = RRF_K
+    lexical_min_coverage: float = LEXICAL_MIN_TERM_COVERAGE
+    embed_timeout: float = HYBRID_EMBED_TIMEOUT
+
+    def _embed_query(self, query: str) -> List[float]:
+        return self.vector_store.embeddings.embed_query(query)
+
+    def _embed_query_with_deadline(self, query: str) -> Optional[List[float]]:
+        """Query embedding, or None if the lexical index should answer alone"""
+        if self.lexical_index is None or self.embed_timeout <= 0:
+            return self._embed_query(query)
+
+        future = _embed_executor().submit(self._embed_query, query)
+        try:
+            return future.result(timeout=self.embed_timeout)
+        except TimeoutError:
+            logger.warning(f"Query embedding took over {self.embed_timeout}s, answering from the lexical index")
+        except Exception as e:
+            logger.warning(f"Query embedding failed, answering from the lexical index: {str(e)}")
+        return None
+
+    def _lexical_search(self, query: str, k: int, filter_dict: Optional[Dict]) -> List[Document]:
+        return [doc for doc, _ in self.lexical_index.search(query, k, filter_dict, self.lexical_min_coverage)]
+
+    def _search(self, query_embedding: List[float], k: int,
+                filter_dict: Optional[Dict]) -> Tuple[List[Document], Dict[str, Any]]:
+        use_mmr = self.search_type == "mmr"
+        n_results = max(self.fetch_k, k) if use_mmr else k
+
+        docs, vectors = fetch_candidates(
+            self.vector_store._collection, query_embedding, n_results, build_where(filter_dict)
+        )
+        scores = relevance_scores(query_embedding, vectors)
+        kept, below_threshold, past_gap = prune_by_score(scores, self.score_threshold, self.score_gap)
+
+        if use_mmr:
+            selected = [int(kept[i]) for i in mmr_select(query_embedding, vectors[kept], k, self.lambda_mult)]
+        else:
+            selected = [int(i) for i in kept[:k]]
+
+        documents = []
+        for i in selected:
+            docs[i].metadata["relevance_score"] = round(float(scores[i]), 4)
+            documents.append(docs[i])
+
+        stats = {
+            "candidates": len(docs),
+            "below_threshold": below_threshold,
+            "score_gap": past_gap,
+            "top_score": round(float(scores.max()), 4) if len(scores) else None
+        }
+        return documents, stats
+
+    def retrieve(self, query: str, profile: Optional[RetrievalProfile] = None) -> RetrievalResult:
+        """Context documents for a query, with per-request pruning stats"""
+        k = profile.k if profile else self.k
+        filter_dict = profile.filter if profile else self.filter
+        wants_fallback = bool(profile and profile.filter and profile.fallback)
+        query_embedding = self._embed_query_with_deadline(query)
+
+        if query_embedding is None:
+            # Zero-network path: lexical matches only
+            documents = self._lexical_search(query, k, filter_dict)
+            stats = {"candidates": len(documents), "below_threshold": 0, "score_gap": 0,
+                     "top_score": None, "lexical_only": True}
+        else:
+            documents, stats = self._search(query_embedding, k, filter_dict)
+        stats["profile"] = profile.name if profile else None
+        stats["fallback"] = False
+
+        if wants_fallback and len(documents) < k:
+            # The preferred partition is thin for this question: fill from everywhere
+            if query_embedding is None:
+                extra = self._lexical_search(query, k, self.filter)
+            else:
+                extra, _ = self._search(query_embedding, k, self.filter)
+            seen = {doc.page_content for doc in documents}
+            documents += [doc for doc in extra if doc.page_content not in seen][:k - len(documents)]
+            stats["fallback"] = True
+
+        if query_embedding is not None and self.lexical_index is not None:
+            lexical = self._lexical_search(query, k, filter_dict)
+            documents = reciprocal_rank_fusion([documents, lexical], k, self.rrf_k)
+            stats["lexical_hits"] = len(lexical)
+
+        stats["returned"] = len(documents)
+        logger.info(
+            f"Retrieved {stats['returned']} of {stats['candidates']} candidates "
+            f"({stats['below_threshold']} below threshold, {stats['score_gap']} past score gap"
+            f"{', profile ' + profile.name if profile else ''}"
+            f"{', with fallback' if stats['fallback'] else ''})"
+        )
+        return RetrievalResult(documents=documents, stats=stats)
+
+    async def aretrieve(self, query: str, profile: Optional[RetrievalProfile] = None) -> RetrievalResult:
+        """Run retrieve in the default executor.
+
+        The vector and lexical lookups are synchronous, so concurrent async
+        retrievals are capped by the default executor's thread count. Callers
+        should embed the query with aembed_query first so the executor thread
+        only does local work instead of waiting on the embedding API.
+        """
+        return await run_in_executor(None, self.retrieve, query, profile)
+
+    def _get_relevant_documents(self, query: str, *,
+                                run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.retrieve(query).documents
@@ -0,0 +1,220 @@
+# app/core/session_memory.py
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, messages_from_dict, messages_to_dict
+
+from app.config.settings import (
+    SESSION_MAX_MESSAGES,
+    SESSION_IDLE_TIMEOUT,
+    SESSION_MAX_SESSIONS
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION = "default"
+
+
+class WindowedChatHistory(BaseChatMessageHistory):
+    """Chat history that keeps only the most recent max_messages messages"""
+
+    def __init__(self, max_messages: int, messages: Optional[List[BaseMessage]] = None):
+        self.max_messages = max(2, max_messages)
+        self.messages: List[BaseMessage] = list(messages or [])[-self.max_messages:]
+        self._lock = threading.Lock()
+
+    def add_message(self, message: BaseMessage) -> None:
+        self.add_messages([message])
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        with self._lock:
+            self.messages = (self.messages + list(messages))[-self.max_messages:]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.messages = []
+
+
+class SessionMemory:
+    """Conversation memory of one session"""
+
+    def __init__(self, max_messages: int, messages: Optional[List[BaseMessage]] = None):
+        self.chat_memory = WindowedChatHistory(max_messages, messages)
+        self.last_used = time.time()
+
+    def clear(self) -> None:
+        self.chat_memory.clear()
+
+
+class SessionMemoryStore:
+    """Session-keyed conversation memory with a bounded footprint.
+
+    Each session keeps a window of its latest messages. Sessions idle for
+    longer than idle_timeout, or least recently used beyond max_sessions,
+    are evicted; with a spill_path they are written to SQLite and restored
+    when the session returns. Pinned sessions are never evicted.
+    """
+
+    # Seconds between idle-session sweeps
+    SWEEP_INTERVAL = 60
+    # Seconds a spilled session is kept before it is discarded
+    SPILL_RETENTION = 7 * 24 * 3600
+
+    def __init__(self, max_messages: int = SESSION_MAX_MESSAGES,
+                 idle_timeout: float = SESSION_IDLE_TIMEOUT,
+                 max_sessions: int = SESSION_MAX_SESSIONS,
+                 spill_path: Optional[Union[str, Path]] = None):
+        self.max_messages = max_messages
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max(1, max_sessions)
+        self.pinned = {DEFAULT_SESSION}
+        self.stats = {"created": 0, "evicted": 0, "spilled": 0, "restored": 0}
+        self._sessions: "OrderedDict[str, SessionMemory]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sweep = time.time()
+        self._conn = None
+        if spill_path:
+            self._open_spill(Path(spill_path))
+
+    def _open_spill(self, path: Path) -> None:
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(path), check_same_thread=False)
+            with self._conn:
+                self._conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS sessions (
+                        session_id TEXT PRIMARY KEY,
+                        messages TEXT NOT NULL,
+                        updated_at REAL NOT NULL
+                    )
+                    """
+                )
+            logger.info(f"Session spill file ready at {path}")
+        except Exception as e:
+            logger.warning(f"Could not open session spill file {path}, evicted sessions will be dropped: {str(e)}")
+            self._conn = None
+
+    def _spill(self, session_id: str, session: SessionMemory) -> None:
+        if self._conn is None or not session.chat_memory.messages:
+            return
+        try:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO sessions (session_id, messages, updated_at) VALUES (?, ?, ?)",
+                    (session_id, json.dumps(messages_to_dict(session.chat_memory.messages)), session.last_used)
+                )
+            self.stats["spilled"] += 1
+        except Exception as e:
+            logger.warning(f"Could not spill session {session_id}: {str(e)}")
+
+    def _restore(self, session_id: str) -> Optional[List[BaseMessage]]:
+        if self._conn is None:
+            return None
+        try:
+            with self._conn:
+                row = self._conn.execute(
+                    "SELECT messages FROM sessions WHERE session_id = ?", (session_id,)
+                ).fetchone()
+                if row is None:
+                    return None
+                self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self.stats["restored"] += 1
+            return messages_from_dict(json.loads(row[0]))
+        except Exception as e:
+            logger.warning(f"Could not restore session {session_id}: {str(e)}")
+            return None
+
+    def _evict(self, session_id: str) -> None:
+        session = self._sessions.pop(session_id)
+        self._spill(session_id, session)
+        self.stats["evicted"] += 1
+
+    def _sweep(self, now: float) -> None:
+        """Evict idle sessions and expired spilled sessions"""
+        self._last_sweep = now
+        if self.idle_timeout > 0:
+            idle = [
+                session_id for session_id, session in self._sessions.items()
+                if session_id not in self.pinned and now - session.last_used > self.idle_timeout
+            ]
+            for session_id in idle:
+                self._evict(session_id)
+            if idle:
+                logger.info(f"Evicted {len(idle)} idle sessions")
+
+        if self._conn is not None:
+            try:
+                with self._conn:
+                    self._conn.execute(
+                        "DELETE FROM sessions WHERE updated_at < ?", (now - self.SPILL_RETENTION,)
+                    )
+            except Exception as e:
+                logger.warning(f"Could not prune spilled sessions: {str(e)}")
+
+    def get(self, session_id: Optional[str] = None) -> SessionMemory:
+        """Memory for a session, created (or restored from the spill file) on first use"""
+        session_id = session_id or DEFAULT_SESSION
+        now = time.time()
+
+        with self._lock:
+            if now - self._last_sweep > self.SWEEP_INTERVAL:
+                self._sweep(now)
+
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = SessionMemory(self.max_messages, self._restore(session_id))
+                self._sessions[session_id] = session
+                self.stats["created"] += 1
+
+                # Evict least recently used sessions beyond the bound
+                overflow = len(self._sessions) - self.max_sessions
+                for candidate in list(self._sessions.keys()):
+                    if overflow <= 0:
+                        break
+                    if candidate not in self.pinned and candidate != session_id:
+                        self._evict(candidate)
+                        overflow -= 1
+
+            session.last_used = now
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def clear(self, session_id: Optional[str] = None) -> None:
+        """Forget a session's conversation, including any spilled copy"""
+        session_id = session_id or DEFAULT_SESSION
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.clear()
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self.stats, "active": len(self._sessions)}
+
+    def close(self) -> None:
+        """Spill every active session and close the spill file"""
+        with self._lock:
+            if self._conn is None:
+                return
+            for session_id, session in self._sessions.items():
+                self._spill(session_id, session)
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
@@ -1,25 +1,45 @@
 # app/core/vector_store.py
 
 import logging
+import os
 import shutil
 import tempfile
-import time
+from collections import defaultdict
 from pathlib import Path
-from typing import List, Dict, Optional, Union
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
 import atexit
+import itertools
 import numpy as np
 import chromadb
 
 from langchain_cohere import CohereEmbeddings
 from langchain_chroma import Chroma
 from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
 
-from app.core.document_processor import DocType
+from app.core.document_processor import DocType, generate_chunk_id, index_version
+from app.core.embedding_cache import EmbeddingCache, CachedEmbeddings
+from app.core.embedding_scheduler import EmbeddingScheduler, QueryBatcher
+from app.core.ingestion_manifest import IngestionManifest
+from app.core.ingestion_pipeline import IngestionPipeline
+from app.core.lexical_index import LexicalIndex
+from app.core.numpy_vector_store import NumpyCollection, NumpyVectorStore
+from app.core.retriever import build_where, mmr_select
+from app.utils.timing import phase_timer
 from app.config.settings import (
     COHERE_API_KEY,
     EMBEDDING_MODEL,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_MAX_CONCURRENCY,
+    INGEST_QUEUE_DEPTH,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    QUERY_EMBEDDING_CACHE_SIZE,
+    QUERY_EMBEDDING_BATCH_WINDOW_MS,
     VECTOR_STORE_SIMILARITY_THRESHOLD,
     VECTOR_STORE_TOP_K,
+    VECTOR_STORE_BACKEND,
+    RETRIEVAL_MODE,
+    HYBRID_RETRIEVAL,
     ENABLE_CACHE,
     CACHE_DIR,
     MMR_DIVERSITY_SCORE
@@ -31,9 +51,12 @@ class VectorStoreManager:
     _instances = {}
     _temp_dirs = set()
     COLLECTION_NAME = "game_development_docs"
-    BATCH_DELAY = 2
-    BATCH_SIZE = 5  # Reduced from 50
-    EMBEDDING_DELAY = 0.5  # Reduced from 2
+    NUMPY_INDEX_DIR = "numpy_index"
+    # Chunks per ingestion batch: enough for the embedding scheduler to fill
+    # its concurrent provider-sized requests, small enough that embedding
+    # starts while later files are still being parsed
+    BATCH_SIZE = EMBEDDING_BATCH_SIZE * EMBEDDING_MAX_CONCURRENCY
+    DELETE_BATCH_SIZE = 500
 
     @classmethod
     def reset_instances(cls):
@@ -73,33 +96,27 @@ class VectorStoreManager:
             else:
                 self.persist_directory = Path(tempfile.mkdtemp())
                 self._temp_dirs.add(self.persist_directory)
+            self.is_persistent = ENABLE_CACHE
+            self.last_sync_report = {}
+            self.timings = {"embed": 0.0, "index": 0.0}
+            # Only the process that built the store may clean it up; forked
+            # workers inherit this object (and its atexit hook) read-only
+            self._owner_pid = os.getpid()
+            self.read_only = False
+            self.backend = "numpy" if VECTOR_STORE_BACKEND == "numpy" else "chroma"
+            self.numpy_store = None
+            self.lexical_index = None
             
-            logger.info(f"Using directory for ChromaDB: {self.persist_directory}")
+            logger.info(f"Using directory for the {self.backend} vector store: {self.persist_directory}")
             
-            # Initialize embeddings with simplified configuration for Cohere
-            self.embeddings = CohereEmbeddings(
-                cohere_api_key=COHERE_API_KEY,
-                model=EMBEDDING_MODEL
-            )
+            self._create_embeddings()
+            if self.backend == "chroma":
+                self._create_chroma_client()
             
-            # Initialize ChromaDB client with unified settings
-            try:
-                from chromadb.config import Settings
-                
-                self.chroma_settings = Settings(
-                    persist_directory=str(self.persist_directory),
-                    anonymized_telemetry=False,
-                    allow_reset=True,
-                    is_persistent=True
-                )
-                
-                self.chroma_client = chromadb.Client(self.chroma_settings)
-                
-            except Exception as e:
-                logger.error(f"Failed to initialize ChromaDB client: {str(e)}")
-                self.chroma_client = chromadb.PersistentClient(
-                    path=str(self.persist_directory)
-                )
+            self.manifest = IngestionManifest(
+                self.persist_directory / "ingestion_manifest.json",
+                fingerprint=self.doc_processor.config_fingerprint() if self.doc_processor else ""
+            )
             
             logger.info("Vector store initialization completed successfully")
             
@@ -107,6 +124,110 @@ class VectorStoreManager:
             logger.error(f"Error initializing vector store: {str(e)}")
             raise
 
+    def _create_embeddings(self):
+        """Build the cached, rate-limited Cohere embedding stack"""
+        # Initialize embeddings with simplified configuration for Cohere,
+        # fronted by a content-addressed cache so rebuilds skip re-embedding
+        self.embedding_cache = EmbeddingCache(
+            self.persist_directory / "embedding_cache.sqlite3",
+            model=EMBEDDING_MODEL,
+            max_entries=EMBEDDING_CACHE_MAX_ENTRIES
+        )
+        self.embedding_scheduler = EmbeddingScheduler(
+            CohereEmbeddings(
+                cohere_api_key=COHERE_API_KEY,
+                model=EMBEDDING_MODEL
+            )
+        )
+        # Concurrent retrieval requests share query embedding calls
+        query_batcher = None
+        if QUERY_EMBEDDING_BATCH_WINDOW_MS > 0:
+            query_batcher = QueryBatcher(
+                self.embedding_scheduler.embed_queries,
+                window=QUERY_EMBEDDING_BATCH_WINDOW_MS / 1000
+            )
+        self.embeddings = CachedEmbeddings(
+            self.embedding_scheduler,
+            cache=self.embedding_cache,
+            normalize=lambda text: self._process_text_for_embedding(text)[0],
+            query_cache_size=QUERY_EMBEDDING_CACHE_SIZE,
+            query_batcher=query_batcher
+        )
+
+    def _create_chroma_client(self, allow_reset: bool = True):
+        """Initialize ChromaDB client with unified settings"""
+        try:
+            from chromadb.config import Settings
+            
+            self.chroma_settings = Settings(
+                persist_directory=str(self.persist_directory),
+                anonymized_telemetry=False,
+                allow_reset=allow_reset,
+                is_persistent=True
+            )
+            
+            self.chroma_client = chromadb.Client(self.chroma_settings)
+            
+        except Exception as e:
+            logger.error(f"Failed to initialize ChromaDB client: {str(e)}")
+            self.chroma_client = chromadb.PersistentClient(
+                path=str(self.persist_directory)
+            )
+
+    @property
+    def is_owner(self) -> bool:
+        """Whether this process built the store (and is responsible for cleaning it up)"""
+        return getattr(self, '_owner_pid', None) == os.getpid()
+
+    @classmethod
+    def for_existing_store(cls, persist_directory: Union[str, Path], owner_pid: int) -> "VectorStoreManager":
+        """Read-only manager for a store another process built and owns.
+
+        Used by workers forked before their parent created its own manager.
+        The instance is not registered as a singleton and never cleans up.
+        """
+        instance = super(VectorStoreManager, cls).__new__(cls)
+        instance.doc_processor = None
+        instance.persist_directory = Path(persist_directory)
+        instance.is_persistent = True
+        instance.last_sync_report = {}
+        instance.timings = {"embed": 0.0, "index": 0.0}
+        instance._owner_pid = owner_pid
+        instance.read_only = True
+        instance.backend = "numpy" if VECTOR_STORE_BACKEND == "numpy" else "chroma"
+        instance.numpy_store = None
+        instance.lexical_index = None
+        instance._initialized = True
+        return instance
+
+    def reattach_after_fork(self) -> VectorStore:
+        """Attach a forked worker read-only to the store built by the parent process.
+
+        ChromaDB's SQLite connections and background threads, the embedding
+        cache connection and the HTTP clients inherited across fork() are not
+        safe to use, so the worker builds its own and opens the persisted
+        collection without writing to it. The numpy backend memory-maps the
+        persisted matrix, so every worker shares the parent's page cache.
+        """
+        self.read_only = True
+        self._create_embeddings()
+        if self.backend == "chroma":
+            from chromadb.api.client import SharedSystemClient
+            
+            # Drop the parent's cached chroma System so a fresh one is started here
+            SharedSystemClient.clear_system_cache()
+            self._create_chroma_client(allow_reset=False)
+        
+        vector_store = self._open_store()
+        # Workers forked after the parent built its index inherit it; others read it from disk
+        if HYBRID_RETRIEVAL and self.lexical_index is None:
+            self.lexical_index = LexicalIndex.load(self.persist_directory)
+        logger.info(
+            f"Worker {os.getpid()} attached read-only to vector store at {self.persist_directory} "
+            f"({vector_store._collection.count()} chunks)"
+        )
+        return vector_store
+
     def _process_text_for_embedding(self, text: Union[str, List[str]]) -> List[str]:
         """Process text before embedding to ensure correct format"""
         def normalize_text(t: str) -> str:
@@ -122,155 +243,378 @@ class VectorStoreManager:
         # Process list of texts
         return [normalize_text(t) for t in text]
 
-    def get_or_create_vector_store(self, force_recreate: bool = False) -> Chroma:
+    def _open_store(self) -> VectorStore:
+        """Vector store over the persisted collection of the configured backend"""
+        if self.backend == "numpy":
+            self.numpy_store = NumpyVectorStore.load(
+                self.persist_directory / self.NUMPY_INDEX_DIR, self.embeddings
+            )
+            return self.numpy_store
+        return Chroma(
+            client=self.chroma_client,
+            collection_name=self.COLLECTION_NAME,
+            embedding_function=self.embeddings,
+            persist_directory=str(self.persist_directory)
+        )
+
+    def _get_collection(self, vector_store: Optional[VectorStore] = None):
+        """Backend collection exposing the Chroma collection API"""
+        if self.backend == "numpy":
+            return (vector_store or self.numpy_store)._collection
+        return self.chroma_client.get_collection(self.COLLECTION_NAME)
+
+    def _persist(self, vector_store: VectorStore) -> None:
+        """Flush the numpy index to disk; Chroma persists on every write"""
+        if self.backend == "numpy":
+            with phase_timer(self.timings, "index"):
+                vector_store.persist()
+
+    def _refresh_lexical_index(self, vector_store: VectorStore, rebuild: bool = False) -> None:
+        """Bring the BM25 index in line with the collection, rebuilding it only if chunks changed.
+
+        The index keeps chunk metadata but is versioned by chunk IDs alone, so
+        pass rebuild when the metadata of indexed chunks was rewritten.
+        """
+        if not HYBRID_RETRIEVAL:
+            return
+        try:
+            with phase_timer(self.timings, "index"):
+                collection = self._get_collection(vector_store)
+                version = index_version(collection.get(include=[])["ids"])
+                if not rebuild and self.lexical_index is not None and self.lexical_index.version == version:
+                    return
+                self.lexical_index = None if rebuild else LexicalIndex.load(self.persist_directory, version=version)
+                if self.lexical_index is None:
+                    self.lexical_index = LexicalIndex.from_collection(collection)
+                    self.lexical_index.save(self.persist_directory)
+                    logger.info(f"Built lexical index over {len(self.lexical_index)} chunks")
+        except Exception as e:
+            logger.warning(f"Could not build lexical index, using vector retrieval only: {str(e)}")
+            self.lexical_index = None
+
+    def get_or_create_vector_store(self, force_recreate: bool = False) -> VectorStore:
         """Get existing or create new vector store with incremental updates"""
+        if self.read_only:
+            raise RuntimeError("Vector store is attached read-only in this worker process")
         if not self.doc_processor:
             raise ValueError("Document processor not set")
             
+        self.timings = {"embed": 0.0, "index": 0.0}
         try:
-            # Load documents
-            documents = self.doc_processor.load_documents()
-            if not documents:
-                raise ValueError("No documents loaded from document processor")
-            
             # Create new vector store when force_recreate is True
             if force_recreate:
                 logger.info("Force recreating vector store")
-                return self.create_vector_store(documents)
+                return self._recreate_from_all_documents()
             
             try:
                 # Try to get existing vector store
-                vector_store = Chroma(
-                    client=self.chroma_client,
-                    collection_name=self.COLLECTION_NAME,
-                    embedding_function=self.embeddings,
-                    persist_directory=str(self.persist_directory)
-                )
-                
-                # Process new documents in batches
-                new_docs = []
-                try:
-                    collection = self.chroma_client.get_collection(self.COLLECTION_NAME)
-                    if collection:
-                        existing_ids = set(collection.get()['ids'])
-                        for doc in documents:
-                            doc_id = f"{doc.metadata['source']}_{hash(doc.page_content)}"
-                            if doc_id not in existing_ids:
-                                new_docs.append(doc)
-                except:
-                    # If collection doesn't exist, add all documents
-                    new_docs = documents
-                
-                if new_docs:
-                    logger.info(f"Found {len(new_docs)} new documents to add")
-                    for i in range(0, len(new_docs), self.BATCH_SIZE):
-                        batch = new_docs[i:i + self.BATCH_SIZE]
-                        
-                        # Process texts before adding
-                        texts = [doc.page_content for doc in batch]
-                        texts = self._process_text_for_embedding(texts)
-                        
-                        metadatas = [doc.metadata for doc in batch]
-                        vector_store.add_texts(texts=texts, metadatas=metadatas)
-                        
-                        if i + self.BATCH_SIZE < len(new_docs):
-                            time.sleep(self.BATCH_DELAY)
+                vector_store = self._open_store()
                 
+                self.last_sync_report = self._sync_incremental(vector_store)
+                self._persist(vector_store)
+                self._refresh_lexical_index(vector_store, rebuild=self.last_sync_report["refreshed"] > 0)
                 return vector_store
                 
             except Exception as e:
                 logger.warning(f"Error accessing existing vector store: {e}")
                 logger.info("Creating new vector store")
-                return self.create_vector_store(documents)
+                return self._recreate_from_all_documents()
                 
         except Exception as e:
             logger.error(f"Error in get_or_create_vector_store: {str(e)}")
             raise
 
-    def create_vector_store(self, documents: List[Document]) -> Chroma:
-        """Create a new vector store with optimized batched processing"""
+    def _recreate_from_all_documents(self) -> VectorStore:
+        """Stream every file into a rebuilt collection and rewrite the ingestion manifest"""
+        vector_store, chunk_ids_by_source = self._build_store(self.doc_processor.iter_documents())
+        try:
+            self.manifest.clear()
+            self._record_manifest(
+                self.doc_processor.list_files(), chunk_ids_by_source, self.doc_processor.failed_files
+            )
+            self.manifest.save()
+        except Exception as e:
+            logger.warning(f"Could not update ingestion manifest: {str(e)}")
+        return vector_store
+
+    def _sync_incremental(self, vector_store: VectorStore) -> Dict[str, int]:
+        """Re-process only files changed since the last ingestion and sync the collection"""
+        diff = self.manifest.diff(self.doc_processor.list_files())
+        collection = self._get_collection(vector_store)
+        with phase_timer(self.timings, "index"):
+            existing_ids = set(collection.get(include=[])['ids'])
+        
+        changed_files = diff.changed
+        retained_ids = self.manifest.chunk_ids_for(diff.unchanged)
+        if not retained_ids <= existing_ids:
+            logger.warning("Vector store is missing chunks recorded in the ingestion manifest, reprocessing all files")
+            self.manifest.clear()
+            changed_files = self.doc_processor.list_files()
+            retained_ids = set()
+        
+        documents = self.doc_processor.iter_documents(changed_files) if changed_files else iter(())
+        chunk_ids_by_source, added = self._ingest(vector_store, documents, skip_ids=existing_ids)
+        failed_files = set(self.doc_processor.failed_files) if changed_files else set()
+        
+        # Keep serving the previous chunks of files that failed to re-process
+        retained_ids |= self.manifest.chunk_ids_for(failed_files)
+        if not chunk_ids_by_source and not retained_ids:
+            raise ValueError("No documents loaded from document processor")
+        
+        report = self._remove_stale_chunks(collection, chunk_ids_by_source, retained_ids, existing_ids, added)
+        
+        self._record_manifest(changed_files, chunk_ids_by_source, failed_files)
+        for file_name in diff.removed:
+            self.manifest.remove(file_name)
+        self.manifest.save()
+        return report
+
+    def _record_manifest(self, file_paths: List[Path], chunk_ids_by_source: Dict[str, List[str]], failed_files) -> None:
+        """Record the chunk IDs produced by each successfully processed file"""
+        for file_path in file_paths:
+            if file_path.name not in failed_files:
+                self.manifest.record(file_path, chunk_ids_by_source.get(file_path.name, []))
+
+    @staticmethod
+    def _chunk_id(doc: Document) -> str:
+        """Stable ID for a chunk, shared across processes and restarts"""
+        return doc.metadata.get("chunk_id") or generate_chunk_id(
+            doc.metadata.get("source", "unknown"), doc.page_content
+        )
+
+    def _ingest(self, vector_store: VectorStore, documents: Iterable[Document],
+                skip_ids: Optional[Set[str]] = None) -> Tuple[Dict[str, List[str]], int]:
+        """Stream documents into the collection, returning their chunk IDs by source and the count added.
+
+        Documents are consumed on this thread (which drives the processor's
+        parsing) and grouped into batches that pass through bounded queues to
+        an embedding stage and an index-writer stage, each on its own thread.
+        Parsing, embedding and writing overlap, and memory stays proportional
+        to the batch size rather than the corpus. Chunks already indexed
+        (skip_ids) or seen earlier in the stream are not embedded again, but
+        indexed chunks get their metadata rewritten: chunk IDs only hash the
+        content, while offsets and chunk_index move when the file is edited.
+        """
+        skip_ids = skip_ids or set()
+        chunk_ids_by_source = defaultdict(list)
+        seen_ids = set()
+        added_ids = set()
+
+        def batches():
+            batch, refresh = [], []
+            for doc in documents:
+                doc_id = self._chunk_id(doc)
+                chunk_ids_by_source[doc.metadata.get("source")].append(doc_id)
+                if doc_id in seen_ids:
+                    continue
+                seen_ids.add(doc_id)
+                if doc_id in skip_ids:
+                    refresh.append((doc_id, doc))
+                else:
+                    added_ids.add(doc_id)
+                    batch.append((doc_id, doc))
+                if len(batch) + len(refresh) >= self.BATCH_SIZE:
+                    yield self._prepare_batch(batch), self._metadata_updates(refresh)
+                    batch, refresh = [], []
+            if batch or refresh:
+                yield self._prepare_batch(batch), self._metadata_updates(refresh)
+
+        def embed(batch):
+            (ids, texts, metadatas), updates = batch
+            embeddings = []
+            if ids:
+                with phase_timer(self.timings, "embed"):
+                    embeddings = self.embeddings.embed_documents(texts)
+            return ids, texts, metadatas, embeddings, updates
+
+        def write(batch):
+            ids, texts, metadatas, embeddings, (update_ids, update_metadatas) = batch
+            with phase_timer(self.timings, "index"):
+                if ids:
+                    vector_store._collection.upsert(
+                        ids=ids,
+                        embeddings=embeddings,
+                        metadatas=metadatas,
+                        documents=texts
+                    )
+                if update_ids:
+                    vector_store._collection.update(ids=update_ids, metadatas=update_metadatas)
+
+        pipeline = IngestionPipeline([embed, write], depth=INGEST_QUEUE_DEPTH, name="ingest")
+        pipeline.run(batches())
+        if added_ids:
+            logger.info(f"Ingested {len(added_ids)} new chunks in {pipeline.stats['processed'][-1]} batches")
+        return dict(chunk_ids_by_source), len(added_ids)
+
+    def _prepare_batch(self, batch: List[Tuple[str, Document]]) -> Tuple[List[str], List[str], List[Dict]]:
+        """IDs, embedding-ready texts and metadata of a batch of documents"""
+        ids = [doc_id for doc_id, _ in batch]
+        texts = self._process_text_for_embedding([doc.page_content for _, doc in batch])
+        metadatas = [doc.metadata for _, doc in batch]
+        return ids, texts, metadatas
+
+    @staticmethod
+    def _metadata_updates(batch: List[Tuple[str, Document]]) -> Tuple[List[str], List[Dict]]:
+        """IDs and current metadata of already indexed chunks"""
+        return [doc_id for doc_id, _ in batch], [doc.metadata for _, doc in batch]
+
+    def _sync_documents(self, vector_store: VectorStore, documents: Iterable[Document],
+                        retained_ids: Optional[Set[str]] = None,
+                        existing_ids: Optional[Set[str]] = None) -> Dict[str, int]:
+        """Bring the collection in line with documents: add new chunks, delete stale ones.
+
+        retained_ids are chunks already in the collection that must be kept even
+        though their documents were not re-loaded (unchanged files).
+        """
+        collection = self._get_collection(vector_store)
+        if existing_ids is None:
+            existing_ids = set(collection.get(include=[])['ids'])
+        
+        chunk_ids_by_source, added = self._ingest(vector_store, documents, skip_ids=existing_ids)
+        return self._remove_stale_chunks(collection, chunk_ids_by_source, retained_ids or set(), existing_ids, added)
+
+    def _remove_stale_chunks(self, collection, chunk_ids_by_source: Dict[str, List[str]],
+                             retained_ids: Set[str], existing_ids: Set[str], added: int) -> Dict[str, int]:
+        """Delete indexed chunks that are neither desired nor retained, and report the sync"""
+        desired = set(itertools.chain.from_iterable(chunk_ids_by_source.values()))
+        retained_ids = retained_ids - desired
+        stale_ids = [
+            doc_id for doc_id in existing_ids
+            if doc_id not in desired and doc_id not in retained_ids
+        ]
+        
+        if stale_ids:
+            logger.info(f"Removing {len(stale_ids)} stale chunks")
+            with phase_timer(self.timings, "index"):
+                for i in range(0, len(stale_ids), self.DELETE_BATCH_SIZE):
+                    collection.delete(ids=stale_ids[i:i + self.DELETE_BATCH_SIZE])
+        
+        report = {
+            "added": added,
+            "removed": len(stale_ids),
+            "unchanged": len(desired) - added + len(retained_ids),
+            # Re-processed chunks that were already indexed and had their metadata rewritten
+            "refreshed": len(desired & existing_ids)
+        }
+        logger.info(
+            f"Vector store sync: {report['added']} added, "
+            f"{report['removed']} removed, {report['unchanged']} unchanged"
+        )
+        return report
+
+    def create_vector_store(self, documents: Iterable[Document]) -> VectorStore:
+        """Create a new vector store from a list or stream of documents"""
+        if documents is None or (isinstance(documents, list) and not documents):
+            logger.warning("No documents provided to create vector store")
+            raise ValueError("Cannot create vector store with empty document list")
+        vector_store, _ = self._build_store(documents)
+        return vector_store
+
+    def _build_store(self, documents: Iterable[Document]) -> Tuple[VectorStore, Dict[str, List[str]]]:
+        """Stream documents into a fresh collection, returning it and the chunk IDs by source"""
         try:
-            if not documents:
+            # Only reset the existing collection once there is something to replace it with
+            documents = iter(documents)
+            first = next(documents, None)
+            if first is None:
                 logger.warning("No documents provided to create vector store")
                 raise ValueError("Cannot create vector store with empty document list")
 
-            # Reset the client
-            self.chroma_client.reset()
+            logger.info("Creating new vector store")
             
-            logger.info(f"Creating new vector store with {len(documents)} documents")
-            
-            # Create new Chroma vector store with initial small batch
-            first_batch = documents[:self.BATCH_SIZE]
-            texts = [doc.page_content for doc in first_batch]
-            texts = self._process_text_for_embedding(texts)
-            metadatas = [doc.metadata for doc in first_batch]
-            
-            vector_store = Chroma.from_texts(
-                texts=texts,
-                embedding=self.embeddings,
-                metadatas=metadatas,
-                client=self.chroma_client,
-                collection_name=self.COLLECTION_NAME
-            )
-
-            # Process remaining documents in smaller batches
-            remaining_docs = documents[self.BATCH_SIZE:]
-            for i in range(0, len(remaining_docs), self.BATCH_SIZE):
-                batch = remaining_docs[i:i + self.BATCH_SIZE]
-                texts = [doc.page_content for doc in batch]
-                texts = self._process_text_for_embedding(texts)
-                metadatas = [doc.metadata for doc in batch]
-                
-                try:
-                    vector_store.add_texts(texts=texts, metadatas=metadatas)
-                    if i + self.BATCH_SIZE < len(remaining_docs):
-                        time.sleep(self.EMBEDDING_DELAY)
-                except Exception as e:
-                    logger.error(f"Error processing batch {i//self.BATCH_SIZE}: {str(e)}")
-                    continue
+            if self.backend == "numpy":
+                self.numpy_store = NumpyVectorStore(
+                    NumpyCollection(self.persist_directory / self.NUMPY_INDEX_DIR), self.embeddings
+                )
+                vector_store = self.numpy_store
+            else:
+                # Reset the client
+                self.chroma_client.reset()
+                vector_store = Chroma(
+                    client=self.chroma_client,
+                    collection_name=self.COLLECTION_NAME,
+                    embedding_function=self.embeddings
+                )
+            chunk_ids_by_source, added = self._ingest(vector_store, itertools.chain([first], documents))
+            self._persist(vector_store)
+            self._refresh_lexical_index(vector_store)
             
-            logger.info(f"Successfully created vector store with {len(documents)} documents")
-            return vector_store
+            self.last_sync_report = {"added": added, "removed": 0, "unchanged": 0, "refreshed": 0}
+            logger.info(f"Successfully created vector store with {added} chunks")
+            logger.info(f"Embedding cache stats: {self.embedding_cache.get_stats()}")
+            logger.info(f"Embedding scheduler stats: {self.embedding_scheduler.stats}")
+            return vector_store, chunk_ids_by_source
                     
         except Exception as e:
             logger.error(f"Error creating vector store: {str(e)}")
             raise
 
-    def similarity_search_with_filter(self, query: str, filter_dict: Dict, k: int = 4,fetch_k: Optional[int] = None) -> List[Document]:
+    def similarity_search_with_filter(self, query: str, filter_dict: Optional[Dict] = None, k: int = 4,
+                                      fetch_k: Optional[int] = None) -> List[Document]:
         """Perform similarity search with metadata filtering"""
+        return self.batch_similarity_search_with_filter([query], filter_dict, k=k, fetch_k=fetch_k)[0]
+
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        embed_queries = getattr(self.embeddings, "embed_queries", None)
+        if embed_queries is not None:
+            return embed_queries(queries)
+        return [self.embeddings.embed_query(query) for query in queries]
+
+    def batch_similarity_search_with_filter(self, queries: List[str], filter_dict: Optional[Dict] = None,
+                                            k: int = 4, fetch_k: Optional[int] = None) -> List[List[Document]]:
+        """Filtered similarity search for several queries at once.
+
+        filter_dict maps metadata keys (e.g. doc_type, source, has_code) to a
+        value or a list of accepted values; the predicates are pushed down to
+        the index as a where clause, so only matching chunks are scored. The
+        queries are embedded with the configured cached embedding function in
+        one batched call and searched in one collection query.
+        """
         try:
-            collection = self.chroma_client.get_collection(name=self.COLLECTION_NAME)
+            collection = self._get_collection()
             
             # Process query text - ensure it's a string
-            if not isinstance(query, str):
-                query = str(query)
+            queries = [query if isinstance(query, str) else str(query) for query in queries]
+            if not queries:
+                return []
             
             # For MMR, fetch more candidates
             if fetch_k is None:
                 fetch_k = k * 2
             
-            # Convert filter dict to Chroma filter format
-            where = {f"metadata.{key}": value for key, value in filter_dict.items()}
-            
-            results = collection.query(
-                query_texts=[query],  # Pass as list
-                n_results=k,
-                where=where,
-                include=["documents", "metadatas"]
-            )
+            use_mmr = RETRIEVAL_MODE == "mmr"
+            query_embeddings = self._embed_queries(queries)
+            query_kwargs = {
+                "query_embeddings": query_embeddings,
+                "n_results": max(fetch_k, k) if use_mmr else k,
+                "include": ["documents", "metadatas", "embeddings"] if use_mmr else ["documents", "metadatas"]
+            }
+            where = build_where(filter_dict)
+            if where:
+                query_kwargs["where"] = where
+            results = collection.query(**query_kwargs)
             
-            # Convert results to Document objects
-            documents = []
-            if results and results['documents'] and results['documents'][0]:
-                for i in range(len(results['documents'][0])):
-                    doc = Document(
-                        page_content=results['documents'][0][i],
-                        metadata=results['metadatas'][0][i]
+            # Convert results to Document objects, one list per query
+            batch = []
+            for i, query_embedding in enumerate(query_embeddings):
+                documents = [
+                    Document(page_content=text, metadata=metadata or {})
+                    for text, metadata in zip(results['documents'][i], results['metadatas'][i])
+                ]
+                
+                # Re-rank the candidates for diversity
+                if use_mmr and documents:
+                    selected = mmr_select(
+                        query_embedding,
+                        np.asarray(results['embeddings'][i], dtype=np.float32),
+                        k,
+                        1 - MMR_DIVERSITY_SCORE
                     )
-                    documents.append(doc)
+                    documents = [documents[j] for j in selected]
+                batch.append(documents)
             
-            logger.debug(f"Found {len(documents)} documents matching filter {filter_dict}")
-            return documents
+            logger.debug(f"Found {[len(docs) for docs in batch]} documents matching filter {filter_dict}")
+            return batch
             
         except Exception as e:
             logger.error(f"Error in similarity search: {str(e)}")
@@ -308,6 +652,9 @@ class VectorStoreManager:
 
     def cleanup_all(self):
         """Cleanup method called on system exit"""
+        # atexit hooks are inherited by forked workers; only the owner cleans up
+        if not self.is_owner:
+            return
         try:
             logger = logging.getLogger(__name__)
             handler = logging.StreamHandler()
@@ -338,11 +685,15 @@ class VectorStoreManager:
                 except:
                     pass
 
-                if hasattr(self, 'chroma_client'):
+                # A persistent store must survive restarts so the next boot can sync incrementally
+                if hasattr(self, 'chroma_client') and not getattr(self, 'is_persistent', False):
                     try:
                         self.chroma_client.reset()
                     except:
                         pass
+
+                if hasattr(self, 'embedding_cache'):
+                    self.embedding_cache.close()
                         
                 logger.info("Final cleanup completed")
                 
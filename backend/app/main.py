@@ -6,16 +6,21 @@ import os
 from flask import Flask, jsonify
 from flask_cors import CORS
 from app.api.routes import api_bp
-from app.core.initializer import initialize_app
+from app.core.initializer import initialize_app, start_background_initialization
 from app.utils.version_check import check_versions
 from app.utils.llm_health_check import check_llm_connection
-from app.config.settings import DEBUG, ALLOWED_ORIGIN
+from app.config.settings import DEBUG, ALLOWED_ORIGIN, BACKGROUND_INIT
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def create_app(force_recreate=False):
-    """Application factory function"""
+def create_app(force_recreate=False, background_init=None):
+    """Application factory function.
+
+    With background_init (default: BACKGROUND_INIT) the app is returned
+    immediately and components are built on a background thread; /api/
+    reports readiness and /api/ask answers 503 until retrieval is ready.
+    """
     try:
         app = Flask(__name__)
         
@@ -57,11 +62,17 @@ def create_app(force_recreate=False):
             return response
         """
         
+        if background_init is None:
+            background_init = BACKGROUND_INIT
+        
         # Initialize components before registering blueprints
-        with app.app_context():
-            logger.info("Starting application initialization...")
-            initialize_app(force_recreate)
-            logger.info("Application initialization completed")
+        if background_init:
+            start_background_initialization(force_recreate)
+        else:
+            with app.app_context():
+                logger.info("Starting application initialization...")
+                initialize_app(force_recreate)
+                logger.info("Application initialization completed")
         
         # Register blueprints
         app.register_blueprint(api_bp, url_prefix='/api')
@@ -0,0 +1,186 @@
+# app/utils/code_segmenter.py
+
+import hashlib
+import itertools
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+Segment = Tuple[int, int]
+
+
+class CodeSegmenter:
+    """Splits C#/T# code into chunks at class, member and statement boundaries.
+
+    One linear scan over the code's tokens tracks strings, comments and brace
+    depth, so braces inside literals or comments never end a block. Line
+    starts are recorded as boundaries where the previous member or top-level
+    statement is complete (outside any method or other code block), and as
+    statement boundaries where the previous statement is complete at any
+    depth. Members are packed greedily into chunks of at most max_size; a
+    member that does not fit on its own is split at statement boundaries,
+    then at lines.
+
+    Segmentations are memoized by a hash of the code, so unchanged code
+    blocks are not scanned again.
+    """
+
+    # Compiled once per process and shared by every instance. The lookahead
+    # lets the regex engine skip quickly over text that cannot start a token.
+    TOKEN_PATTERN = re.compile(
+        r'(?=[/"\'@${};])(?:'
+        r'(?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z))'
+        r'|(?P<string>(?:\$@|@\$|@)"(?:[^"]|"")*"|\$?"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\')'
+        r'|(?P<open>\{)|(?P<close>\})|(?P<semi>;))',
+        re.DOTALL
+    )
+    CONTAINER_PATTERN = re.compile(r'\b(?:class|struct|interface|namespace|enum|record)\b')
+    LINE_START_PATTERN = re.compile(r'\n(?=[^\S\n]*\S)')
+    WHITESPACE_PATTERN = re.compile(r'\s*')
+
+    CACHE_SIZE = 1024
+    _cache: "OrderedDict[Tuple, Tuple[Segment, ...]]" = OrderedDict()
+    _cache_lock = threading.Lock()
+
+    def __init__(self, max_size: int, min_size: int = 0):
+        self.max_size = max_size
+        self.min_size = min_size
+
+    def segment(self, code: str) -> List[Segment]:
+        """(start, end) offsets of the chunks of code, without trailing whitespace"""
+        key = (hashlib.blake2b(code.encode("utf-8"), digest_size=16).digest(), self.max_size, self.min_size)
+        with self._cache_lock:
+            segments = self._cache.get(key)
+            if segments is not None:
+                self._cache.move_to_end(key)
+                return list(segments)
+
+        segments = tuple(self._segment(code))
+        with self._cache_lock:
+            self._cache[key] = segments
+            if len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return list(segments)
+
+    @classmethod
+    def clear_cache(cls) -> None:
+        with cls._cache_lock:
+            cls._cache.clear()
+
+    def _segment(self, code: str) -> List[Segment]:
+        member_starts, statement_starts = self._scan(code)
+
+        def split_statements(start: int, end: int) -> List[Segment]:
+            bounds = [start] + [s for s in statement_starts if start < s < end] + [end]
+            return self._pack(bounds, split_lines)
+
+        def split_lines(start: int, end: int) -> List[Segment]:
+            bounds = [start]
+            newline = code.find("\n", start, end)
+            while newline != -1:
+                bounds.append(newline + 1)
+                newline = code.find("\n", newline + 1, end)
+            bounds.append(end)
+            return self._pack(bounds, self._cut)
+
+        segments = self._pack(member_starts + [len(code)], split_statements)
+        return self._merge_small(code, segments)
+
+    def _scan(self, code: str) -> Tuple[List[int], List[int]]:
+        """Line starts that begin a new member (or top-level statement), and a new statement"""
+        member_starts = [0]
+        statement_starts = []
+        # One entry per open brace: whether it opened a type or namespace body
+        containers: List[bool] = []
+        open_blocks = 0  # open braces that are not type or namespace bodies
+        header_start = 0  # where the statement or declaration being read began
+        member_pending = statement_pending = False
+        last_end = 0
+
+        for match in itertools.chain(self.TOKEN_PATTERN.finditer(code), [None]):
+            # The first non-blank line after a completed statement starts a new
+            # one; a token is never whitespace, so its own line is never blank
+            if statement_pending or member_pending:
+                line = self.LINE_START_PATTERN.search(code, last_end, match.start() + 1 if match else len(code))
+                if line is not None:
+                    line_start = line.end()
+                    statement_starts.append(line_start)
+                    statement_pending = False
+                    if member_pending and open_blocks == 0:
+                        member_starts.append(line_start)
+                        member_pending = False
+            if match is None:
+                break
+            last_end = match.end()
+
+            kind = match.lastgroup
+            if kind == "comment":
+                # Comments before a declaration are not part of its header
+                if self.WHITESPACE_PATTERN.fullmatch(code, header_start, match.start()):
+                    header_start = match.end()
+            elif kind == "open":
+                is_container = open_blocks == 0 and bool(
+                    self.CONTAINER_PATTERN.search(code, header_start, match.start())
+                )
+                containers.append(is_container)
+                if is_container:
+                    member_pending = True
+                else:
+                    open_blocks += 1
+                header_start = match.end()
+                statement_pending = True
+            elif kind == "close":
+                if containers and not containers.pop():
+                    open_blocks -= 1
+                header_start = match.end()
+                statement_pending = True
+                member_pending = member_pending or open_blocks == 0
+            elif kind == "semi":
+                header_start = match.end()
+                statement_pending = True
+                member_pending = member_pending or open_blocks == 0
+
+        return member_starts, statement_starts
+
+    def _pack(self, bounds: List[int], split: Callable[[int, int], List[Segment]]) -> List[Segment]:
+        """Greedily join consecutive units into chunks of at most max_size, splitting oversized units"""
+        segments = []
+        chunk_start: Optional[int] = None
+        chunk_end = 0
+        for start, end in zip(bounds, bounds[1:]):
+            if end <= start:
+                continue
+            if end - start > self.max_size:
+                if chunk_start is not None:
+                    segments.append((chunk_start, chunk_end))
+                    chunk_start = None
+                segments.extend(split(start, end))
+                continue
+            if chunk_start is not None and end - chunk_start > self.max_size:
+                segments.append((chunk_start, chunk_end))
+                chunk_start = None
+            if chunk_start is None:
+                chunk_start = start
+            chunk_end = end
+        if chunk_start is not None:
+            segments.append((chunk_start, chunk_end))
+        return segments
+
+    def _cut(self, start: int, end: int) -> List[Segment]:
+        """Last resort for a single line longer than max_size"""
+        return [(i, min(i + self.max_size, end)) for i in range(start, end, self.max_size)]
+
+    def _merge_small(self, code: str, segments: List[Segment]) -> List[Segment]:
+        """Trim trailing whitespace and fold chunks under min_size into their predecessor"""
+        merged: List[Segment] = []
+        for start, end in segments:
+            while end > start and code[end - 1].isspace():
+                end -= 1
+            if end == start:
+                continue
+            if merged and end - start < self.min_size and end - merged[-1][0] <= self.max_size:
+                merged[-1] = (merged[-1][0], end)
+            else:
+                merged.append((start, end))
+        return merged
@@ -1,9 +1,11 @@
 # app/utils/text_splitter.py
 
 import re
-from typing import List
+import threading
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
 from langchain.text_splitter import TextSplitter
 from langchain.schema import Document
+from app.utils.code_segmenter import CodeSegmenter
 from app.config.settings import (
     CHUNK_SIZE, 
     CHUNK_OVERLAP, 
@@ -14,7 +16,55 @@ from app.config.settings import (
     MAX_CODE_CHUNK_SIZE
 )
 
+MARKDOWN = "markdown"
+CODE = "code"
+FENCE = "```"
+CODE_OPEN = "```csharp\n"
+CODE_CLOSE = "\n```"
+
+class Span(NamedTuple):
+    """A piece of a chunk, as offsets into the document being split.
+
+    Markdown spans render as the text itself. Code spans render as the code
+    wrapped in a csharp fence.
+    """
+    start: int
+    end: int
+    kind: str
+
+class Chunk(NamedTuple):
+    """A rendered chunk and the offsets of the document text it covers.
+
+    Offsets exclude the fences of code. The first overlap characters of the
+    chunk's source (from start_offset) repeat the end of the previous chunk.
+    """
+    text: str
+    start_offset: int
+    end_offset: int
+    overlap: int
+
 class CustomMarkdownSplitter(TextSplitter):
+    """Splits markdown into chunks at headers, code blocks and method boundaries.
+
+    The document is walked once and every chunk is produced as a list of
+    spans over the original text; sizes are computed from offsets, and chunk
+    text is built only when a chunk is rendered.
+
+    Each chunk after the first starts with up to chunk_overlap characters
+    from the end of the previous one, when both continue the same markdown
+    section or code block. The overlap window is the first span moved back
+    to a line (code) or sentence (markdown) boundary, so it costs no copies.
+    """
+
+    # Bump whenever a change alters the chunks produced for the same input,
+    # so persisted ingestion manifests are invalidated
+    VERSION = 3
+
+    # Shared instances by (chunk_size, chunk_overlap); splitting keeps no
+    # per-call state, so one instance serves every document of that size
+    _registry: Dict[Tuple[int, int], "CustomMarkdownSplitter"] = {}
+    _registry_lock = threading.Lock()
+
     def __init__(self, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP):
         super().__init__()
         self.chunk_size = chunk_size
@@ -22,282 +72,279 @@ class CustomMarkdownSplitter(TextSplitter):
         self.min_chunk_size = MIN_CHUNK_SIZE
         self.max_chunk_size = MAX_CHUNK_SIZE
 
-        self.markdown_header_pattern = re.compile(r'^#+\s+')
-        self.code_block_pattern = re.compile(r'```[\s\S]*?```')
-        self.class_pattern = re.compile(r'public class (\w+)')
-        self.method_pattern = re.compile(r'\s+(private|public|protected)\s+\w+\s+\w+\s*\([^)]*\)\s*\{')
-        self.control_pattern = re.compile(r'^\s*(if|for|while|foreach|switch)\s*\(')
+        # Matched at line offsets into the whole document
+        self.markdown_header_pattern = re.compile(r'#+\s+')
+        # Where an overlap window may start, searched forward from its widest start
+        self.overlap_boundary_patterns = {
+            MARKDOWN: re.compile(r'\n|(?<=[.!?])[ \t]+'),
+            CODE: re.compile(r'\n')
+        }
+        # Code chunks leave room for a short preceding heading or paragraph to
+        # be combined with them without exceeding MAX_CHUNK_SIZE
+        self.code_segmenter = CodeSegmenter(
+            max_size=min(MAX_CODE_CHUNK_SIZE, MAX_CHUNK_SIZE - self.min_chunk_size) - len(CODE_OPEN) - len(CODE_CLOSE),
+            min_size=self.min_chunk_size
+        )
+
+    @classmethod
+    def for_config(cls, chunk_size: int, chunk_overlap: int) -> "CustomMarkdownSplitter":
+        """The shared splitter for a chunking configuration"""
+        key = (chunk_size, chunk_overlap)
+        splitter = cls._registry.get(key)
+        if splitter is None:
+            with cls._registry_lock:
+                splitter = cls._registry.setdefault(key, cls(chunk_size=chunk_size, chunk_overlap=chunk_overlap))
+        return splitter
 
     def split_text(self, text: str) -> List[str]:
+        return [self.render(text, spans) for spans in self.split_spans(text)]
+
+    def split_chunks(self, text: str, fences: Optional[Sequence[int]] = None) -> List[Chunk]:
+        """Chunks of text with the offsets they cover.
+
+        fences, if given, are the offsets of every code fence in text, as
+        find_fences returns them.
+        """
+        return [
+            Chunk(self.render(text, spans), spans[0].start, spans[-1].end, overlap)
+            for spans, overlap in self._split_windows(text, fences)
+        ]
+
+    def split_spans(self, text: str) -> List[List[Span]]:
+        """Chunks of text, each as the list of spans it is rendered from"""
+        return [spans for spans, _ in self._split_windows(text)]
+
+    def _split_windows(self, text: str, fences: Optional[Sequence[int]] = None) -> List[Tuple[List[Span], int]]:
+        """Chunks as span lists, overlap windows included, with each window's length"""
         if not text.strip():
             return []
 
-        # First split into markdown sections and code blocks
-        sections = self._split_into_sections(text)
-        
-        # Process each section appropriately
-        chunks = []
-        for section_type, content in sections:
-            if section_type == "markdown":
-                chunks.extend(self._split_markdown(content))
-            elif section_type == "code":
-                chunks.extend(self._split_code_block(content))
+        # First split into markdown sections and code blocks, then process
+        # each section appropriately
+        pieces = []
+        for section in self._split_into_sections(text, fences):
+            if section.kind == MARKDOWN:
+                pieces.extend(self._split_markdown(text, section.start, section.end))
+            else:
+                pieces.extend(self._split_code_block(text, *self._code_bounds(text, section)))
 
         # Restore proper chunk sizes by combining small chunks
-        final_chunks = self._combine_small_chunks(chunks)
-        
-        return final_chunks
+        chunks = self._combine_small_chunks(text, pieces)
+
+        windows = [(chunks[0], 0)] if chunks else []
+        for previous, spans in zip(chunks, chunks[1:]):
+            start = self._window_start(text, previous[-1], spans)
+            windows.append(([Span(start, spans[0].end, spans[0].kind)] + spans[1:], spans[0].start - start))
+        return windows
+
+    def _window_start(self, text: str, previous: Span, spans: List[Span]) -> int:
+        """Where the overlap window of a chunk starts in the last span of the previous chunk"""
+        first = spans[0]
+        # Overlap only within one markdown section or code block
+        if previous.kind != first.kind or self._stripped_length(text, previous.end, first.start):
+            return first.start
+
+        length = sum(self._span_length(span) for span in spans) + len(spans) - 1
+        start = max(previous.start, first.start - min(self.chunk_overlap, MAX_CHUNK_SIZE - length))
+        if start >= first.start:
+            return first.start
+        if start > previous.start and text[start - 1] != "\n":
+            boundary = self.overlap_boundary_patterns[first.kind].search(text, start, previous.end)
+            if boundary is None:
+                return first.start
+            start = boundary.end()
+        return start if self._stripped_length(text, start, first.start) else first.start
+
+    @staticmethod
+    def render(text: str, spans: List[Span]) -> str:
+        """Chunk text: the rendered spans joined by newlines"""
+        parts = []
+        for span in spans:
+            if span.kind == CODE:
+                parts.append(f"{CODE_OPEN}{text[span.start:span.end]}{CODE_CLOSE}")
+            else:
+                parts.append(text[span.start:span.end])
+        return "\n".join(parts)
+
+    @staticmethod
+    def _span_length(span: Span) -> int:
+        """Length of a span's rendered text"""
+        if span.kind == CODE:
+            return span.end - span.start + len(CODE_OPEN) + len(CODE_CLOSE)
+        return span.end - span.start
+
+    @staticmethod
+    def _lines(text: str, start: int, end: int) -> Iterator[Tuple[int, int]]:
+        """Offsets of the lines of text[start:end], as text[start:end].split('\\n') would give"""
+        while True:
+            newline = text.find("\n", start, end)
+            if newline == -1:
+                yield start, end
+                return
+            yield start, newline
+            start = newline + 1
+
+    @staticmethod
+    def _stripped_length(text: str, start: int, end: int) -> int:
+        """len(text[start:end].strip()) without copying the span"""
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        return end - start
 
-    def _split_into_sections(self, text: str) -> List[tuple]:
-        """Split text into alternating markdown and code sections"""
+    @staticmethod
+    def find_fences(text: str) -> List[int]:
+        """Offsets of the code fences in text, in order and without overlaps"""
+        fences = []
+        start = text.find(FENCE)
+        while start != -1:
+            fences.append(start)
+            start = text.find(FENCE, start + len(FENCE))
+        return fences
+
+    def _split_into_sections(self, text: str, fences: Optional[Sequence[int]] = None) -> List[Span]:
+        """Split text into alternating markdown sections and fenced code blocks"""
+        if fences is None:
+            fences = self.find_fences(text)
         sections = []
         last_end = 0
-        
-        for match in self.code_block_pattern.finditer(text):
+
+        # Fences pair up in order; an unmatched last fence is left as markdown
+        for start, close in zip(fences[::2], fences[1::2]):
             # Add markdown section before code block
-            if match.start() > last_end:
-                sections.append(("markdown", text[last_end:match.start()]))
-            
-            # Add code block
-            sections.append(("code", match.group(0)))
-            last_end = match.end()
-        
+            if start > last_end:
+                sections.append(Span(last_end, start, MARKDOWN))
+
+            # Add code block, fences included
+            last_end = close + len(FENCE)
+            sections.append(Span(start, last_end, CODE))
+
         # Add remaining markdown section
         if last_end < len(text):
-            sections.append(("markdown", text[last_end:]))
-            
+            sections.append(Span(last_end, len(text), MARKDOWN))
+
         return sections
 
-    def _split_markdown(self, text: str) -> List[str]:
+    @staticmethod
+    def _code_bounds(text: str, block: Span) -> Tuple[int, int]:
+        """Offsets of a fenced block's code, without the fences and a csharp tag"""
+        start, end = block.start + len(FENCE), block.end - len(FENCE)
+        if text.startswith("csharp\n", start, end):
+            start += len("csharp\n")
+        return start, end
+
+    def _split_markdown(self, text: str, start: int, end: int) -> List[Span]:
         """Split markdown content by headers"""
         chunks = []
-        current_chunk = []
+        chunk_start = None
+        chunk_end = start
         current_size = 0
-        
-        lines = text.split('\n')
-        
-        for line in lines:
-            line_size = len(line) + 1
-            
+
+        for line_start, line_end in self._lines(text, start, end):
+            line_size = line_end - line_start + 1
+
             # Start new chunk on header or size limit
-            if (self.markdown_header_pattern.match(line) or 
-                current_size + line_size > self.chunk_size) and current_chunk:
-                chunks.append('\n'.join(current_chunk))
-                current_chunk = []
+            is_header = (
+                text.startswith("#", line_start, line_end)
+                and self.markdown_header_pattern.match(text, line_start, line_end)
+            )
+            if chunk_start is not None and (is_header or current_size + line_size > self.chunk_size):
+                chunks.append(Span(chunk_start, chunk_end, MARKDOWN))
+                chunk_start = None
                 current_size = 0
-            
-            current_chunk.append(line)
+
+            if chunk_start is None:
+                chunk_start = line_start
+            chunk_end = line_end
             current_size += line_size
-        
-        if current_chunk:
-            chunks.append('\n'.join(current_chunk))
-        
+
+        if chunk_start is not None:
+            chunks.append(Span(chunk_start, chunk_end, MARKDOWN))
+
         return chunks
 
-    def _split_code_block(self, text: str) -> List[str]:
-        """Split code blocks by logical boundaries with improved size handling"""
-        # Remove code fence markers
-        code = text.replace('```csharp\n', '').replace('```', '')
-        
+    def _split_code_block(self, text: str, start: int, end: int) -> List[Span]:
+        """Split the code text[start:end] at class, member and statement boundaries"""
         # Skip empty or too small code blocks
-        if len(code.strip()) < self.min_chunk_size:
+        if self._stripped_length(text, start, end) < self.min_chunk_size:
             return []
-        
-        # For very large code blocks, split by logical boundaries
-        chunks = []
-        current_chunk = []
-        current_size = 0
-        in_method = False
-        method_lines = []
-        
-        lines = code.split('\n')
-        buffer = []  # Add a buffer to accumulate small chunks
-        buffer_size = 0
-        
-        for line in lines:
-            line_size = len(line) + 1
-            
-            # Method start detection
-            if self.method_pattern.search(line):
-                # Handle any buffered content first
-                if buffer:
-                    if buffer_size >= self.min_chunk_size:
-                        chunks.append(f"```csharp\n{chr(10).join(buffer)}\n```")
-                    buffer = []
-                    buffer_size = 0
-                    
-                # Save previous method if exists
-                if method_lines and current_size > self.min_chunk_size:
-                    chunk_content = '\n'.join(method_lines)
-                    chunks.append(f"```csharp\n{chunk_content}\n```")
-                    method_lines = []
-                    current_size = 0
-                    
-                in_method = True
-                method_lines = [line]
-                current_size = line_size
-                continue
-                
-            if in_method:
-                # If adding this line would exceed max size, split the method
-                if current_size + line_size > MAX_CODE_CHUNK_SIZE - 20:  # Leave room for fence markers
-                    if method_lines:
-                        chunk_content = '\n'.join(method_lines)
-                        chunks.append(f"```csharp\n{chunk_content}\n```")
-                        method_lines = [line]
-                        current_size = line_size
-                        in_method = line.strip() != '}'
-                else:
-                    method_lines.append(line)
-                    current_size += line_size
-                    
-                    # Method end detection
-                    if line.strip() == '}':
-                        if current_size >= self.min_chunk_size:
-                            chunk_content = '\n'.join(method_lines)
-                            chunks.append(f"```csharp\n{chunk_content}\n```")
-                        method_lines = []
-                        current_size = 0
-                        in_method = False
-                continue
-            
-            # Handle non-method code
-            if self.class_pattern.search(line) or buffer_size + line_size > MAX_CODE_CHUNK_SIZE - 20:
-                if buffer and buffer_size >= self.min_chunk_size:
-                    chunks.append(f"```csharp\n{chr(10).join(buffer)}\n```")
-                buffer = []
-                buffer_size = 0
-            
-            buffer.append(line)
-            buffer_size += line_size
-            
-            # Force split if we're approaching the limit
-            if buffer_size >= MAX_CODE_CHUNK_SIZE - 100:  # Add some buffer
-                if buffer_size >= self.min_chunk_size:
-                    chunks.append(f"```csharp\n{chr(10).join(buffer)}\n```")
-                buffer = []
-                buffer_size = 0
-        
-        # Handle remaining content
-        if method_lines and current_size >= self.min_chunk_size:
-            chunk_content = '\n'.join(method_lines)
-            chunks.append(f"```csharp\n{chunk_content}\n```")
-        elif buffer and buffer_size >= self.min_chunk_size:
-            chunks.append(f"```csharp\n{chr(10).join(buffer)}\n```")
-        
-        return [chunk for chunk in chunks if len(chunk.strip()) >= self.min_chunk_size]
-
-    def _split_method_chunk(self, content: str) -> List[str]:
-        """Split a large method into smaller logical chunks"""
-        lines = content.split('\n')
-        chunks = []
-        current_chunk = []
-        current_size = 0
-        brace_count = 0
-        
-        for line in lines:
-            line_size = len(line) + 1
-            line_stripped = line.strip()
-            
-            # Track brace depth
-            brace_count += line_stripped.count('{') - line_stripped.count('}')
-            
-            # Determine if this is a good split point
-            is_split_point = (
-                brace_count == 0 and  # At same brace level
-                (line_stripped == '' or  # Empty line
-                 self.control_pattern.match(line) or  # Control structure
-                 line_stripped.endswith(';'))  # Statement end
-            )
-            
-            if current_size + line_size > self.max_chunk_size:
-                if current_chunk:
-                    chunks.append('\n'.join(current_chunk))
-                current_chunk = [line]
-                current_size = line_size
-            else:
-                current_chunk.append(line)
-                current_size += line_size
-                
-                # Split at logical boundaries if chunk is large enough
-                if is_split_point and current_size > self.min_chunk_size:
-                    chunks.append('\n'.join(current_chunk))
-                    current_chunk = []
-                    current_size = 0
-        
-        if current_chunk:
-            chunks.append('\n'.join(current_chunk))
-        
-        return chunks
 
-    def _combine_small_chunks(self, chunks: List[str]) -> List[str]:
-        """Combine chunks that are too small"""
+        return [
+            Span(start + segment_start, start + segment_end, CODE)
+            for segment_start, segment_end in self.code_segmenter.segment(text[start:end])
+            if segment_end - segment_start + len(CODE_OPEN) + len(CODE_CLOSE) >= self.min_chunk_size
+        ]
+
+    def _combine_small_chunks(self, text: str, pieces: List[Span]) -> List[List[Span]]:
+        """Combine pieces that are too small; each combined chunk is joined by newlines"""
         combined_chunks = []
         current_chunk = []
         current_size = 0
-        
-        for chunk in chunks:
-            chunk_size = len(chunk)
-            
+
+        for piece in pieces:
+            chunk_size = self._span_length(piece)
+
             if chunk_size > MAX_CHUNK_SIZE:
                 # Split oversized chunk
                 if current_chunk:
-                    combined_chunks.append('\n'.join(current_chunk))
+                    combined_chunks.append(current_chunk)
                     current_chunk = []
                     current_size = 0
                 # Split the large chunk by size while preserving markdown/code structure
-                split_chunks = self._split_oversized_chunk(chunk)
-                combined_chunks.extend(split_chunks)
+                combined_chunks.extend([span] for span in self._split_oversized_chunk(text, piece))
             elif current_size + chunk_size > MAX_CHUNK_SIZE:
-                combined_chunks.append('\n'.join(current_chunk))
-                current_chunk = [chunk]
+                combined_chunks.append(current_chunk)
+                current_chunk = [piece]
                 current_size = chunk_size
             else:
-                current_chunk.append(chunk)
+                current_chunk.append(piece)
                 current_size += chunk_size
-                
+
                 # Check if we've reached a good size
                 if current_size >= self.min_chunk_size:
-                    combined_chunks.append('\n'.join(current_chunk))
+                    combined_chunks.append(current_chunk)
                     current_chunk = []
                     current_size = 0
-        
+
         if current_chunk:
             # If remaining chunk is too small, append to previous
             if current_size < self.min_chunk_size and combined_chunks:
-                last_chunk = combined_chunks.pop()
-                combined_chunks.append(last_chunk + '\n' + '\n'.join(current_chunk))
+                combined_chunks[-1].extend(current_chunk)
             else:
-                combined_chunks.append('\n'.join(current_chunk))
-        
+                combined_chunks.append(current_chunk)
+
         return combined_chunks
 
-    def _split_oversized_chunk(self, chunk: str) -> List[str]:
+    def _split_oversized_chunk(self, text: str, piece: Span) -> List[Span]:
         """Split an oversized chunk while preserving structure"""
-        # If it's a code block, split by methods
-        if chunk.startswith('```') and chunk.endswith('```'):
-            return self._split_code_block(chunk)
-        
+        # Code is already segmented to the code chunk size limit
+        if piece.kind == CODE:
+            return [piece]
+
         # Otherwise split by size while trying to keep paragraphs together
         chunks = []
-        current_chunk = []
+        chunk_start = None
+        chunk_end = piece.start
         current_size = 0
-        
-        for line in chunk.split('\n'):
-            line_size = len(line) + 1
-            
+
+        for line_start, line_end in self._lines(text, piece.start, piece.end):
+            line_size = line_end - line_start + 1
+
             if current_size + line_size > MAX_CHUNK_SIZE:
-                if current_chunk:
-                    chunks.append('\n'.join(current_chunk))
-                current_chunk = []
+                if chunk_start is not None:
+                    chunks.append(Span(chunk_start, chunk_end, MARKDOWN))
+                chunk_start = None
                 current_size = 0
-            
-            current_chunk.append(line)
+
+            if chunk_start is None:
+                chunk_start = line_start
+            chunk_end = line_end
             current_size += line_size
-        
-        if current_chunk:
-            chunks.append('\n'.join(current_chunk))
-        
+
+        if chunk_start is not None:
+            chunks.append(Span(chunk_start, chunk_end, MARKDOWN))
+
         return chunks
 
     def create_documents(self, texts: List[str], metadatas: List[dict] = None) -> List[Document]:
@@ -0,0 +1,15 @@
+# app/utils/timing.py
+
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+
+@contextmanager
+def phase_timer(timings: Dict[str, float], phase: str) -> Iterator[None]:
+    """Add the wall-clock duration of the block to timings[phase] (in seconds)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - start
@@ -1,6 +1,6 @@
 # app/utils/validators.py
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from langchain.schema import Document
 import numpy as np
 import cohere  # Import the whole module instead
@@ -77,6 +77,24 @@ class EmbeddingValidator:
             logger.error(f"Embedding validation failed: {str(e)}")
             return False
 
+COHERE_ERROR_PATTERNS = {
+    'invalid_api_key': ('invalid_api_key', 'invalid api key', 'status_code: 401'),
+    'rate_limit': ('rate_limit', 'rate limit', 'too many requests', 'status_code: 429'),
+    'invalid_model': ('invalid_model',),
+    'context_length': ('context_length',)
+}
+
+def classify_cohere_error(e: Exception) -> Optional[str]:
+    """Classify a Cohere API error into one of the known error kinds"""
+    if getattr(e, 'status_code', None) == 429:
+        return 'rate_limit'
+
+    error_type = str(e).lower()
+    for key, patterns in COHERE_ERROR_PATTERNS.items():
+        if any(pattern in error_type for pattern in patterns):
+            return key
+    return None
+
 def handle_cohere_error(e: Exception) -> None:
     """Handle Cohere API errors"""
     error_map = {
@@ -86,13 +104,11 @@ def handle_cohere_error(e: Exception) -> None:
         'context_length': "Document length exceeds model's context window."
     }
     
-    error_type = str(e)
-    for key in error_map:
-        if key in error_type.lower():
-            error_message = error_map[key]
-            break
+    error_kind = classify_cohere_error(e)
+    if error_kind:
+        error_message = error_map[error_kind]
     else:
         error_message = f"Cohere API error: {str(e)}"
     
     logger.error(error_message)
-    raise ValueError(error_message)
\ No newline at end of file
+    raise ValueError(error_message)
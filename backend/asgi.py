@@ -0,0 +1,49 @@
+"""ASGI entry point.
+
+POST /api/ask is served natively on the event loop, so a single worker can
+hold many in-flight questions; every other route is the Flask app, mounted
+through asgiref's WSGI adapter. Run with, for example:
+
+    uvicorn asgi:app --host 0.0.0.0 --port $PORT
+    gunicorn -c gunicorn_config.py -k uvicorn.workers.UvicornWorker asgi:app
+"""
+import os
+import sys
+from pathlib import Path
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from asgiref.wsgi import WsgiToAsgi
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.routing import Mount, Route
+
+from app.api.async_routes import ask_question
+from app.config.settings import ALLOWED_ORIGIN
+from app.main import create_app
+
+flask_app = create_app(force_recreate=False)
+
+app = Starlette(
+    routes=[
+        Route('/api/ask', ask_question, methods=['POST']),
+        Mount('/', app=WsgiToAsgi(flask_app))
+    ],
+    middleware=[
+        Middleware(
+            CORSMiddleware,
+            allow_origins=[ALLOWED_ORIGIN],
+            allow_methods=['GET', 'POST', 'OPTIONS'],
+            allow_headers=['Content-Type'],
+            max_age=3600
+        )
+    ]
+)
+
+if __name__ == "__main__":
+    import uvicorn
+    port = int(os.environ.get('PORT', 5001))
+    uvicorn.run(app, host='0.0.0.0', port=port)
@@ -1,13 +1,17 @@
 # File: backend/gunicorn_config.py
 import os
-import multiprocessing
 
 # Basic config
 port = int(os.environ.get('PORT', '10000'))
 bind = f"0.0.0.0:{port}"
 
 # Worker Settings
-workers = 1
+# The index is built once in the preloaded master; workers attach to it
+# read-only after fork, so throughput scales with the number of workers.
+# Each worker still holds its own Chroma client, lexical index, caches and
+# LLM chains, and the CPU count seen in a container is the host's, so the
+# default stays small; set WEB_CONCURRENCY to what the instance's memory allows
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
 worker_class = 'sync'
 threads = 4  # Increased from 1
 max_requests = 0
@@ -43,6 +47,9 @@ def on_exit(server):
 
 def post_fork(server, worker):
     server.log.info(f"Worker spawned (pid: {worker.pid})")
+    # Reopen the master's index in this worker (or wait for the master to finish building it)
+    from app.core.initializer import resume_initialization_after_fork
+    resume_initialization_after_fork()
 
 def worker_exit(server, worker):
     server.log.info(f"Worker exited (pid: {worker.pid})")
\ No newline at end of file
@@ -0,0 +1,55 @@
+import sys
+import argparse
+import time
+import tracemalloc
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from app.config.settings import CODE_CHUNK_SIZE, CODE_CHUNK_OVERLAP
+from app.utils.text_splitter import CustomMarkdownSplitter
+
+DEFAULT_FILES = sorted((project_root / "data" / "knowledge_base").glob("ExampleCode_*.md"))
+
+def benchmark_file(splitter: CustomMarkdownSplitter, path: Path, repeat: int) -> dict:
+    """Chunking throughput and peak allocation for one file"""
+    text = path.read_text(encoding="utf-8")
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        chunks = splitter.split_text(text)
+    elapsed = (time.perf_counter() - start) / repeat
+
+    tracemalloc.start()
+    splitter.split_text(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "file": path.name,
+        "chars": len(text),
+        "chunks": len(chunks),
+        "ms": elapsed * 1000,
+        "mb_per_s": len(text) / elapsed / 1e6,
+        "peak_kb": peak / 1024
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure CustomMarkdownSplitter throughput and peak memory")
+    parser.add_argument("files", nargs="*", type=Path, default=DEFAULT_FILES)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    splitter = CustomMarkdownSplitter(chunk_size=CODE_CHUNK_SIZE, chunk_overlap=CODE_CHUNK_OVERLAP)
+    print(f"{'file':45} {'chars':>8} {'chunks':>6} {'ms':>8} {'MB/s':>7} {'peak KB':>9}")
+    for path in args.files:
+        result = benchmark_file(splitter, path, args.repeat)
+        print(
+            f"{result['file']:45} {result['chars']:>8} {result['chunks']:>6} "
+            f"{result['ms']:>8.2f} {result['mb_per_s']:>7.2f} {result['peak_kb']:>9.1f}"
+        )
+
+if __name__ == "__main__":
+    main()
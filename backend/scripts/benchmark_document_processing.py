@@ -0,0 +1,70 @@
+import sys
+import argparse
+import logging
+import time
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from app.core.document_processor import DocumentProcessor
+
+KNOWLEDGE_BASE = project_root / "data" / "knowledge_base"
+
+SMALL_DOCUMENT = """# Helper {i}
+## Type
+functions
+## Description
+Moves the player by a fixed step each frame. See the example below.
+
+```csharp
+void Step{i}() {{
+    transform.position += Vector3.forward * speed;
+}}
+```
+"""
+
+def benchmark(processor: DocumentProcessor, documents: list, repeat: int) -> dict:
+    """Average time to turn each document into chunks"""
+    start = time.perf_counter()
+    chunks = 0
+    for _ in range(repeat):
+        for name, content in documents:
+            chunks += len(processor._process_document_by_type(content, name))
+    elapsed = time.perf_counter() - start
+    return {
+        "documents": len(documents),
+        "chunks": chunks // repeat,
+        "ms": elapsed / repeat * 1000,
+        "us_per_doc": elapsed / (repeat * len(documents)) * 1e6
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-document overhead of DocumentProcessor chunking")
+    parser.add_argument("--synthetic", type=int, default=2000, help="number of small generated documents")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # Per-document log lines would dominate the measurement
+    logging.disable(logging.INFO)
+    processor = DocumentProcessor(str(KNOWLEDGE_BASE))
+    suites = {
+        "knowledge_base": [(path.name, path.read_text(encoding="utf-8")) for path in processor.list_files()],
+        "synthetic": [(f"helper_{i}.md", SMALL_DOCUMENT.format(i=i)) for i in range(args.synthetic)]
+    }
+
+    print(f"{'suite':16} {'docs':>6} {'chunks':>7} {'ms':>9} {'us/doc':>8}")
+    for name, documents in suites.items():
+        if not documents:
+            continue
+        # Warm up shared state (compiled patterns, code segment cache) before timing
+        benchmark(processor, documents, 1)
+        result = benchmark(processor, documents, args.repeat)
+        print(
+            f"{name:16} {result['documents']:>6} {result['chunks']:>7} "
+            f"{result['ms']:>9.2f} {result['us_per_doc']:>8.1f}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import pytest
+from unittest.mock import MagicMock, patch
+from app.core.answer_cache import AnswerCache
+from app.core.document_processor import index_version
+from app.core.qa_chain import QAChainManager
+
+@pytest.fixture
+def cache():
+    return AnswerCache(max_entries=2, ttl=60, similarity_threshold=0.0)
+
+def test_exact_match_is_normalized(cache):
+    """Test case, whitespace and trailing punctuation do not defeat the cache"""
+    cache.put("What is T#?", "qa", {"answer": "A language", "sources": ["intro.md"]})
+
+    assert cache.get("  what is   t# ", "qa") == {"answer": "A language", "sources": ["intro.md"]}
+    assert cache.get("What is T#?", "code") is None
+    stats = cache.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+def test_lru_eviction_and_ttl(cache):
+    """Test least recently used answers are evicted and stale ones expire"""
+    cache.put("first", "qa", {"answer": "1"})
+    cache.put("second", "qa", {"answer": "2"})
+    cache.get("first", "qa")
+    cache.put("third", "qa", {"answer": "3"})
+
+    assert cache.get("second", "qa") is None
+    assert cache.get("first", "qa") is not None
+    assert cache.get_stats()["evictions"] == 1
+
+    with patch('app.core.answer_cache.time.time', return_value=10 ** 10):
+        assert cache.get("first", "qa") is None
+    assert cache.get_stats()["expirations"] == 1
+
+def test_index_version_change_invalidates(cache):
+    """Test answers built from an older index are dropped"""
+    cache.set_index_version(index_version(["a", "b"]))
+    cache.put("question", "qa", {"answer": "old"})
+
+    cache.set_index_version(index_version(["b", "a"]))
+    assert cache.get("question", "qa") is not None
+
+    cache.set_index_version(index_version(["a", "b", "c"]))
+    assert cache.get("question", "qa") is None
+    assert cache.get_stats()["invalidations"] == 1
+
+def test_semantic_lookup():
+    """Test near-identical questions hit above the similarity threshold"""
+    vectors = {
+        "how do i spawn an enemy": [1.0, 0.0],
+        "how can i spawn an enemy": [0.99, 0.1],
+        "how do i save the game": [0.0, 1.0]
+    }
+    cache = AnswerCache(similarity_threshold=0.95, embed_query=lambda text: vectors[text])
+    cache.put("How do I spawn an enemy?", "qa", {"answer": "Use Spawn()"})
+
+    assert cache.get("How can I spawn an enemy?", "qa") == {"answer": "Use Spawn()"}
+    assert cache.get("How do I save the game?", "qa") is None
+    assert cache.get_stats()["semantic_hits"] == 1
+
+def test_async_lookup_uses_async_embeddings():
+    """Test aget/aput embed with aembed_query instead of blocking on embed_query"""
+    import asyncio
+    vectors = {"how do i spawn an enemy": [1.0, 0.0], "how can i spawn an enemy": [0.99, 0.1]}
+
+    async def aembed_query(text):
+        return vectors[text]
+
+    cache = AnswerCache(similarity_threshold=0.95, aembed_query=aembed_query,
+                        embed_query=MagicMock(side_effect=AssertionError("blocking embed")))
+
+    async def ask():
+        assert await cache.aget("How do I spawn an enemy?", "qa") is None
+        await cache.aput("How do I spawn an enemy?", "qa", {"answer": "Use Spawn()"})
+        return await cache.aget("How can I spawn an enemy?", "qa")
+
+    assert asyncio.run(ask()) == {"answer": "Use Spawn()"}
+    assert not cache.embed_query.called
+    assert cache.get_stats()["semantic_hits"] == 1
+
+def test_process_query_served_from_cache():
+    """Test a repeated question skips the chain entirely"""
+    with patch('app.core.qa_chain.ChatAnthropic'):
+        manager = QAChainManager()
+    manager.qa_chain = MagicMock()
+    manager.qa_chain.invoke.return_value = "Cached answer"
+
+    first = manager.process_query(manager.qa_chain, "What is T#?")
+    second = manager.process_query(manager.qa_chain, "what is T#")
+
+    assert manager.qa_chain.invoke.call_count == 1
+    assert second["answer"] == first["answer"] == "Cached answer"
+    assert len(second["chat_history"]) == 4
+    assert manager.get_cache_stats()["hits"] == 1
@@ -0,0 +1,67 @@
+from unittest.mock import patch
+from app.utils.code_segmenter import CodeSegmenter
+
+CODE = '''using System;
+
+public class Player : StudioBehavior {
+    string label = "{ not a block";
+    char close = '}';
+
+    /* } is not a close here */
+    public void Jump() {
+        if (grounded) {
+            velocity = 1;
+        }
+        path = @"C:\\{""quoted""}";
+    }
+
+    // Runs every frame
+    void Update()
+    {
+        Move();
+    }
+}
+'''
+
+def chunks(segmenter, code):
+    return [code[start:end] for start, end in segmenter.segment(code)]
+
+def test_literals_and_comments_do_not_end_blocks():
+    """Test braces inside strings, chars and comments leave the method intact"""
+    member_starts, _ = CodeSegmenter(max_size=1000)._scan(CODE)
+    members = [CODE[start:].split("\n", 1)[0].strip() for start in member_starts]
+
+    assert members[:2] == ["using System;", "public class Player : StudioBehavior {"]
+    assert 'string label = "{ not a block";' in members
+    assert "/* } is not a close here */" in members
+    assert "// Runs every frame" in members
+    assert not any(member.startswith(("if", "velocity", "path", "Move")) for member in members)
+
+def test_members_are_packed_with_leading_comments():
+    """Test small members share chunks and a comment stays with the member after it"""
+    pieces = chunks(CodeSegmenter(max_size=120), CODE)
+
+    assert len(pieces) > 1
+    assert all(piece in CODE for piece in pieces)
+    assert all(len(piece) <= 120 for piece in pieces)
+    assert any(piece.lstrip().startswith("// Runs every frame\n    void Update()") for piece in pieces)
+    assert any(piece.lstrip().startswith("/* } is not a close here */\n    public void Jump()") for piece in pieces)
+
+def test_oversized_member_is_split_at_statements():
+    """Test a method larger than max_size is cut between statements, not mid-line"""
+    body = "\n".join(f"        total += values[{i}];" for i in range(40))
+    code = "void Sum() {\n" + body + "\n}\n"
+    pieces = chunks(CodeSegmenter(max_size=200, min_size=50), code)
+
+    assert len(pieces) > 1
+    assert all(len(piece) <= 200 for piece in pieces)
+    assert all(piece.rstrip().endswith((";", "}")) for piece in pieces)
+
+def test_segmentations_are_memoized_by_content():
+    """Test identical code is only scanned once across segmenters of the same size"""
+    CodeSegmenter.clear_cache()
+    first = CodeSegmenter(max_size=120).segment(CODE)
+
+    with patch.object(CodeSegmenter, "_scan", side_effect=AssertionError("rescanned")):
+        assert CodeSegmenter(max_size=120).segment(CODE) == first
+    assert CodeSegmenter(max_size=300).segment(CODE) != first
@@ -0,0 +1,94 @@
+import pytest
+from langchain_core.documents import Document
+from app.core.context_packer import ContextPacker, TokenCounter, TRUNCATION_MARKER, overlap_length
+from app.utils.text_splitter import CustomMarkdownSplitter
+
+class WordCounter(TokenCounter):
+    """One token per whitespace-separated word"""
+
+    def count(self, text):
+        return len(text.split())
+
+    def truncate(self, text, max_tokens):
+        return " ".join(text.split()[:max_tokens])
+
+def doc(text, source="a.md"):
+    return Document(page_content=text, metadata={"source": source})
+
+def words(prefix, n):
+    return " ".join(f"{prefix}{i}" for i in range(n))
+
+@pytest.fixture
+def packer():
+    packer = ContextPacker(budget=300, counter=WordCounter())
+    packer.MIN_TAIL_TOKENS = 20
+    packer.MIN_OVERLAP = 10
+    return packer
+
+def test_chunks_within_budget_are_packed_in_order(packer):
+    """Test small contexts are the plain join of the chunks"""
+    packed = packer.pack([doc("first chunk"), doc("second chunk", "b.md")])
+    assert packed.text == "first chunk\n\nsecond chunk"
+    assert packed.stats["tokens"] == 4
+    assert packed.stats["dropped"] == 0
+
+def test_budget_truncates_last_chunk_and_drops_the_rest(packer):
+    """Test the chunk crossing the budget is cut and later chunks are left out"""
+    docs = [doc(words("a", 200)), doc(words("b", 200), "b.md"), doc(words("c", 50), "c.md")]
+    packed = packer.pack(docs)
+
+    assert packed.stats["tokens"] <= 300
+    assert packed.stats["truncated"] == 1
+    assert packed.stats["dropped"] == 1
+    assert packed.text.endswith(TRUNCATION_MARKER)
+    assert [d.metadata["source"] for d in packed.documents] == ["a.md", "b.md"]
+
+def test_too_small_remainder_drops_chunk(packer):
+    """Test a chunk is dropped rather than cut to a useless stub"""
+    packed = packer.pack([doc(words("a", 290)), doc(words("b", 100), "b.md")])
+    assert packed.stats["truncated"] == 0
+    assert packed.stats["dropped"] == 1
+    assert len(packed.documents) == 1
+
+def test_overlap_between_chunks_of_one_source_is_removed(packer):
+    """Test the splitter's overlap is included once per source"""
+    shared = words("s", 20)
+    first = words("a", 30) + " " + shared
+    second = shared + " " + words("b", 30)
+    packed = packer.pack([doc(first), doc(second), doc(second, "other.md")])
+
+    assert packed.text.count(shared) == 2  # once for a.md, once for other.md
+    assert packed.stats["deduped_chars"] == len(shared)
+    assert overlap_length(first, second, window=4000, min_overlap=10) == len(shared)
+
+def test_fallback_counter_estimates_from_length():
+    """Test token counts stay usable when the tokenizer cannot be loaded"""
+    counter = TokenCounter(encoding_name="no-such-encoding")
+    assert counter.count("x" * 40) == 10
+    assert counter.truncate("x" * 40, 2) == "x" * 8
+
+def test_overlap_windows_are_removed_by_offsets(packer):
+    """Test the splitter's overlap windows are dropped using chunk offsets, in either order"""
+    text = "# Guide\n" + "".join(f"Step {i} moves the player forward. Then it waits.\n" for i in range(80))
+    chunks = CustomMarkdownSplitter(chunk_size=600, chunk_overlap=150).split_chunks(text)
+    docs = [
+        Document(page_content=chunk.text, metadata={
+            "source": "guide.md", "start_offset": chunk.start_offset,
+            "end_offset": chunk.end_offset, "overlap_size": chunk.overlap
+        })
+        for chunk in chunks[:3]
+    ]
+    assert all(doc.metadata["overlap_size"] for doc in docs[1:])
+
+    packer.budget = 0
+    forward = packer.pack(docs)
+    assert forward.text.replace("\n\n", "\n") == text[:chunks[2].end_offset]
+    assert forward.stats["deduped_chars"] == chunks[1].overlap + chunks[2].overlap
+
+    backward = packer.pack(list(reversed(docs)))
+    # Windows also hold the newline between chunks, which the earlier chunk does not end with
+    assert backward.stats["deduped_chars"] == sum(
+        previous.end_offset - chunk.start_offset for previous, chunk in zip(chunks[:2], chunks[1:3])
+    )
+    assert sorted(filter(None, backward.text.splitlines())) == sorted(filter(None, forward.text.splitlines()))
+    assert packer.pack(docs + docs[:1]).stats["deduped_chars"] == forward.stats["deduped_chars"] + len(docs[0].page_content)
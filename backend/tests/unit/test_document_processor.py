@@ -1,7 +1,9 @@
+import os
 import pytest
 from unittest.mock import Mock, patch, MagicMock, mock_open
 from pathlib import Path
-from app.core.document_processor import DocumentProcessor, DocType, ProcessingError
+from app.core.document_processor import DocumentProcessor, DocType, ProcessingError, parse_front_matter
+from app.utils.text_splitter import CustomMarkdownSplitter
 from langchain_core.documents import Document
 
 @pytest.fixture
@@ -74,4 +76,104 @@ def test_load_documents_efficient(mock_processor):
         
         docs = mock_processor.load_documents()
         assert len(docs) > 0
-        assert all(isinstance(doc, Document) for doc in docs)
\ No newline at end of file
+        assert all(isinstance(doc, Document) for doc in docs)
+
+def test_parallel_loading_matches_serial(tmp_path):
+    """Test process-pool loading produces the same chunks, order and stats as serial loading"""
+    body = "Parallel loading test paragraph with enough text to be kept. " * 4
+    for i in range(4):
+        (tmp_path / f"doc_{i}.md").write_text(f"# Doc {i}\n## Type\nruleset\n{body}\n## Section\n{body}")
+
+    serial = DocumentProcessor(str(tmp_path), max_workers=1)
+    parallel = DocumentProcessor(str(tmp_path), max_workers=2, parallel_min_files=2)
+
+    serial_docs = serial.load_documents()
+    parallel_docs = parallel.load_documents()
+
+    assert [d.page_content for d in parallel_docs] == [d.page_content for d in serial_docs]
+    assert [d.metadata["source"] for d in parallel_docs] == sorted(d.metadata["source"] for d in serial_docs)
+    assert parallel.get_processing_stats()["workers"] == 2
+    assert parallel.get_processing_stats()["total_chunks"] == serial.get_processing_stats()["total_chunks"]
+
+def _crash_worker(file_paths):
+    os._exit(1)
+
+def test_broken_process_pool_falls_back_to_serial(tmp_path):
+    """Test files of batches lost to a dead worker are processed in the parent"""
+    body = "Broken pool test paragraph with enough text to be kept. " * 4
+    for i in range(4):
+        (tmp_path / f"doc_{i}.md").write_text(f"# Doc {i}\n## Type\nruleset\n{body}")
+
+    serial_docs = DocumentProcessor(str(tmp_path), max_workers=1).load_documents()
+    processor = DocumentProcessor(str(tmp_path), max_workers=2, parallel_min_files=2)
+    with patch('app.core.document_processor._process_files_in_worker', _crash_worker):
+        docs = processor.load_documents()
+
+    assert [d.page_content for d in docs] == [d.page_content for d in serial_docs]
+    assert processor.get_processing_stats()["successful_files"] == 4
+
+def test_load_is_memoized_per_snapshot(tmp_path):
+    """Test repeated loads of an unchanged knowledge base do not re-process files"""
+    body = "Memoization test paragraph with enough text to be kept as a chunk. " * 4
+    doc_file = tmp_path / "doc.md"
+    doc_file.write_text(f"# Doc\n## Type\nruleset\n{body}")
+    processor = DocumentProcessor(str(tmp_path), max_workers=1)
+
+    first = processor.load_documents()
+    with patch.object(processor, '_process_file_with_retry', wraps=processor._process_file_with_retry) as spy:
+        second = processor.load_documents()
+        assert not spy.called
+        assert [d.page_content for d in second] == [d.page_content for d in first]
+        assert "chunk" in processor.get_processing_stats()["timings"]
+
+        doc_file.write_text(f"# Doc\n## Type\nruleset\n{body}\nChanged paragraph with more words in it.")
+        processor.load_documents()
+        assert spy.call_count == 1
+
+def test_iter_documents_streams_file_by_file(tmp_path):
+    """Test streamed chunks match a full load and are yielded before later files are read"""
+    body = "Streaming test paragraph with enough text to be kept as a chunk. " * 4
+    for i in range(3):
+        (tmp_path / f"doc_{i}.md").write_text(f"# Doc {i}\n## Type\nruleset\n{body}")
+    processor = DocumentProcessor(str(tmp_path), max_workers=1)
+
+    with patch.object(processor, '_process_file_with_retry', wraps=processor._process_file_with_retry) as spy:
+        stream = processor.iter_documents()
+        first = next(stream)
+        assert first.metadata["source"] == "doc_0.md"
+        assert spy.call_count == 1
+        streamed = [first] + list(stream)
+
+    loaded = DocumentProcessor(str(tmp_path), max_workers=1).load_documents()
+    assert [d.page_content for d in streamed] == [d.page_content for d in loaded]
+    assert processor.get_processing_stats()["successful_files"] == 3
+    assert processor._last_load is None  # streamed loads are not memoized
+
+def test_parse_front_matter():
+    """Test title, type and fence offsets come from one parse of the document"""
+    content = "# Player Jump  \n## Type\n\nExample\nIntro\n```csharp\nJump();\n```\nTrailing ``` fence"
+    front_matter = parse_front_matter(content)
+
+    assert front_matter.title == "Player Jump"
+    assert front_matter.doc_type == DocType.EXAMPLE
+    assert front_matter.fences == [i for i in range(len(content)) if content.startswith("```", i)]
+
+    untitled = parse_front_matter("Intro\n# Late title\n## Type\nunknown\n")
+    assert untitled.title == "Untitled Document"
+    assert untitled.doc_type == DocType.FUNCTIONS
+    assert untitled.fences == []
+
+def test_splitters_are_shared_per_config(tmp_path):
+    """Test documents with the same chunk sizes reuse a single splitter instead of building one each"""
+    body = "Shared splitter paragraph with enough text to be kept as a chunk. " * 4
+    processor = DocumentProcessor(str(tmp_path), max_workers=1)
+    ruleset = CustomMarkdownSplitter.for_config(processor.custom_splitter.chunk_size,
+                                                processor.custom_splitter.chunk_overlap)
+    assert ruleset is processor.custom_splitter
+    processor._process_document_by_type(f"# Functions\n## Type\nfunctions\n{body}", "functions.md")
+
+    with patch.object(CustomMarkdownSplitter, '__init__', side_effect=AssertionError("splitter rebuilt")):
+        for i in range(3):
+            assert processor._process_document_by_type(f"# Doc {i}\n## Type\nruleset\n{body}", f"doc_{i}.md")
+        # Examples are chunked like functions, so they share its splitter
+        assert processor._process_document_by_type(f"# Example\n## Type\nexample\n{body}", "example.md")
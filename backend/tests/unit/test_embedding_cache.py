@@ -0,0 +1,114 @@
+import pytest
+from unittest.mock import MagicMock
+from app.core.embedding_cache import EmbeddingCache, CachedEmbeddings
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EmbeddingCache(tmp_path / "embeddings.sqlite3", model="test-model", max_entries=3)
+    yield cache
+    cache.close()
+
+@pytest.fixture
+def mock_model():
+    model = MagicMock()
+    model.embed_documents.side_effect = lambda texts: [[float(len(t)), 1.0] for t in texts]
+    model.embed_query.return_value = [0.5, 0.5]
+    return model
+
+def test_cache_round_trip(cache):
+    """Test storing and retrieving embeddings"""
+    key = cache.text_hash("hello world")
+    cache.put_many({key: [0.25, 0.5]})
+
+    found = cache.get_many([key, cache.text_hash("missing")])
+    assert found == {key: [0.25, 0.5]}
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+def test_lru_eviction(cache):
+    """Test least recently used entries are evicted past max_entries"""
+    keys = [cache.text_hash(f"text {i}") for i in range(3)]
+    for key in keys:
+        cache.put_many({key: [1.0]})
+
+    # Touch the oldest entry so the second one becomes least recently used
+    cache.get_many([keys[0]])
+    cache.put_many({cache.text_hash("text 3"): [1.0]})
+
+    assert len(cache) == 3
+    assert cache.evictions == 1
+    assert keys[1] not in cache.get_many(keys)
+
+def test_cache_is_keyed_by_model(tmp_path):
+    """Test entries are not shared between embedding models"""
+    path = tmp_path / "embeddings.sqlite3"
+    first = EmbeddingCache(path, model="model-a")
+    key = first.text_hash("text")
+    first.put_many({key: [1.0]})
+    first.close()
+
+    second = EmbeddingCache(path, model="model-b")
+    assert second.get_many([key]) == {}
+    second.close()
+
+def test_cached_embeddings_skip_known_texts(cache, mock_model):
+    """Test only uncached, normalized texts reach the underlying model"""
+    embeddings = CachedEmbeddings(mock_model, cache)
+
+    first = embeddings.embed_documents(["alpha", "beta", "alpha"])
+    assert mock_model.embed_documents.call_count == 1
+    assert mock_model.embed_documents.call_args[0][0] == ["alpha", "beta"]
+
+    second = embeddings.embed_documents(["  alpha ", "beta"])
+    assert mock_model.embed_documents.call_count == 1
+    assert second == [first[0], first[1]]
+
+def test_cache_persists_across_instances(tmp_path, mock_model):
+    """Test a rebuild against the same cache file makes no embedding calls"""
+    path = tmp_path / "embeddings.sqlite3"
+    texts = ["chunk one", "chunk two"]
+
+    first = EmbeddingCache(path, model="test-model")
+    CachedEmbeddings(mock_model, first).embed_documents(texts)
+    first.close()
+
+    mock_model.embed_documents.reset_mock()
+    second = EmbeddingCache(path, model="test-model")
+    CachedEmbeddings(mock_model, second).embed_documents(texts)
+    assert not mock_model.embed_documents.called
+    assert second.get_stats()["hit_rate"] == 1.0
+    second.close()
+
+def test_query_embeddings_are_cached(cache, mock_model):
+    """Test repeated questions are embedded once per process"""
+    embeddings = CachedEmbeddings(mock_model, cache, query_cache_size=1)
+
+    assert embeddings.embed_query("What is T#?") == [0.5, 0.5]
+    assert embeddings.embed_query("  What is   T#? ") == [0.5, 0.5]
+    assert mock_model.embed_query.call_count == 1
+
+    embeddings.embed_query("Another question")
+    embeddings.embed_query("What is T#?")
+    assert mock_model.embed_query.call_count == 3
+    assert embeddings.query_stats == {"hits": 1, "misses": 3}
+
+def test_async_query_embeddings_share_the_cache(cache, mock_model):
+    """Test async query embeddings populate the cache the sync path reads"""
+    import asyncio
+    from unittest.mock import AsyncMock
+    mock_model.aembed_query = AsyncMock(return_value=[0.25, 0.75])
+    embeddings = CachedEmbeddings(mock_model, cache)
+
+    assert asyncio.run(embeddings.aembed_query("What is T#?")) == [0.25, 0.75]
+    assert embeddings.embed_query("What is T#?") == [0.25, 0.75]
+    assert not mock_model.embed_query.called
+
+def test_embed_queries_batches_only_uncached_queries(cache, mock_model):
+    """Test a multi-query call sends the cache misses in one batched request"""
+    mock_model.embed_queries.side_effect = lambda texts: [[float(len(t)), 0.0] for t in texts]
+    embeddings = CachedEmbeddings(mock_model, cache)
+    embeddings.embed_query("cached")
+
+    vectors = embeddings.embed_queries(["cached", "ab", "abc", "ab"])
+    assert vectors == [[0.5, 0.5], [2.0, 0.0], [3.0, 0.0], [2.0, 0.0]]
+    mock_model.embed_queries.assert_called_once_with(["ab", "abc"])
@@ -0,0 +1,118 @@
+import threading
+import pytest
+from unittest.mock import MagicMock, patch
+from app.core.embedding_scheduler import EmbeddingScheduler, QueryBatcher, TokenBucket
+from app.utils.validators import classify_cohere_error
+
+@pytest.fixture
+def mock_model():
+    model = MagicMock()
+    model.embed_documents.side_effect = lambda texts: [[float(t)] for t in texts]
+    return model
+
+@pytest.fixture
+def scheduler(mock_model):
+    return EmbeddingScheduler(
+        mock_model,
+        batch_size=3,
+        max_concurrency=4,
+        requests_per_minute=60000,
+        max_retries=2,
+        retry_delay=0
+    )
+
+def test_batches_preserve_order(scheduler, mock_model):
+    """Test texts are split into provider-sized batches and reassembled in order"""
+    texts = [str(i) for i in range(10)]
+    vectors = scheduler.embed_documents(texts)
+
+    assert vectors == [[float(i)] for i in range(10)]
+    assert mock_model.embed_documents.call_count == 4
+    assert all(len(call[0][0]) <= 3 for call in mock_model.embed_documents.call_args_list)
+
+def test_rate_limited_batches_are_retried(scheduler, mock_model):
+    """Test rate-limit errors slow the bucket down and retry instead of dropping"""
+    responses = [Exception("status_code: 429, body: too many requests"), [[1.0], [2.0]]]
+    mock_model.embed_documents.side_effect = responses
+
+    with patch.object(scheduler.rate_limiter, 'penalize') as mock_penalize:
+        vectors = scheduler.embed_documents(["1", "2"])
+
+    assert vectors == [[1.0], [2.0]]
+    assert mock_penalize.called
+    assert scheduler.stats["rate_limited"] == 1
+
+def test_non_retryable_errors_raise(scheduler, mock_model):
+    """Test invalid credentials fail immediately"""
+    mock_model.embed_documents.side_effect = Exception("invalid api key")
+
+    with pytest.raises(ValueError, match="Invalid Cohere API key"):
+        scheduler.embed_documents(["1"])
+    assert mock_model.embed_documents.call_count == 1
+
+def test_exhausted_retries_raise(scheduler, mock_model):
+    """Test a batch that keeps failing surfaces an error"""
+    mock_model.embed_documents.side_effect = Exception("connection reset")
+
+    with pytest.raises(ValueError):
+        scheduler.embed_documents(["1"])
+    assert mock_model.embed_documents.call_count == 3
+
+def test_token_bucket_adapts_rate():
+    """Test the bucket halves on rate limits and recovers on success"""
+    bucket = TokenBucket(rate=10.0)
+    bucket.penalize(retry_after=0)
+    assert bucket.rate == 5.0
+    bucket.reward()
+    assert 5.0 < bucket.rate <= 10.0
+
+def test_classify_cohere_error():
+    """Test Cohere error classification"""
+    assert classify_cohere_error(Exception("Rate limit exceeded")) == "rate_limit"
+    assert classify_cohere_error(Exception("invalid_model")) == "invalid_model"
+    assert classify_cohere_error(Exception("something else")) is None
+
+def test_embed_queries_uses_query_input_type(scheduler, mock_model):
+    """Test batched queries are embedded as search queries in one request"""
+    mock_model.embed.side_effect = lambda texts, input_type: [[float(t)] for t in texts]
+
+    assert scheduler.embed_queries(["1", "2"]) == [[1.0], [2.0]]
+    mock_model.embed.assert_called_once_with(["1", "2"], input_type="search_query")
+
+def test_query_batcher_coalesces_concurrent_calls():
+    """Test concurrent queries inside the window share a single embedding call"""
+    calls = []
+
+    def embed_many(texts):
+        calls.append(list(texts))
+        return [[float(t)] for t in texts]
+
+    batcher = QueryBatcher(embed_many, window=0.2)
+    results = {}
+    threads = [
+        threading.Thread(target=lambda t=t: results.__setitem__(t, batcher.embed(t)))
+        for t in ["1", "2", "3", "1"]
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert sorted(calls[0]) == ["1", "2", "3"]
+    assert results == {"1": [1.0], "2": [2.0], "3": [3.0]}
+
+def test_query_batcher_propagates_errors():
+    """Test every waiting caller sees a failed batch"""
+    batcher = QueryBatcher(MagicMock(side_effect=ValueError("boom")), window=0)
+    with pytest.raises(ValueError, match="boom"):
+        batcher.embed("1")
+
+def test_async_query_retries(scheduler, mock_model):
+    """Test async query embeddings are retried like the sync path"""
+    import asyncio
+    from unittest.mock import AsyncMock
+    mock_model.aembed_query = AsyncMock(side_effect=[Exception("connection reset"), [1.0]])
+
+    assert asyncio.run(scheduler.aembed_query("1")) == [1.0]
+    assert scheduler.stats["retries"] == 1
@@ -0,0 +1,56 @@
+import os
+import pytest
+from app.core.ingestion_manifest import IngestionManifest
+
+@pytest.fixture
+def knowledge_base(tmp_path):
+    kb_path = tmp_path / "knowledge_base"
+    kb_path.mkdir()
+    for name in ("a.md", "b.md", "c.md"):
+        (kb_path / name).write_text(f"# {name}\nContent of {name}")
+    return kb_path
+
+@pytest.fixture
+def manifest(tmp_path, knowledge_base):
+    manifest = IngestionManifest(tmp_path / "manifest.json", fingerprint="v1")
+    for file_path in sorted(knowledge_base.glob("*.md")):
+        manifest.record(file_path, [f"{file_path.name}_chunk"])
+    manifest.save()
+    return manifest
+
+def test_unchanged_files_are_skipped(manifest, knowledge_base):
+    """Test a warm boot over untouched files reports nothing to re-process"""
+    diff = manifest.diff(sorted(knowledge_base.glob("*.md")))
+    assert diff.changed == []
+    assert sorted(diff.unchanged) == ["a.md", "b.md", "c.md"]
+    assert diff.removed == []
+
+def test_changed_new_and_removed_files(manifest, knowledge_base):
+    """Test modified, added and deleted files are classified correctly"""
+    (knowledge_base / "a.md").write_text("# a.md\nRewritten content")
+    (knowledge_base / "d.md").write_text("# d.md\nBrand new")
+    (knowledge_base / "c.md").unlink()
+
+    diff = manifest.diff(sorted(knowledge_base.glob("*.md")))
+    assert sorted(p.name for p in diff.changed) == ["a.md", "d.md"]
+    assert diff.unchanged == ["b.md"]
+    assert diff.removed == ["c.md"]
+    assert manifest.chunk_ids_for(diff.removed) == {"c.md_chunk"}
+
+def test_touched_file_with_same_content_is_unchanged(manifest, knowledge_base):
+    """Test an mtime-only change falls back to the content hash"""
+    file_path = knowledge_base / "b.md"
+    stat = file_path.stat()
+    os.utime(file_path, (stat.st_atime, stat.st_mtime + 10))
+
+    diff = manifest.diff([file_path])
+    assert diff.changed == []
+    assert diff.unchanged == ["b.md"]
+
+def test_manifest_round_trip_and_fingerprint(tmp_path, manifest):
+    """Test the manifest persists, and is discarded when chunking settings change"""
+    reloaded = IngestionManifest(tmp_path / "manifest.json", fingerprint="v1")
+    assert reloaded.chunk_ids_for(["a.md", "b.md"]) == {"a.md_chunk", "b.md_chunk"}
+
+    stale = IngestionManifest(tmp_path / "manifest.json", fingerprint="v2")
+    assert stale.files == {}
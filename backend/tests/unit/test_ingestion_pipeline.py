@@ -0,0 +1,46 @@
+import time
+import pytest
+from app.core.ingestion_pipeline import IngestionPipeline
+
+def test_stages_run_in_order():
+    """Test every item passes through each stage in order"""
+    written = []
+    pipeline = IngestionPipeline([lambda x: x * 2, written.append], depth=2)
+    stats = pipeline.run(range(10))
+    assert written == [x * 2 for x in range(10)]
+    assert stats["processed"] == [10, 10]
+
+def test_slow_stage_applies_backpressure():
+    """Test the source is not consumed further ahead than the queues allow"""
+    produced, ahead = [], []
+
+    def source():
+        for i in range(30):
+            produced.append(i)
+            yield i
+
+    def slow_write(item):
+        time.sleep(0.002)
+        ahead.append(len(produced) - item)
+
+    IngestionPipeline([lambda x: x, slow_write], depth=1).run(source())
+    # One item waiting per queue, one held by each stage and one being produced
+    assert max(ahead) <= 5
+
+def test_stage_error_stops_pipeline():
+    """Test a failing stage stops consumption and raises in the caller"""
+    produced = []
+
+    def source():
+        for i in range(1000):
+            produced.append(i)
+            yield i
+
+    def fail_on_three(item):
+        if item == 3:
+            raise ValueError("bad batch")
+        return item
+
+    with pytest.raises(ValueError, match="bad batch"):
+        IngestionPipeline([fail_on_three, lambda x: x], depth=2).run(source())
+    assert len(produced) < 1000
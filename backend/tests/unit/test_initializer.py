@@ -0,0 +1,140 @@
+import json
+import os
+import threading
+import pytest
+from unittest.mock import patch, MagicMock
+from app.core.initializer import (
+    AppComponents,
+    StartupState,
+    resume_initialization_after_fork,
+    _follow_parent_initialization
+)
+
+@pytest.fixture
+def reset_components():
+    """Restore AppComponents after each test"""
+    saved = dict(vars(AppComponents))
+    AppComponents.startup_state = StartupState()
+    AppComponents.qa_chain = None
+    AppComponents.qa_chain_manager = None
+    AppComponents.vector_store = None
+    AppComponents.vector_store_manager = None
+    yield
+    for key, value in saved.items():
+        if not key.startswith('__'):
+            setattr(AppComponents, key, value)
+
+def test_startup_state_phases():
+    """Test phase tracking and failure reporting"""
+    state = StartupState()
+    state.start()
+    state.set_phase("doc_processor", "done")
+    state.set_phase("vector_store", "running")
+    state.mark_failed("boom")
+
+    snapshot = state.snapshot()
+    assert snapshot["status"] == "failed"
+    assert snapshot["phases"] == {"doc_processor": "done", "vector_store": "failed", "qa_chain": "pending"}
+    assert snapshot["error"] == "boom"
+    assert not state.ready
+
+def test_background_initialization_gates_requests(reset_components):
+    """Test the app binds immediately and answers 503 with Retry-After until ready"""
+    release = threading.Event()
+
+    def slow_initialize(force_recreate=False):
+        AppComponents.startup_state.start()
+        release.wait(5)
+        AppComponents.qa_chain_manager = MagicMock()
+        AppComponents.qa_chain_manager.process_query.return_value = {"answer": "ok", "sources": []}
+        AppComponents.qa_chain_manager.get_cache_stats.return_value = {}
+        AppComponents.qa_chain = MagicMock()
+        AppComponents.startup_state.mark_ready()
+
+    with patch('app.core.initializer.initialize_app', side_effect=slow_initialize):
+        from app.main import create_app
+        app = create_app(background_init=True)
+        client = app.test_client()
+
+        health = client.get('/api/')
+        assert health.status_code == 200
+        assert health.get_json()["status"] == "initializing"
+
+        response = client.post('/api/ask', json={"question": "What is T#?"})
+        assert response.status_code == 503
+        assert response.headers["Retry-After"]
+
+        release.set()
+        AppComponents.init_thread.join(5)
+
+        assert client.get('/api/').get_json()["status"] == "healthy"
+        assert client.post('/api/ask', json={"question": "What is T#?"}).status_code == 200
+
+def test_worker_reattaches_when_parent_is_ready(reset_components):
+    """Test a worker forked from a ready parent reopens the index and rebuilds its chain"""
+    state = AppComponents.startup_state
+    state.start()
+    state.mark_ready()
+    state.pid = os.getpid() + 1
+    AppComponents.vector_store_manager = MagicMock()
+
+    with patch('app.core.initializer.QAChainManager') as mock_chain_manager:
+        resume_initialization_after_fork()
+
+    assert AppComponents.vector_store is AppComponents.vector_store_manager.reattach_after_fork.return_value
+    mock_chain_manager.return_value.create_qa_chain.assert_called_once_with(
+        AppComponents.vector_store, lexical_index=AppComponents.vector_store_manager.lexical_index
+    )
+    assert state.ready
+
+def test_worker_forked_mid_initialization_never_rebuilds(reset_components):
+    """Test a worker forked while the parent builds the index waits for it instead of initializing"""
+    state = AppComponents.startup_state
+    state.start()
+    state.pid = os.getpid() + 1
+    followed = threading.Event()
+
+    with patch('app.core.initializer.initialize_app') as mock_initialize, \
+         patch('app.core.initializer._follow_parent_initialization',
+               side_effect=lambda *args: followed.set()) as mock_follow:
+        resume_initialization_after_fork()
+        assert followed.wait(5)
+        AppComponents.init_thread.join(5)
+
+    assert not mock_initialize.called
+    mock_follow.assert_called_once_with(state.pid, state.started_at)
+    assert AppComponents.vector_store is None
+
+def test_worker_follows_parent_initialization(reset_components, tmp_path):
+    """Test a worker forked mid-initialization attaches once the parent publishes readiness"""
+    state_file = tmp_path / "startup_state.json"
+    parent_pid = os.getppid()
+    AppComponents.startup_state.start()
+    started_at = AppComponents.startup_state.started_at
+    state_file.write_text(json.dumps({
+        "status": "ready", "pid": parent_pid, "started_at": started_at,
+        "persist_directory": str(tmp_path)
+    }))
+
+    with patch('app.core.initializer._startup_state_path', return_value=state_file), \
+         patch('app.core.initializer.VectorStoreManager') as mock_manager_cls, \
+         patch('app.core.initializer.QAChainManager'):
+        _follow_parent_initialization(parent_pid, started_at)
+
+    mock_manager_cls.for_existing_store.assert_called_once_with(str(tmp_path), owner_pid=parent_pid)
+    assert AppComponents.startup_state.ready
+
+def test_worker_reports_parent_failure(reset_components, tmp_path):
+    """Test a worker surfaces the parent's initialization failure"""
+    state_file = tmp_path / "startup_state.json"
+    parent_pid = os.getppid()
+    AppComponents.startup_state.start()
+    started_at = AppComponents.startup_state.started_at
+    state_file.write_text(json.dumps({
+        "status": "failed", "error": "boom", "pid": parent_pid, "started_at": started_at
+    }))
+
+    with patch('app.core.initializer._startup_state_path', return_value=state_file):
+        _follow_parent_initialization(parent_pid, started_at)
+
+    assert AppComponents.startup_state.snapshot()["error"] == "boom"
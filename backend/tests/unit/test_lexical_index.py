@@ -0,0 +1,56 @@
+import pytest
+from app.core.document_processor import index_version
+from app.core.lexical_index import LexicalIndex, tokenize
+
+@pytest.fixture
+def index():
+    return LexicalIndex(
+        ids=["c1", "c2", "c3", "c4"],
+        texts=[
+            "Use GetComponent(typeof(Rigidbody)) to read the body",
+            "StartCoroutine replaces InvokeRepeating in T#",
+            "Players move with the character controller",
+            "Haptics.PlayHaptic triggers a vibration on the controller"
+        ],
+        metadatas=[
+            {"source": "functions.md", "has_code": True},
+            {"source": "rules.md", "has_code": False},
+            {"source": "intro.md", "has_code": False},
+            {"source": "functions.md", "has_code": True}
+        ]
+    )
+
+def test_tokenize_splits_identifiers():
+    """Test API names index as a whole and by their parts"""
+    assert tokenize("GetComponent start_coroutine") == [
+        "getcomponent", "get", "component", "start_coroutine", "start", "coroutine"
+    ]
+
+def test_tokenize_drops_stopwords():
+    assert tokenize("What is the GetComponent of a player?") == ["getcomponent", "get", "component", "player"]
+
+def test_min_coverage_requires_most_query_terms(index):
+    """Test a chunk matching one of several query terms is not a hit under a coverage floor"""
+    assert len(index.search("controller weather forecast", k=4)) == 2
+    assert index.search("controller weather forecast", k=4, min_coverage=0.5) == []
+    assert len(index.search("character controller", k=4, min_coverage=0.5)) == 2
+
+def test_exact_api_names_rank_first(index):
+    """Test BM25 finds chunks by exact API name and ignores non-matching chunks"""
+    results = index.search("How do I call StartCoroutine?", k=3)
+    assert results[0][0].page_content.startswith("StartCoroutine")
+    assert all(score > 0 for _, score in results)
+    assert index.search("unrelated words only", k=3) == []
+
+def test_search_with_filter(index):
+    """Test metadata filters restrict lexical hits"""
+    results = index.search("controller", k=4, filter_dict={"source": ["functions.md"]})
+    assert [doc.metadata["source"] for doc, _ in results] == ["functions.md"]
+
+def test_save_and_load_by_version(tmp_path, index):
+    """Test the index persists and is ignored once the chunk set changes"""
+    index.save(tmp_path)
+    loaded = LexicalIndex.load(tmp_path, version=index_version(["c4", "c3", "c2", "c1"]))
+    assert loaded is not None
+    assert loaded.search("GetComponent", k=1)[0][0].metadata["source"] == "functions.md"
+    assert LexicalIndex.load(tmp_path, version=index_version(["c1"])) is None
@@ -0,0 +1,182 @@
+import os
+import numpy as np
+import pytest
+from unittest.mock import MagicMock, patch
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from app.core.numpy_vector_store import NumpyCollection, NumpyVectorStore
+from app.core.vector_store import VectorStoreManager
+
+# Keyword axes: texts are embedded as counts of these words
+VOCABULARY = ["player", "enemy", "camera", "shader", "physics"]
+
+class KeywordEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        words = text.lower().split()
+        return [float(words.count(word)) + 0.01 for word in VOCABULARY]
+
+@pytest.fixture
+def store(tmp_path):
+    store = NumpyVectorStore(NumpyCollection(tmp_path / "index"), KeywordEmbeddings())
+    store.add_texts(
+        ["player movement", "enemy ai", "camera follow player", "shader graph"],
+        metadatas=[
+            {"source": "player.md", "type": "code"},
+            {"source": "enemy.md", "type": "code"},
+            {"source": "camera.md", "type": "text"},
+            {"source": "shader.md", "type": "text"}
+        ],
+        ids=["p", "e", "c", "s"]
+    )
+    return store
+
+def test_similarity_search_ranks_by_cosine(store):
+    """Test the nearest chunks come back in order with cosine distances"""
+    results = store.similarity_search_with_score("player", k=2)
+    assert [doc.metadata["source"] for doc, _ in results] == ["player.md", "camera.md"]
+    assert results[0][1] < results[1][1]
+    assert results[0][1] == pytest.approx(0.0, abs=1e-3)
+
+def test_metadata_filters(store):
+    """Test equality, $in and $and filters restrict the candidates"""
+    docs = store.similarity_search("player", k=4, filter={"type": "text"})
+    assert [doc.metadata["source"] for doc in docs] == ["camera.md", "shader.md"]
+
+    docs = store.similarity_search("player", k=4, filter={"$and": [
+        {"type": "code"}, {"source": {"$in": ["enemy.md", "shader.md"]}}
+    ]})
+    assert [doc.metadata["source"] for doc in docs] == ["enemy.md"]
+    assert store.similarity_search("player", filter={"missing": "x"}) == []
+
+def test_upsert_delete_and_chroma_style_results(store):
+    """Test the collection API used by the manager's sync logic"""
+    collection = store._collection
+    collection.upsert(ids=["p"], embeddings=[[0, 0, 0, 0, 1]],
+                      metadatas=[{"source": "physics.md"}], documents=["physics"])
+    collection.delete(ids=["e"])
+
+    assert collection.count() == 3
+    assert sorted(collection.get(include=[])["ids"]) == ["c", "p", "s"]
+    assert collection.get(ids=["p"])["metadatas"] == [{"source": "physics.md"}]
+
+    results = collection.query(query_texts=["physics"], n_results=1)
+    assert results["ids"] == [["p"]]
+    assert results["documents"] == [["physics"]]
+
+def test_batched_upserts_grow_the_matrix_geometrically():
+    """Test building an index batch by batch does not copy the whole matrix per batch"""
+    collection = NumpyCollection()
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(1000, 5)).astype(np.float32)
+    buffer, reallocations = None, 0
+    for start in range(0, 1000, 10):
+        collection.upsert(ids=[f"r{i}" for i in range(start, start + 10)],
+                          embeddings=vectors[start:start + 10].tolist())
+        reallocations += collection._buffer is not buffer
+        buffer = collection._buffer
+
+    assert reallocations <= 6
+    assert collection.vectors.shape == (1000, 5)
+    expected = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    assert np.allclose(collection.vectors, expected, atol=1e-6)
+
+def test_persist_and_memory_mapped_load(store, tmp_path):
+    """Test a persisted index reloads memory-mapped and can still be written to"""
+    store.persist()
+    assert not store._collection.dirty
+
+    loaded = NumpyVectorStore.load(tmp_path / "index", KeywordEmbeddings())
+    assert isinstance(loaded._collection.vectors, np.memmap)
+    assert loaded._collection.count() == 4
+    assert loaded.similarity_search("shader", k=1)[0].metadata["source"] == "shader.md"
+
+    loaded.add_texts(["physics physics"], metadatas=[{"source": "physics.md"}], ids=["y"])
+    assert loaded._collection.count() == 5
+    assert NumpyVectorStore.load(tmp_path / "index", KeywordEmbeddings())._collection.count() == 4
+
+def test_ivf_index_search_stays_in_cluster(tmp_path):
+    """Test the IVF index is built past the row threshold and keeps recall on clustered data"""
+    rng = np.random.default_rng(1)
+    centers = rng.normal(size=(8, 16))
+    vectors = np.repeat(centers, 50, axis=0) + rng.normal(scale=0.05, size=(400, 16))
+    collection = NumpyCollection(tmp_path / "index", ivf_min_rows=100, nprobe=2)
+    collection.upsert(ids=[str(i) for i in range(400)], embeddings=vectors.tolist())
+    collection.persist()
+
+    loaded = NumpyCollection.load(tmp_path / "index", ivf_min_rows=100, nprobe=2)
+    assert loaded.ivf is not None
+    for cluster, query in enumerate(centers):
+        positions, _ = loaded.search(query.tolist(), 10)
+        assert len(positions) == 10
+        assert all(position // 50 == cluster for position in positions)
+
+def test_manager_numpy_backend_round_trip(tmp_path):
+    """Test the manager builds a numpy index that a forked worker reopens read-only"""
+    docs = [
+        Document(page_content="player movement", metadata={"source": "player.md"}),
+        Document(page_content="shader graph", metadata={"source": "shader.md"})
+    ]
+
+    def fake_embeddings(manager):
+        manager.embeddings = KeywordEmbeddings()
+        manager.embedding_cache = MagicMock()
+        manager.embedding_scheduler = MagicMock()
+
+    with patch('app.core.vector_store.VECTOR_STORE_BACKEND', 'numpy'), \
+         patch.object(VectorStoreManager, '_create_embeddings', fake_embeddings):
+        builder = VectorStoreManager.for_existing_store(tmp_path, owner_pid=os.getpid())
+        builder._create_embeddings()
+        builder.create_vector_store(docs)
+        assert (tmp_path / VectorStoreManager.NUMPY_INDEX_DIR / NumpyCollection.COLUMNS_FILE).exists()
+
+        worker = VectorStoreManager.for_existing_store(tmp_path, owner_pid=os.getpid() + 1)
+        vector_store = worker.reattach_after_fork()
+
+    assert not hasattr(worker, 'chroma_client')
+    assert vector_store._collection.count() == 2
+    assert vector_store.similarity_search("shader", k=1)[0].metadata["source"] == "shader.md"
+    assert worker.lexical_index.search("shader", k=1)[0][0].metadata["source"] == "shader.md"
+
+def test_incremental_sync_refreshes_offsets_of_moved_chunks(tmp_path):
+    """Test chunks that kept their content but moved in an edited file get their new offsets"""
+    from app.core.document_processor import DocumentProcessor
+    from app.core.ingestion_manifest import IngestionManifest
+    knowledge_base = tmp_path / "knowledge_base"
+    knowledge_base.mkdir()
+    sections = [f"## Section {i}\n" + f"Player movement rule {i} explained in detail. " * 60 for i in range(6)]
+    doc_file = knowledge_base / "rules.md"
+    doc_file.write_text("# Rules\n## Type\nruleset\n" + "\n".join(sections))
+
+    def fake_embeddings(manager):
+        manager.embeddings = KeywordEmbeddings()
+        manager.embedding_cache = MagicMock()
+        manager.embedding_scheduler = MagicMock()
+
+    def offsets(ids, metadatas):
+        return {
+            doc_id: (metadata["start_offset"], metadata["end_offset"], metadata["chunk_index"])
+            for doc_id, metadata in zip(ids, metadatas)
+        }
+
+    with patch('app.core.vector_store.VECTOR_STORE_BACKEND', 'numpy'), \
+         patch.object(VectorStoreManager, '_create_embeddings', fake_embeddings):
+        manager = VectorStoreManager.for_existing_store(tmp_path, owner_pid=os.getpid())
+        manager.read_only = False
+        manager.doc_processor = DocumentProcessor(str(knowledge_base), max_workers=1)
+        manager.manifest = IngestionManifest(tmp_path / "ingestion_manifest.json", fingerprint="v1")
+        manager._create_embeddings()
+        manager.get_or_create_vector_store(force_recreate=True)
+
+        sections.insert(1, "## Inserted\n" + "Camera shake added before the other rules. " * 20)
+        doc_file.write_text("# Rules\n## Type\nruleset\n" + "\n".join(sections))
+        vector_store = manager.get_or_create_vector_store()
+
+    fresh = DocumentProcessor(str(knowledge_base), max_workers=1).load_documents()
+    expected = offsets([doc.metadata["chunk_id"] for doc in fresh], [doc.metadata for doc in fresh])
+    stored = vector_store._collection.get(include=["metadatas"])
+    assert manager.last_sync_report["refreshed"] > 0
+    assert offsets(stored["ids"], stored["metadatas"]) == expected
+    assert offsets(manager.lexical_index.ids, manager.lexical_index.metadatas) == expected
@@ -104,4 +104,130 @@ def test_specialized_chains(mock_templates, qa_manager):
             result = qa_manager.process_query(qa_manager.qa_chain, query)
             assert mock_chain.invoke.called
             assert isinstance(result["answer"], str)
-            assert "sources" in result
\ No newline at end of file
+            assert "sources" in result
+
+def test_stream_query_events(qa_manager):
+    """Test streaming sends sources first, then tokens, and writes memory once"""
+    from langchain_core.documents import Document
+    from app.core.retriever import RetrievalResult
+    qa_manager.retriever.retrieve.return_value = RetrievalResult(
+        [Document(page_content="T# docs", metadata={"source": "intro.md"})], {"returned": 1}
+    )
+    answer_chain = MagicMock()
+    answer_chain.stream.return_value = iter(["T# is ", "a language"])
+    qa_manager.answer_chains = {"qa": answer_chain}
+
+    events = list(qa_manager.stream_query("What is T#?"))
+
+    assert [event["event"] for event in events] == ["sources", "token", "token", "done"]
+    assert events[0]["data"]["sources"] == ["intro.md"]
+    assert events[0]["data"]["retrieval"]["returned"] == 1
+    assert events[0]["data"]["retrieval"]["context"]["chunks"] == 1
+    assert qa_manager.retriever.retrieve.call_args[0][1].name == "qa"
+    assert events[-1]["data"]["answer"] == "T# is a language"
+    assert answer_chain.stream.call_args[0][0] == {"context": "T# docs", "question": "What is T#?"}
+    assert len(qa_manager.get_chat_history()) == 2
+
+    # A repeat is served from the answer cache without touching the chain
+    cached = list(qa_manager.stream_query("What is T#?"))
+    assert cached[-1]["data"] == {"answer": "T# is a language", "cached": True}
+    assert answer_chain.stream.call_count == 1
+
+def test_aprocess_query(qa_manager):
+    """Test the async path retrieves, answers and caches without the thread pool"""
+    import asyncio
+    from unittest.mock import AsyncMock
+    from langchain_core.documents import Document
+    from app.core.retriever import RetrievalResult
+    qa_manager.retriever.aretrieve = AsyncMock(
+        return_value=RetrievalResult([Document(page_content="T# docs", metadata={"source": "intro.md"})])
+    )
+    answer_chain = MagicMock()
+    answer_chain.ainvoke = AsyncMock(return_value="T# is a language")
+    qa_manager.answer_chains = {"qa": answer_chain}
+
+    result = asyncio.run(qa_manager.aprocess_query(None, "What is T#?"))
+    assert result["answer"] == "T# is a language"
+    assert result["sources"] == ["intro.md"]
+
+    asyncio.run(qa_manager.aprocess_query(None, "what is t#"))
+    assert answer_chain.ainvoke.call_count == 1
+
+def test_aprocess_query_timeout(qa_manager):
+    """Test slow queries are cancelled"""
+    import asyncio
+    from unittest.mock import AsyncMock
+
+    async def slow(*args):
+        await asyncio.sleep(5)
+
+    qa_manager.retriever.aretrieve = AsyncMock(side_effect=slow)
+    qa_manager.answer_chains = {"qa": MagicMock()}
+
+    with patch('app.core.qa_chain.QUERY_TIMEOUT', 0.01):
+        result = asyncio.run(qa_manager.aprocess_query(None, "What is T#?"))
+    assert "timed out" in result["answer"]
+
+def test_process_query_timeout_does_not_wait_for_chain(qa_manager):
+    """Test the blocking path returns at the timeout instead of when the chain finishes"""
+    import threading
+    import time
+    release = threading.Event()
+    qa_manager.answer_cache = None
+    qa_manager.qa_chain = MagicMock()
+    qa_manager.qa_chain.invoke.side_effect = lambda inputs: release.wait(5)
+
+    start = time.monotonic()
+    with patch('app.core.qa_chain.QUERY_TIMEOUT', 0.05):
+        result = qa_manager.process_query(qa_manager.qa_chain, "What is T#?")
+    elapsed = time.monotonic() - start
+    release.set()
+
+    assert "timed out" in result["answer"]
+    assert elapsed < 2
+
+def test_code_questions_use_code_retrieval_profile(qa_manager):
+    """Test code questions search the example/functions partitions with code"""
+    from app.core.retriever import RetrievalResult
+    qa_manager.retriever.retrieve.return_value = RetrievalResult([])
+    answer_chain = MagicMock()
+    answer_chain.stream.return_value = iter(["class Mover : StudioBehavior {}"])
+    qa_manager.answer_chains = {"code": answer_chain}
+
+    list(qa_manager.stream_query("Write code to move the player"))
+
+    profile = qa_manager.retriever.retrieve.call_args[0][1]
+    assert profile.name == "code"
+    assert profile.filter == {"doc_type": ["example", "functions"], "has_code": True}
+
+def test_concurrent_queries_keep_their_own_sources(qa_manager):
+    """Test overlapping process_query calls each report the context they retrieved"""
+    import threading
+    from langchain_core.documents import Document
+    from langchain_core.runnables import RunnableLambda
+    from app.core.retriever import RetrievalResult
+
+    qa_manager.llm = RunnableLambda(lambda prompt: "answer")
+    qa_manager.answer_cache = None
+    qa_manager.create_qa_chain(MagicMock())
+    both_retrieving = threading.Barrier(2, timeout=5)
+
+    def retrieve(question, profile):
+        source = "jump.md" if "jump" in question else "camera.md"
+        both_retrieving.wait()
+        return RetrievalResult([Document(page_content=source, metadata={"source": source})], {"question": question})
+    qa_manager.retriever = MagicMock()
+    qa_manager.retriever.retrieve.side_effect = retrieve
+
+    results = {}
+    def ask(question):
+        results[question] = qa_manager.process_query(qa_manager.qa_chain, question)
+    threads = [threading.Thread(target=ask, args=(q,)) for q in ("How do I jump?", "How does the camera follow?")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert results["How do I jump?"]["sources"] == ["jump.md"]
+    assert results["How do I jump?"]["retrieval"]["question"] == "How do I jump?"
+    assert results["How does the camera follow?"]["sources"] == ["camera.md"]
@@ -0,0 +1,180 @@
+import numpy as np
+import pytest
+from unittest.mock import MagicMock
+from langchain_core.embeddings import Embeddings
+from app.core.numpy_vector_store import NumpyCollection, NumpyVectorStore
+from app.core.retriever import ContextRetriever, mmr_select, prune_by_score
+
+class AxisEmbeddings(Embeddings):
+    """Embeds 'a' / 'b' / 'ab' onto fixed 2-d directions"""
+    VECTORS = {"a": [1.0, 0.0], "b": [0.0, 1.0], "ab": [1.0, 1.0]}
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.VECTORS[text.split()[0]]
+
+@pytest.fixture
+def vector_store():
+    store = NumpyVectorStore(NumpyCollection(), AxisEmbeddings())
+    # Three near-identical chunks of one file, and one relevant chunk of another
+    store._collection.upsert(
+        ids=["a1", "a2", "a3", "b1"],
+        embeddings=[[1.0, 0.30], [1.0, 0.31], [1.0, 0.32], [0.2, 1.0]],
+        metadatas=[{"source": "a.md"}] * 3 + [{"source": "b.md"}],
+        documents=["a part 1", "a part 2", "a part 3", "b part 1"]
+    )
+    return store
+
+def test_mmr_select_prefers_diverse_candidates():
+    """Test MMR skips a near-duplicate of an already selected candidate"""
+    candidates = np.array([[1.0, 0.0], [0.99, 0.01], [0.6, 0.8]])
+    assert mmr_select([1.0, 0.3], candidates, 2, lambda_mult=0.5) == [1, 2]
+    assert mmr_select([1.0, 0.3], candidates, 2, lambda_mult=1.0) == [1, 0]
+    assert mmr_select([1.0, 0.0], np.zeros((0, 2)), 2, lambda_mult=0.5) == []
+
+def test_context_retriever_mmr_mode(vector_store):
+    """Test near-duplicate chunks stop filling the top k in MMR mode"""
+    retriever = ContextRetriever(vector_store=vector_store, k=2, fetch_k=4,
+                                 search_type="mmr", lambda_mult=0.5)
+    sources = [doc.metadata["source"] for doc in retriever.invoke("ab")]
+    assert sources == ["a.md", "b.md"]
+
+def test_context_retriever_similarity_mode(vector_store):
+    """Test similarity mode returns the plain top k"""
+    retriever = ContextRetriever(vector_store=vector_store, k=2, search_type="similarity")
+    sources = [doc.metadata["source"] for doc in retriever.invoke("ab")]
+    assert sources == ["a.md", "a.md"]
+
+def test_context_retriever_fetches_candidates_in_one_query():
+    """Test candidates and their embeddings come from a single collection query"""
+    vector_store = MagicMock()
+    vector_store.embeddings.embed_query.return_value = [1.0, 0.0]
+    vector_store._collection.query.return_value = {
+        "documents": [["x", "y"]],
+        "metadatas": [[{"source": "x.md"}, {"source": "y.md"}]],
+        "embeddings": [[[1.0, 0.0], [0.0, 1.0]]]
+    }
+    retriever = ContextRetriever(vector_store=vector_store, k=1, fetch_k=10, search_type="mmr")
+
+    docs = retriever.invoke("question")
+    assert [doc.page_content for doc in docs] == ["x"]
+    vector_store._collection.query.assert_called_once_with(
+        query_embeddings=[[1.0, 0.0]], n_results=10,
+        include=["documents", "metadatas", "embeddings"]
+    )
+
+def test_prune_by_score_threshold_and_gap():
+    """Test low scores and everything past a score cliff are dropped"""
+    scores = np.array([0.2, 0.82, 0.5, 0.8, 0.78])
+    kept, below, past_gap = prune_by_score(scores, threshold=0.3, max_gap=0.15)
+    assert kept.tolist() == [1, 3, 4]
+    assert (below, past_gap) == (1, 1)
+
+    kept, below, past_gap = prune_by_score(scores, threshold=0.3, max_gap=0)
+    assert kept.tolist() == [1, 3, 4, 2]
+    assert (below, past_gap) == (1, 0)
+
+def test_context_retriever_reports_pruning_stats(vector_store):
+    """Test per-request stats count the chunks dropped by each rule"""
+    retriever = ContextRetriever(vector_store=vector_store, k=4, search_type="similarity",
+                                 score_threshold=0.5, score_gap=0)
+    result = retriever.retrieve("b")
+    assert [doc.metadata["source"] for doc in result.documents] == ["b.md"]
+    assert result.documents[0].metadata["relevance_score"] > 0.9
+    assert result.stats["candidates"] == 4
+    assert result.stats["below_threshold"] == 3
+    assert result.stats["returned"] == 1
+
+def test_build_where():
+    """Test metadata predicates map to Chroma's flat where syntax"""
+    from app.core.document_processor import DocType
+    from app.core.retriever import build_where
+    assert build_where(None) is None
+    assert build_where({"source": "a.md"}) == {"source": {"$eq": "a.md"}}
+    assert build_where({"doc_type": DocType.FUNCTIONS, "has_code": True}) == {
+        "$and": [{"doc_type": {"$eq": "functions"}}, {"has_code": {"$eq": True}}]
+    }
+    assert build_where({"chunk_index": {"$gt": 2}}) == {"chunk_index": {"$gt": 2}}
+
+def test_retrieval_profile_prefers_partition_and_falls_back(vector_store):
+    """Test a profile searches its partition first and tops up from the whole index"""
+    from app.core.retriever import RetrievalProfile
+    retriever = ContextRetriever(vector_store=vector_store, search_type="similarity", score_gap=0)
+
+    preferred = RetrievalProfile(name="docs", k=2, filter={"source": "b.md"})
+    result = retriever.retrieve("ab", preferred)
+    assert [doc.metadata["source"] for doc in result.documents] == ["b.md", "a.md"]
+    assert result.stats["profile"] == "docs"
+    assert result.stats["fallback"] is True
+
+    strict = RetrievalProfile(name="docs", k=2, filter={"source": "b.md"}, fallback=False)
+    result = retriever.retrieve("ab", strict)
+    assert [doc.metadata["source"] for doc in result.documents] == ["b.md"]
+    assert result.stats["fallback"] is False
+
+def test_hybrid_retrieval_fuses_lexical_hits(vector_store):
+    """Test lexical matches the vector search missed are fused into the results"""
+    from app.core.lexical_index import LexicalIndex
+    lexical = LexicalIndex(["x"], ["GetComponent typeof usage"], [{"source": "functions.md"}])
+    retriever = ContextRetriever(vector_store=vector_store, k=2, search_type="similarity",
+                                 score_gap=0, lexical_index=lexical)
+
+    result = retriever.retrieve("a GetComponent")
+    assert "functions.md" in [doc.metadata["source"] for doc in result.documents]
+    assert result.stats["lexical_hits"] == 1
+
+def test_off_topic_question_gets_no_lexical_context(vector_store):
+    """Test stopwords and a single stray term do not fuse lexical hits once the vector side pruned everything"""
+    from app.core.lexical_index import LexicalIndex
+    lexical = LexicalIndex(
+        ["x", "y"],
+        ["What is in the scene is what the player sees", "Weather effects are not part of T#"],
+        [{"source": "rules.md"}, {"source": "effects.md"}]
+    )
+    retriever = ContextRetriever(vector_store=vector_store, k=4, search_type="similarity",
+                                 score_threshold=0.99, score_gap=0, lexical_index=lexical)
+
+    result = retriever.retrieve("ab What is the weather like in Paris today?")
+    assert result.documents == []
+    assert result.stats["below_threshold"] == 4
+    assert result.stats["lexical_hits"] == 0
+    assert result.stats["returned"] == 0
+
+def test_lexical_only_when_embedding_fails():
+    """Test retrieval is answered locally when the query cannot be embedded"""
+    from app.core.lexical_index import LexicalIndex
+    vector_store = MagicMock()
+    vector_store.embeddings.embed_query.side_effect = ConnectionError("embedding API down")
+    lexical = LexicalIndex(["x"], ["StartCoroutine example"], [{"source": "rules.md"}])
+    retriever = ContextRetriever(vector_store=vector_store, k=2, lexical_index=lexical)
+
+    result = retriever.retrieve("StartCoroutine")
+    assert [doc.metadata["source"] for doc in result.documents] == ["rules.md"]
+    assert result.stats["lexical_only"] is True
+    assert not vector_store._collection.query.called
+
+def test_reciprocal_rank_fusion():
+    """Test chunks ranked well by both lists come first"""
+    from langchain_core.documents import Document
+    from app.core.retriever import reciprocal_rank_fusion
+    a, b, c = (Document(page_content=t, metadata={"chunk_id": t}) for t in "abc")
+    fused = reciprocal_rank_fusion([[a, b, c], [b, c]], k=2, rrf_k=60)
+    assert [doc.page_content for doc in fused] == ["b", "c"]
+
+def test_forked_worker_gets_its_own_embed_executor():
+    """Test a worker forked after the parent used the embedding pool can still submit to it"""
+    import os
+    from app.core import retriever as retriever_module
+    assert retriever_module._embed_executor().submit(lambda: 1).result(timeout=5) == 1
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            ok = retriever_module._embed_executor().submit(lambda: 42).result(timeout=2) == 42
+        except Exception:
+            ok = False
+        os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
@@ -0,0 +1,72 @@
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+from flask import Flask
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from app.api.async_routes import ask_question
+from app.api.routes import api_bp
+from app.core.initializer import AppComponents
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(api_bp, url_prefix='/api')
+    return app.test_client()
+
+def parse_events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+def test_ask_stream_sends_server_sent_events(client):
+    """Test the streaming endpoint relays QA events as SSE"""
+    manager = MagicMock()
+    manager.stream_query.return_value = iter([
+        {"event": "sources", "data": {"sources": ["intro.md"]}},
+        {"event": "token", "data": {"text": "Hello"}},
+        {"event": "done", "data": {"answer": "Hello", "cached": False}}
+    ])
+
+    with patch.object(AppComponents, 'qa_chain', MagicMock()), \
+         patch.object(AppComponents, 'qa_chain_manager', manager):
+        response = client.post('/api/ask/stream', json={"question": "What is T#?"})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    assert parse_events(response.get_data(as_text=True)) == [
+        ("sources", {"sources": ["intro.md"]}),
+        ("token", {"text": "Hello"}),
+        ("done", {"answer": "Hello", "cached": False})
+    ]
+
+def test_ask_stream_validates_question(client):
+    """Test the streaming endpoint shares /ask's request validation"""
+    response = client.post('/api/ask/stream', json={"question": 42})
+    assert response.status_code == 422
+
+def test_async_ask():
+    """Test the ASGI /api/ask answers through aprocess_query"""
+    async def aprocess_query(chain, question, session_id=None):
+        return {"answer": f"Answer to {question} in {session_id}", "sources": ["intro.md"], "retrieval": {"returned": 1}}
+
+    manager = MagicMock()
+    manager.aprocess_query = aprocess_query
+    client = TestClient(Starlette(routes=[Route('/api/ask', ask_question, methods=['POST'])]))
+
+    with patch.object(AppComponents, 'qa_chain', MagicMock()), \
+         patch.object(AppComponents, 'qa_chain_manager', manager):
+        response = client.post('/api/ask', json={"question": "What is T#?", "session_id": "user-1"})
+        invalid = client.post('/api/ask', json={"question": ""})
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "answer": "Answer to What is T#? in user-1",
+        "sources": ["intro.md"],
+        "retrieval": {"returned": 1},
+        "status": "success"
+    }
+    assert invalid.status_code == 400
@@ -0,0 +1,57 @@
+from unittest.mock import MagicMock, patch
+from app.core.session_memory import SessionMemoryStore, DEFAULT_SESSION
+from app.core.qa_chain import QAChainManager
+
+def add_turn(store, session_id, question, answer):
+    chat_memory = store.get(session_id).chat_memory
+    chat_memory.add_user_message(question)
+    chat_memory.add_ai_message(answer)
+
+def test_history_window_is_bounded():
+    """Test each session keeps only its latest messages"""
+    store = SessionMemoryStore(max_messages=4)
+    for i in range(5):
+        add_turn(store, "a", f"q{i}", f"a{i}")
+
+    messages = store.get("a").chat_memory.messages
+    assert [m.content for m in messages] == ["q3", "a3", "q4", "a4"]
+
+def test_sessions_are_isolated():
+    """Test one session's history never appears in another's"""
+    store = SessionMemoryStore()
+    add_turn(store, "a", "question from a", "answer")
+
+    assert store.get("b").chat_memory.messages == []
+    assert len(store.get("a").chat_memory.messages) == 2
+
+def test_lru_and_idle_eviction_spill_and_restore(tmp_path):
+    """Test evicted sessions are spilled to SQLite and restored when they return"""
+    store = SessionMemoryStore(max_sessions=2, idle_timeout=60, spill_path=tmp_path / "sessions.sqlite3")
+    add_turn(store, "a", "qa", "aa")
+    add_turn(store, "b", "qb", "ab")
+    add_turn(store, "c", "qc", "ac")
+
+    # "a" was least recently used and the default session is pinned
+    assert store.stats["evicted"] == 1
+    assert [m.content for m in store.get("a").chat_memory.messages] == ["qa", "aa"]
+    assert store.stats["restored"] == 1
+
+    with patch('app.core.session_memory.time.time', return_value=10 ** 10):
+        store.get(DEFAULT_SESSION)
+    assert len(store) == 1
+    store.close()
+
+def test_qa_manager_keys_memory_by_session():
+    """Test queries with different session IDs keep separate histories"""
+    with patch('app.core.qa_chain.ChatAnthropic'):
+        manager = QAChainManager()
+    manager.qa_chain = MagicMock()
+    manager.qa_chain.invoke.return_value = "answer"
+
+    manager.process_query(manager.qa_chain, "What is T#?", session_id="a")
+    result = manager.process_query(manager.qa_chain, "What are loops?", session_id="b")
+
+    assert [m.content for m in result["chat_history"]] == ["What are loops?", "answer"]
+    assert manager.get_chat_history() == []
+    manager.clear_memory("a")
+    assert manager.get_chat_history("a") == []
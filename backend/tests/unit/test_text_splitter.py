@@ -0,0 +1,64 @@
+from app.config.settings import MAX_CHUNK_SIZE, MIN_CHUNK_SIZE
+from app.utils.text_splitter import CODE, MARKDOWN, CustomMarkdownSplitter
+
+def method(name, body_lines):
+    lines = [f"    public void {name}() {{"]
+    lines += [f"        value = {i} + counter;" for i in range(body_lines)]
+    return "\n".join(lines + ["    }"])
+
+def test_chunks_are_rendered_from_spans():
+    """Test chunk text is built from offsets into the original document"""
+    text = (
+        "# Title\n## Type\nexample\n" + "Intro text. " * 20 + "\n"
+        "```csharp\npublic class Player {\n" + method("Jump", 10) + "\n" + method("Run", 10) + "\n}\n```\n"
+        "## Notes\n" + "More text. " * 20 + "\n"
+    )
+    splitter = CustomMarkdownSplitter(chunk_size=2000)
+    chunks = splitter.split_spans(text)
+
+    assert splitter.split_text(text) == [splitter.render(text, spans) for spans in chunks]
+    for spans in chunks:
+        for span in spans:
+            if span.kind == MARKDOWN:
+                assert text[span.start:span.end] in text
+            else:
+                assert span.kind == CODE
+                assert "```" not in text[span.start:span.end]
+    assert any("public void Jump()" in splitter.render(text, spans) for spans in chunks)
+
+def test_oversized_code_block_is_split_by_method():
+    """Test a code block over MAX_CHUNK_SIZE is split into fenced method chunks"""
+    methods = [method(f"Step{i}", 40) for i in range(MAX_CHUNK_SIZE // 1500 + 2)]
+    text = "# Big\n```csharp\n" + "\n".join(methods) + "\n```\n"
+    chunks = CustomMarkdownSplitter(chunk_size=11800).split_text(text)
+
+    code_chunks = [chunk for chunk in chunks if "```csharp\n" in chunk]
+    assert len(code_chunks) > 1
+    assert code_chunks[0].startswith("# Big\n")
+    for chunk in code_chunks:
+        assert chunk.rstrip().endswith("\n```")
+        assert MIN_CHUNK_SIZE <= len(chunk) <= MAX_CHUNK_SIZE
+
+def test_blank_text_has_no_chunks():
+    assert CustomMarkdownSplitter().split_text(" \n\n ") == []
+
+def test_overlap_windows_repeat_the_previous_chunk():
+    """Test chunks start with a window of the previous chunk aligned to a sentence or line"""
+    text = "# Guide\n" + "".join(f"Sentence number {i} explains a step. " for i in range(60)) + "\n"
+    text += "```csharp\n" + "\n".join(method(f"Step{i}", 12) for i in range(6)) + "\n```\n"
+    splitter = CustomMarkdownSplitter(chunk_size=500, chunk_overlap=120)
+    splitter.code_segmenter.max_size = 600
+    chunks = splitter.split_chunks(text)
+
+    overlapping = [chunk for chunk in chunks if chunk.overlap]
+    assert any(chunk.text.startswith("Sentence number") for chunk in overlapping)
+    assert any(chunk.text.startswith("```csharp\n        value =") for chunk in overlapping)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.overlap <= 120
+        if chunk.overlap:
+            window = text[chunk.start_offset:chunk.start_offset + chunk.overlap]
+            assert chunk.start_offset < previous.end_offset
+            assert window in chunk.text and text[chunk.start_offset:previous.end_offset] in previous.text
+            assert text[chunk.start_offset - 1] in " \n"
+
+    assert not any(chunk.overlap for chunk in CustomMarkdownSplitter(chunk_size=500, chunk_overlap=0).split_chunks(text))
@@ -1,3 +1,4 @@
+import os
 import pytest
 from unittest.mock import Mock, patch, MagicMock
 from pathlib import Path
@@ -62,7 +63,7 @@ def test_get_or_create_vector_store(mock_sleep, vector_store_manager):
     mock_store = MagicMock()
     
     with patch('langchain_chroma.Chroma', return_value=mock_store), \
-         patch.object(vector_store_manager.doc_processor, 'load_documents') as mock_load:
+         patch.object(vector_store_manager.doc_processor, 'iter_documents') as mock_load:
         
         # Setup mock documents
         mock_docs = [
@@ -82,4 +83,123 @@ def test_cleanup(vector_store_manager):
          patch('tempfile.mkdtemp', return_value="/tmp/test"):
         
         vector_store_manager.cleanup_all()
-        vector_store_manager.cleanup_temp_directories()
\ No newline at end of file
+        vector_store_manager.cleanup_temp_directories()
+
+def test_chunk_ids_are_deterministic(vector_store_manager):
+    """Test chunk IDs depend only on source and content"""
+    doc = Document(page_content="Stable content", metadata={"source": "test1.md"})
+    same = Document(page_content="Stable content", metadata={"source": "test1.md", "chunk_index": 3})
+    other = Document(page_content="Stable content", metadata={"source": "test2.md"})
+
+    assert vector_store_manager._chunk_id(doc) == vector_store_manager._chunk_id(same)
+    assert vector_store_manager._chunk_id(doc) != vector_store_manager._chunk_id(other)
+
+def test_sync_documents_diff(vector_store_manager, mock_chroma_client):
+    """Test incremental sync adds new chunks and removes stale ones"""
+    docs = [
+        Document(page_content="Unchanged", metadata={"source": "test1.md"}),
+        Document(page_content="New", metadata={"source": "test2.md"})
+    ]
+    unchanged_id = vector_store_manager._chunk_id(docs[0])
+    new_id = vector_store_manager._chunk_id(docs[1])
+
+    collection = MagicMock()
+    collection.get.return_value = {"ids": [unchanged_id, "stale_id"]}
+    mock_chroma_client.get_collection.return_value = collection
+
+    vector_store = MagicMock()
+    vector_store_manager.embeddings = MagicMock()
+    vector_store_manager.embeddings.embed_documents.side_effect = lambda texts: [[0.0]] * len(texts)
+    report = vector_store_manager._sync_documents(vector_store, docs)
+
+    collection.delete.assert_called_once_with(ids=["stale_id"])
+    assert vector_store._collection.upsert.call_args.kwargs["ids"] == [new_id]
+    assert vector_store._collection.update.call_args.kwargs["ids"] == [unchanged_id]
+    assert report == {"added": 1, "removed": 1, "unchanged": 1, "refreshed": 1}
+
+def test_ingest_streams_documents_in_bounded_batches(vector_store_manager):
+    """Test documents are embedded and written batch by batch, never far behind the stream"""
+    consumed = []
+
+    def documents():
+        for i in range(30):
+            consumed.append(i)
+            yield Document(page_content=f"Chunk {i}", metadata={"source": f"doc{i % 2}.md"})
+        yield Document(page_content="Chunk 0", metadata={"source": "doc0.md"})  # duplicate
+
+    embedded_after = []
+    def embed_documents(texts):
+        embedded_after.append(len(consumed))
+        return [[0.0]] * len(texts)
+
+    vector_store = MagicMock()
+    vector_store_manager.embeddings = MagicMock()
+    vector_store_manager.embeddings.embed_documents.side_effect = embed_documents
+    with patch.object(VectorStoreManager, 'BATCH_SIZE', 3), \
+         patch('app.core.vector_store.INGEST_QUEUE_DEPTH', 1):
+        chunk_ids_by_source, added = vector_store_manager._ingest(vector_store, documents())
+
+    assert added == 30
+    assert [len(c.kwargs["ids"]) for c in vector_store._collection.upsert.call_args_list] == [3] * 10
+    assert len(chunk_ids_by_source["doc0.md"]) == 16  # the duplicate is recorded but not re-added
+    # When batch b is embedded, at most one queued and one partial batch were read ahead of it
+    assert all(count <= 3 * (b + 3) for b, count in enumerate(embedded_after))
+
+def test_ingest_propagates_stage_errors(vector_store_manager):
+    """Test an embedding failure stops ingestion and is raised to the caller"""
+    vector_store_manager.embeddings = MagicMock()
+    vector_store_manager.embeddings.embed_documents.side_effect = ConnectionError("embedding API down")
+    docs = (Document(page_content=f"Chunk {i}", metadata={"source": "a.md"}) for i in range(10))
+
+    with patch.object(VectorStoreManager, 'BATCH_SIZE', 2), pytest.raises(ConnectionError):
+        vector_store_manager._ingest(MagicMock(), docs)
+
+def test_cleanup_only_in_owner_process(vector_store_manager):
+    """Test a forked worker inheriting the atexit hook does not clean up the parent's store"""
+    owner_pid = vector_store_manager._owner_pid
+    vector_store_manager._owner_pid = owner_pid + 1
+    try:
+        with patch.object(vector_store_manager, 'cleanup_temp_directories') as mock_cleanup:
+            vector_store_manager.cleanup_all()
+        assert not mock_cleanup.called
+    finally:
+        vector_store_manager._owner_pid = owner_pid
+
+def test_worker_attaches_read_only(tmp_path):
+    """Test a worker attaches to a store it does not own without being able to modify it"""
+    manager = VectorStoreManager.for_existing_store(tmp_path, owner_pid=os.getpid() + 1)
+    with patch('chromadb.api.client.SharedSystemClient.clear_system_cache'):
+        vector_store = manager.reattach_after_fork()
+
+    assert vector_store._collection.count() == 0
+    assert not manager.is_owner
+    with pytest.raises(RuntimeError, match="read-only"):
+        manager.get_or_create_vector_store()
+    with pytest.raises(ValueError, match="Resetting is not allowed"):
+        manager.chroma_client.reset()
+    manager.embedding_cache.close()
+
+def test_filtered_search_pushes_predicates_down(vector_store_manager, mock_chroma_client):
+    """Test filters become a flat where clause and queries use the configured embeddings"""
+    collection = MagicMock()
+    collection.query.return_value = {
+        "documents": [["code a"], ["code b"]],
+        "metadatas": [[{"source": "a.md"}], [{"source": "b.md"}]]
+    }
+    mock_chroma_client.get_collection.return_value = collection
+    vector_store_manager.embeddings = MagicMock()
+    vector_store_manager.embeddings.embed_queries.return_value = [[1.0, 0.0], [0.0, 1.0]]
+
+    with patch('app.core.vector_store.RETRIEVAL_MODE', 'similarity'):
+        results = vector_store_manager.batch_similarity_search_with_filter(
+            ["first", "second"], {"has_code": True, "doc_type": ["functions", "example"]}, k=3
+        )
+
+    assert [[doc.page_content for doc in docs] for docs in results] == [["code a"], ["code b"]]
+    vector_store_manager.embeddings.embed_queries.assert_called_once_with(["first", "second"])
+    collection.query.assert_called_once_with(
+        query_embeddings=[[1.0, 0.0], [0.0, 1.0]],
+        n_results=3,
+        include=["documents", "metadatas"],
+        where={"$and": [{"has_code": {"$eq": True}}, {"doc_type": {"$in": ["functions", "example"]}}]}
+    )